@@ -0,0 +1,39 @@
+"""
+Explicit installation step for the FreeSASA Python bindings used by st_sasa.py.
+
+Usage:
+    python install_freesasa.py                   # install the freesasa package from PyPI
+    python install_freesasa.py ./freesasa-repo   # install from a local checkout of the bindings
+
+Nothing here runs when the app starts; without the bindings the app falls back
+to the freesasa command line.
+"""
+import subprocess
+import sys
+import os
+
+def install_from_local_git(repo_path, package_name):
+    # Check if the repository exists locally
+    if os.path.exists(os.path.join(repo_path, ".git")):
+        print(f"Repository found at {repo_path}, pulling latest changes...")
+        git_pull_command = ["git", "-C", repo_path, "pull"]
+        subprocess.check_call(git_pull_command)
+
+    # Install the package using pip from the local repository
+    print(f"Installing {package_name} from the local repository...")
+    pip_install_command = [sys.executable, "-m", "pip", "install", repo_path]
+    subprocess.check_call(pip_install_command)
+
+def import_or_install(package_name, repo_path=None):
+    try:
+        __import__(package_name)
+        print(f"{package_name} is already installed.")
+    except ImportError:
+        print(f"{package_name} not found, installing...")
+        if repo_path:
+            install_from_local_git(repo_path, package_name)
+        else:
+            subprocess.check_call([sys.executable, "-m", "pip", "install", package_name])
+
+if __name__ == "__main__":
+    import_or_install("freesasa", sys.argv[1] if len(sys.argv) > 1 else None)
@@ -1,8 +1,155 @@
+import datetime
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import streamlit as st
-from Bio import Entrez
-from st_uniprot import *
-from st_params import *
-from st_missense2 import *
+from st_params import (PUBLICATION_START_YEAR, get_publication_count_score, get_interactors_score, get_KEGG_score,
+                       get_PDB_score, get_AF2_score, calculate_DRARDT_score)
+from st_fetch import MAX_WORKERS, UNIPROT_SOURCES, fetch_gene_evidence, iter_evidence
+from st_pubmed import set_ncbi_contact
+from st_simba import AMINO_ACIDS, UNFOLDING_THRESHOLD, SimbaModel, parse_mutations, to_one_letter
+from st_metrics import Trace, prometheus_text
+from st_scoretable import SOURCES, stored_evidence, fetch_missing, save_fetched
+from st_variants import VARIANT_FILE_TYPES
+# pandas, the structure/SASA modules and Altair are imported where they are first used,
+# so a cold start only loads what the gene lookup needs
+
+# Rows of a variant screen shown in the page; the download has all of them
+PREVIEW_ROWS = 1000
+# Order matches the arguments of calculate_DRARDT_score
+SCORED_SOURCES = ("publications", "interactors", "pathways", "structures", "alphafold")
+
+def render_uniprot_id(gene_name, uniprot_id):
+    st.write(f":blue[**UNIPROT ID FOR {gene_name}:**]")
+    st.write(uniprot_id)
+
+def render_disease(gene_name, uniprot_pathology):
+    st.write(f":blue[**INVOLVEMENT OF {gene_name} IN DISEASES:**]")
+    diseases = uniprot_pathology.split("\n")
+    for disease in diseases:
+        st.write(disease)
+
+def render_length(gene_name, uniprot_prot_length):
+    st.write(f":blue[**LENGTH OF {gene_name}:**]") 
+    st.write(f"{uniprot_prot_length}")
+
+def render_publications(gene_name, pub_count):
+    st.write(f":blue[**NUMBER OF PUBLICATIONS ABOUT {gene_name} FROM {PUBLICATION_START_YEAR} TO {datetime.date.today().year}:**]") 
+    st.write(f"{pub_count}")
+    pub_count_score = get_publication_count_score(pub_count)
+    st.write(f":violet[**Publication count score for {gene_name}:**]", (pub_count_score)) 
+    return pub_count_score
+
+def render_interactors(gene_name, interactors):
+    interactors_count, interactors_names = interactors
+    st.write(f":blue[**NUMBER OF {gene_name} INTERACTORS FROM STRING-DB:**]") 
+    st.write(f"{interactors_count}")
+    st.write(f":blue[**INTERACTORS OF {gene_name}:**]") 
+    if interactors_count == 0:
+        st.write("_None_")
+    else:
+        st.write(f"{', '.join(interactors_names)}")
+    interactors_score = get_interactors_score(interactors_count)
+    st.write(f":violet[**Interactors score for {gene_name}:**]", (interactors_score)) 
+    return interactors_score
+
+def render_pathways(gene_name, pathways_count):
+    st.write(f":blue[**NUMBER OF KEGG PATHWAYS {gene_name} IS INVOLVED IN:**]") 
+    st.write(f"{pathways_count}")
+    KEGG_score = get_KEGG_score(pathways_count)
+    st.write(f":violet[**KEGG score for {gene_name}:**]", (KEGG_score))
+    return KEGG_score
+
+def render_structures(gene_name, uniprot_3d):
+    pdb_count, structures, _ = uniprot_3d
+    st.write(f":blue[**NUMBER OF PDB ENTRIES FOR {gene_name}:**]") 
+    st.write(f"{pdb_count}")
+    for structure in structures:
+        st.write(structure)
+    PDB_score = get_PDB_score(pdb_count)
+    st.write(f":violet[**PDB score for {gene_name}:**]", (PDB_score))
+    return PDB_score
+
+def render_alphafold(gene_name, alphafold2_prediction):
+    st.write(f":blue[**ALPHAFOLD2 PREDICTION FOR {gene_name} AVAILABLE AT:**]") 
+    st.write(alphafold2_prediction or "No AlphaFold prediction found")
+    AF2_score = get_AF2_score(alphafold2_prediction)
+    st.write(f":violet[**AlphaFold2 score for {gene_name}:** ]",(AF2_score))
+    return AF2_score
+
+SOURCE_RENDERERS = {
+    "uniprot_id": render_uniprot_id,
+    "disease": render_disease,
+    "length": render_length,
+    "publications": render_publications,
+    "interactors": render_interactors,
+    "pathways": render_pathways,
+    "structures": render_structures,
+    "alphafold": render_alphafold,
+}
+
+def render_waterfall(request_trace):
+    # Debug view: one bar per fetch/compute span, HTTP calls nested inside the stage that made them
+    import altair as alt
+    import pandas as pd
+    spans = pd.DataFrame(request_trace.rows())
+    st.subheader("Timing waterfall")
+    if spans.empty:
+        st.write("_No spans recorded._")
+        return
+    for column in ("host", "status", "bytes", "cache", "error"):
+        if column not in spans:
+            spans[column] = None
+    spans["label"] = [f"{i:02d} {stage}" + (f" ({host})" if isinstance(host, str) else "")
+                      for i, (stage, host) in enumerate(zip(spans["stage"], spans["host"]))]
+    chart = alt.Chart(spans).mark_bar().encode(
+        x=alt.X("start_ms", title="ms since submit"), x2="end_ms",
+        y=alt.Y("label", sort=None, title=None), color="thread",
+        tooltip=["stage", "duration_ms", "host", "status", "bytes", "cache", "error"])
+    st.altair_chart(chart, use_container_width=True)
+    st.dataframe(spans.drop(columns=["label"]))
+    with st.expander("Process metrics (Prometheus format)"):
+        st.code(prometheus_text())
+
+def render_variant_screen(gene_name, variant_file, input_pdb, uniprot_id):
+    # Streams the uploaded variants through the screen chunk by chunk; the result TSV is built in a temporary file
+    import tempfile
+    import pandas as pd
+    from st_missense2 import load_uploaded_structure, compute_residue_sasa
+    from st_variants import VariantScreen, SCREEN_COLUMNS, open_lines, iter_variants, write_rows
+
+    st.subheader(f"Variant screen of {gene_name or variant_file.name}")
+    structure = load_uploaded_structure(input_pdb)
+    sasa = compute_residue_sasa(input_pdb)
+    if structure is None or sasa is None:
+        return
+    screen = VariantScreen(structure, sasa, SimbaModel("simba.tsv"), uniprot_id)
+    progress = st.progress(0.0, text="Screening variants...")
+    preview = []
+    with tempfile.TemporaryFile("w+", newline="") as output:
+        lines = open_lines(variant_file)
+        try:
+            for chunk in write_rows(output, screen.run(iter_variants(lines, variant_file.name, gene_name or None))):
+                preview.extend(chunk[:PREVIEW_ROWS - len(preview)])
+                progress.progress(min(variant_file.tell() / max(variant_file.size, 1), 1.0),
+                                  text=f"Screened {screen.counts['screened']} variants...")
+        except (ValueError, OSError) as e:
+            progress.empty()
+            st.error(f"Could not read {variant_file.name}: {e}")
+            return
+        finally:
+            lines.detach()  # leave the upload open for later reruns
+        progress.empty()
+        output.seek(0)
+        data = output.read()
+    counts = screen.counts
+    st.write(f"{counts['read']} variants read: **{counts['screened']} screened** ({counts['valid']} matching the "
+             f"uploaded structure), {counts['duplicates']} duplicates removed, {counts['rejected']} not missense or unreadable. "
+             f"ΔΔG ≤ {UNFOLDING_THRESHOLD} is expected to lead to protein unfolding.")
+    st.dataframe(pd.DataFrame(preview, columns=SCREEN_COLUMNS))
+    if len(preview) < counts["screened"] + counts["rejected"]:
+        st.caption(f"First {len(preview)} rows shown; the download has all of them.")
+    st.download_button("Download variant screen", data, f"{gene_name or 'variants'}_screen.tsv", "text/tab-separated-values")
 
 def main():
 
@@ -57,123 +204,193 @@ def main():
     st.markdown("_OPTIONAL_. The user can also upload a list of missense mutations and a PDB file of the target "
                 "to be checked for coverage in available PDB structures, solvent exposure (calculated with "
                 "FreeSASA) and entity of downstream destabilization effect at the protein structure level.")
-    mutations = st.text_input("Enter one or more missense mutations in the A123B format, separated by commas (e.g. A123B,C456D):")
+    mutations = st.text_input("Enter one or more missense mutations in the A123B format, separated by commas (e.g. A123B,C456D). Prefix a chain to pick it in multi-chain structures (e.g. B:A123C):")
 
-    if mutations:
-        input_pdb = st.file_uploader("Upload PDB file for the target (mandatory whenever missense mutations are submitted)", type="pdb")  # PDB required only when mutations are submitted
+    variant_file = st.file_uploader("_Or_ screen a variant file: VCF annotated with VEP or SnpEff, a ClinVar-style table, "
+                                    "or a list of protein changes (A123C, B:A123C, p.Ala123Val), optionally gzipped", type=VARIANT_FILE_TYPES)
+
+    if mutations or variant_file:
+        input_pdb = st.file_uploader("Upload PDB or mmCIF file for the target (mandatory whenever missense mutations are submitted)", type=["pdb", "ent", "cif"])  # PDB required only when mutations are submitted
+        extra_structures = st.file_uploader("_Optional_: more structures of the target (PDB files or a zip archive, e.g. other PDB entries or the AlphaFold model) "
+                                            "to compare RSA and ΔΔG across structures", type=["pdb", "ent", "cif", "gz", "zip"], accept_multiple_files=True)
+        saturation = st.checkbox("Also compute the SimBa-NI ΔΔG of every possible substitution in the structure (saturation mutagenesis)")
+
+    live_fetch = st.sidebar.checkbox("Always fetch live data (skip the precomputed score table)")
+    show_waterfall = st.sidebar.checkbox("Debug: show timing waterfall")
 
     if st.button("Submit"):
-        if not email or not gene_name:
-            st.write("Please provide both gene name and email address.")
-        else:
-            Entrez.email = email
-            
+        request_trace = Trace(gene_name or "request")
+        with request_trace.active():
+            uniprot_id = None
+            if not email or not gene_name:
+                st.write("Please provide both gene name and email address.")
+            else:
+                set_ncbi_contact(email)
             
-            st.subheader("Generalities")
             
-            uniprot_id = get_human_uniprot_id(gene_name)
-            st.write(f":blue[**UNIPROT ID FOR {gene_name}:**]")
-            st.write(uniprot_id)
-
-            if uniprot_id:
+                st.subheader("Generalities")
+                slots = {name: st.empty() for name in ("uniprot_id", "disease", "length")}
+                st.subheader("DRARDT parameters assessing")
+                slots.update({name: st.empty() for name in ("publications", "interactors", "pathways", "structures", "alphafold")})
+                score_slot = st.empty()
+                for slot in slots.values():
+                    slot.write("_Fetching..._")
+
+                scores = {}
+                stored = None if live_fetch else stored_evidence(gene_name)
+                executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+                try:
+                    if stored is not None:
+                        # Stored sources first, then live fetches for the ones the table has no value for
+                        values, checked_at = stored
+                        evidence = itertools.chain(((source, values[source], None) for source in SOURCES if source in values),
+                                                   iter_evidence(fetch_missing(gene_name, values, executor)))
+                    else:
+                        evidence = iter_evidence(fetch_gene_evidence(gene_name, executor))
+                    fetched, errors = {}, {}
+                    for source, value, error in evidence:
+                        if stored is not None and source not in values:
+                            if error is None:
+                                fetched[source] = value
+                            else:
+                                errors[source] = error
+                        if source == "uniprot_id" and error is None:
+                            uniprot_id = value
+                        if error is None and source in UNIPROT_SOURCES and not uniprot_id:
+                            slots[source].empty()  # No UniProt accession, nothing to show
+                            continue
+                        with slots[source].container():
+                            if error is not None:
+                                st.warning(f"Could not retrieve {source} data for {gene_name}: {error}")
+                            else:
+                                score = SOURCE_RENDERERS[source](gene_name, value)
+                                if score is not None:
+                                    scores[source] = score
+                finally:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                if stored is not None:
+                    save_fetched(gene_name, fetched, errors)
+
+                if uniprot_id:
+                    with score_slot.container():
+                        st.subheader(f"DRARDT score for {gene_name}")
+                        if stored is not None:
+                            st.caption(f"From the precomputed score table, data checked on "
+                                       f"{datetime.date.fromtimestamp(checked_at).isoformat()}. "
+                                       "Tick the sidebar option to fetch live data.")
+                        if len(scores) < len(SCORED_SOURCES):
+                            missing = ", ".join(sorted(set(SCORED_SOURCES) - set(scores)))
+                            st.warning(f"DRARDT score not computed: missing data for {missing}.")
+                        else:
+                            DRARDT_score = calculate_DRARDT_score(*(scores[source] for source in SCORED_SOURCES))
+                            st.write(f"**Score:** {DRARDT_score}")
+                            if DRARDT_score == 0:
+                                st.write(f"Flag: red:[**Very Low**]")
+                            elif DRARDT_score == 1:
+                                st.write(f"Flag: :orange[**Low**]")   
+                            elif DRARDT_score == 2:
+                                st.write(f"Flag: :green[**High**]")  
+                            elif DRARDT_score == 3:
+                                st.write(f"Flag: :blue[**Very High**]\n")                
+
+            if mutations and input_pdb:
+                import pandas as pd
+                from st_missense2 import load_uploaded_structure, check_pdb_coverage_batch, compute_residue_sasa
+                from st_ensemble import iter_structures, ensemble_sasa, ensemble_mutation_stats
+                from st_neighbourhood import CONTACT_CUTOFF, PACKING_RADIUS, NEIGHBOUR_CUTOFF
+
+                simba = SimbaModel("simba.tsv")
+
+                mutations = [mutation.strip() for mutation in mutations.split(',') if mutation.strip()]
+                try:
+                    mut_chains, wt, positions, mut = parse_mutations(mutations)
+                except ValueError as e:
+                    st.error(str(e))
+                    st.stop()
+                structure = load_uploaded_structure(input_pdb)
+                if structure is not None:
+                    for mutation, problem in zip(mutations, structure.validate_mutations(mut_chains, wt, positions)):
+                        if problem is not None:
+                            st.warning(f"{mutation}: {problem}.")
+                    for chain, ranges in structure.gaps().items():
+                        missing = ", ".join(f"{first}-{last}" if first != last else f"{first}" for first, last in ranges)
+                        st.caption(f"Chain {chain} of the uploaded structure has no coordinates for residues {missing}.")
+                coverage = check_pdb_coverage_batch(uniprot_id, positions) if uniprot_id else None
+                for pos_wt, hits in zip(positions, coverage or [[] for _ in positions]):
+                    if hits:
+                        pdb_id, chain, method, resolution = hits[0]
+                        st.write(f"Position {pos_wt} is covered by {len(hits)} experimental structure chain(s) of {gene_name} "
+                                 f"(best template: PDB ID {pdb_id}, chain {chain}, {method}, {resolution}).")
+                        st.dataframe(pd.DataFrame(hits, columns=["PDB ID", "Chain", "Method", "Resolution"]))
+                    else:
+                        st.write(f"Position {pos_wt} is not covered by any experimental structures of {gene_name}.")
 
-                uniprot_pathology = get_uniprot_disease(uniprot_id)
-                st.write(f":blue[**INVOLVEMENT OF {gene_name} IN DISEASES:**]")
-                diseases = uniprot_pathology.split("\n")
-                for disease in diseases:
-                    st.write(disease)
+                sasa = compute_residue_sasa(input_pdb)
 
-                uniprot_prot_length = get_uniprot_length(uniprot_id)
-                st.write(f":blue[**LENGTH OF {gene_name}:**]") 
-                st.write(f"{uniprot_prot_length}")
+                if sasa is not None:
+                    sasa_df = sasa.to_frame()
+                    st.dataframe(sasa_df)
 
-                st.subheader("DRARDT parameters assessing")
+                    # (chain, residue number) index: one O(1) lookup per mutation; unqualified mutations use the first chain
+                    rsa_values = sasa.rsa_at(sasa.rows(positions, mut_chains))
+                    ddGs = simba.ddg(wt, mut, rsa_values)
+                    unfolding = simba.unfolding(ddGs)
 
-                pub_count = get_publication_count(gene_name)
-                st.write(f":blue[**NUMBER OF PUBLICATIONS ABOUT {gene_name} FROM 2000 T0 2024:**]") 
-                st.write(f"{pub_count}")
-                pub_count_score = get_publication_count_score(pub_count)
-                st.write(f":violet[**Publication count score for {gene_name}:**]", (pub_count_score)) 
-
-                interactors_count, interactors_names = get_string_interactors(gene_name)
-                st.write(f":blue[**NUMBER OF {gene_name} INTERACTORS FROM STRING-DB:**]") 
-                st.write(f"{interactors_count}")
-                if interactors_count == 0:
-                    st.write(f":blue[**INTERACTORS OF {gene_name}:**]") 
-                    st.write("_None_")
-                else:
-                    st.write(f":blue[**INTERACTORS OF {gene_name}:**]") 
-                    st.write(f"{', '.join(interactors_names)}")
-
-                interactors_score = get_interactors_score(interactors_count)
-                st.write(f":violet[**Interactors score for {gene_name}:**]", (interactors_score)) 
-
-                pathways_count = get_kegg_pathways(gene_name)
-                st.write(f":blue[**NUMBER OF KEGG PATHWAYS {gene_name} IS INVOLVED IN:**]") 
-                st.write(f"{pathways_count}")
-                KEGG_score = get_KEGG_score(pathways_count)
-                st.write(f":violet[**KEGG score for {gene_name}:**]", (KEGG_score))
-
-                pdb_count, structures, PDB_score = get_uniprot_3d(uniprot_id)
-                st.write(f":blue[**NUMBER OF PDB ENTRIES FOR {gene_name}:**]") 
-                st.write(f"{pdb_count}")
-                for structure in structures:
-                    st.write(structure)
-                st.write(f":violet[**PDB score for {gene_name}:**]", (PDB_score))
-
-                alphafold2_prediction = get_alphafold_prediction(uniprot_id)
-                st.write(f":blue[**ALPHAFOLD2 PREDICTION FOR {gene_name} AVAILABLE AT:**]") 
-                st.write(alphafold2_prediction)
-                AF2_score = get_AF2_score(alphafold2_prediction)
-                st.write(f":violet[**AlphaFold2 score for {gene_name}:** ]",(AF2_score))
-
-                st.subheader(f"DRARDT score for {gene_name}")
-
-                DRARDT_score = calculate_DRARDT_score(pub_count_score, interactors_score, KEGG_score, PDB_score, AF2_score)
-                st.write(f"**Score:** {DRARDT_score}")
-                if DRARDT_score == 0:
-                    st.write(f"Flag: red:[**Very Low**]")
-                elif DRARDT_score == 1:
-                    st.write(f"Flag: :orange[**Low**]")   
-                elif DRARDT_score == 2:
-                    st.write(f"Flag: :green[**High**]")  
-                elif DRARDT_score == 3:
-                    st.write(f"Flag: :blue[**Very High**]\n")                
-
-        if mutations and input_pdb:
-
-            tsv_file = "simba.tsv"
-            volume_dict, polarity_dict = load_aa_properties(tsv_file)
-
-            mutations = [mutation.strip() for mutation in mutations.split(',')]
-            for mutation in mutations:
-                pos_wt = int(mutation[1:-1])
-                is_covered, pdb_structure = check_pdb_coverage(uniprot_id, pos_wt)
-                if is_covered:
-                    st.write(f"Position {pos_wt} is covered by at least one experimental structure of {gene_name} ({pdb_structure}).")
-                else:
-                    st.write(f"Position {pos_wt} is not covered by any experimental structures of {gene_name}.")
-
-            sasa_out = run_freesasa(gene_name, input_pdb)
-
-            if sasa_out:
-                sasa_df = parse_freesasa_output(sasa_out)
-                st.dataframee(sasa_df)
-
-                for mutation in mutations:
-                    pos_wt = int(mutation[1:-1])
-                    rsa_value = sasa_df[sasa_df['ResNum'] == pos_wt]['RSA'].values[0] if not sasa_df[sasa_df['ResNum'] == pos_wt].empty else None
-
-                    if rsa_value is not None:
-                        ddG = calculate_ddG(mutation, rsa_value, volume_dict, polarity_dict)
-                        st.write(f"**Calculated SimBa-NI ΔΔG for {mutation}:** {ddG}")
-                        if ddG > -1.5:
-                            st.write(f"Mutation {mutation} is not expected to lead to protein unfolding.")
+                    for mutation, rsa_value, ddG, unfolds in zip(mutations, rsa_values, ddGs, unfolding):
+                        if np.isnan(rsa_value):
+                            st.write(f"Could not calculate SimBa-NI ΔΔG for {mutation} due to missing RSA value.")
+                        elif np.isnan(ddG):
+                            st.write(f"Could not calculate SimBa-NI ΔΔG for {mutation}: unknown amino acid code.")
                         else:
-                            st.write(f"Mutation {mutation} is expected to lead to protein unfolding.")
-                    else:
-                        st.write(f"Could not calculate SimBa-NI ΔΔG for {mutation} due to missing RSA value.")
-
+                            st.write(f"**Calculated SimBa-NI ΔΔG for {mutation}:** {ddG}")
+                            if not unfolds:
+                                st.write(f"Mutation {mutation} is not expected to lead to protein unfolding.")
+                            else:
+                                st.write(f"Mutation {mutation} is expected to lead to protein unfolding.")
+
+                    if structure is not None:
+                        neighbourhood = structure.neighbourhood.at(structure.residue_rows(positions, mut_chains))
+                        st.write(f"Structural neighbourhood of each mutated residue: residues in contact (heavy atoms within "
+                                 f"{CONTACT_CUTOFF} Å), heavy atoms within {PACKING_RADIUS} Å of CB (packing), and the closest "
+                                 f"other chain and ligand (Å, blank beyond {NEIGHBOUR_CUTOFF} Å).")
+                        st.dataframe(pd.DataFrame({
+                            "Mutation": mutations, "RSA": rsa_values, "ΔΔG": ddGs,
+                            "Contacts": np.where(neighbourhood["contacts"] >= 0, neighbourhood["contacts"], np.nan),
+                            "Packing": np.where(neighbourhood["packing"] >= 0, neighbourhood["packing"], np.nan),
+                            "Closest chain (Å)": neighbourhood["chain_distance"],
+                            "Closest ligand (Å)": neighbourhood["ligand_distance"],
+                        }))
+
+                    if extra_structures:
+                        st.subheader(f"Ensemble analysis of {gene_name}")
+                        structures = [(input_pdb.name, input_pdb.getvalue())] + list(iter_structures(extra_structures))
+                        sasas, sasa_errors = ensemble_sasa(structures)
+                        for name, error in sasa_errors.items():
+                            st.warning(f"Could not compute SASA for {name}: {error}")
+                        summary, per_structure = ensemble_mutation_stats(sasas, mutations, mut_chains, wt, positions, mut, simba)
+                        st.write(f"RSA and SimBa-NI ΔΔG of each mutation across {len(sasas)} structures. The consensus is the "
+                                 f"majority vote of the structures containing the residue (ΔΔG ≤ {UNFOLDING_THRESHOLD}: unfolding).")
+                        st.dataframe(summary)
+                        with st.expander("Values per structure"):
+                            st.dataframe(per_structure)
+                        st.download_button("Download ensemble statistics", summary.to_csv(index=False), f"{gene_name}_ensemble_ddG.csv", "text/csv")
+
+                    if saturation:
+                        st.subheader(f"Saturation mutagenesis of {gene_name}")
+                        sequence = to_one_letter(sasa.resname)
+                        matrix = simba.saturation(sequence, sasa.rsa)
+                        labels = [f"{chain}:{aa}{resnum}{icode}" for chain, aa, resnum, icode in zip(sasa.chain, sequence, sasa.resnum, sasa.icode)]
+                        heatmap = pd.DataFrame(matrix, index=labels, columns=list(AMINO_ACIDS))
+                        heatmap["Unfolding substitutions"] = simba.unfolding(matrix).sum(axis=1)
+                        st.write(f"SimBa-NI ΔΔG of all 19 substitutions at each residue; values ≤ {UNFOLDING_THRESHOLD} are expected to lead to protein unfolding.")
+                        st.dataframe(heatmap)
+                        st.download_button("Download saturation ΔΔG matrix", heatmap.to_csv(), f"{gene_name}_saturation_ddG.csv", "text/csv")
+
+            if variant_file and input_pdb:
+                render_variant_screen(gene_name, variant_file, input_pdb, uniprot_id)
+
+        if show_waterfall:
+            render_waterfall(request_trace)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+"""
+AlphaFold DB model availability from a local accession index.
+
+The index is the sorted, de-duplicated list of UniProt accessions in the
+AlphaFold DB accession listing, saved as a fixed-width NumPy array. It is
+memory-mapped, so a lookup is a binary search that touches a few pages.
+Without an index, availability is checked with a HEAD request that is cached.
+The index lives next to the response cache, or at DRARDT_ALPHAFOLD_INDEX, and is
+reloaded when the file is rebuilt. Once it is older than ALPHAFOLD_INDEX_TTL,
+accessions missing from it are checked remotely, as new models are added.
+
+Usage:
+    python st_alphafold.py --download
+    python st_alphafold.py accession_ids.csv --only human_accessions.txt
+"""
+import os
+import time
+import argparse
+import threading
+import numpy as np
+import st_http
+from st_cache import CACHE_PATH, SOURCE_TTLS, cached_get, get_value, put_value
+
+ALPHAFOLD_ACCESSIONS_URL = "https://ftp.ebi.ac.uk/pub/databases/alphafold/accession_ids.csv"
+ALPHAFOLD_API = "https://alphafold.ebi.ac.uk/api/prediction"
+ALPHAFOLD_ENTRY = "https://alphafold.ebi.ac.uk/entry"
+ALPHAFOLD_INDEX_PATH = os.environ.get("DRARDT_ALPHAFOLD_INDEX",
+                                      os.path.join(os.path.dirname(CACHE_PATH), "alphafold_accessions.npy"))
+ALPHAFOLD_INDEX_TTL = SOURCE_TTLS["alphafold"]
+ACCESSION_DTYPE = "S10"  # UniProt accessions are 6 or 10 characters
+BUILD_CHUNK = 1_000_000
+
+
+def read_accessions(lines):
+    # accession_ids.csv rows: 'A0A009IHW8,1,269,AF-A0A009IHW8-F1,4'; a header line or a plain list also works
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode()
+        accession = line.split(",", 1)[0].strip().upper()
+        if accession and accession.isalnum() and len(accession) <= 10:
+            yield accession
+
+
+class AlphaFoldIndex:
+    def __init__(self, accessions):
+        self.accessions = accessions  # sorted, unique, dtype ACCESSION_DTYPE (possibly a memory map)
+
+    def __len__(self):
+        return len(self.accessions)
+
+    @classmethod
+    def build(cls, accessions, only=None):
+        """
+        Sorted unique array from an iterable of accessions, built in chunks so the
+        full ~200M-entry listing never exists as Python strings at once.
+        """
+        keep = np.unique(np.array(sorted(only), dtype=ACCESSION_DTYPE)) if only else None
+        chunks, chunk = [], []
+        for accession in accessions:
+            chunk.append(accession)
+            if len(chunk) == BUILD_CHUNK:
+                chunks.append(cls._reduce(chunk, keep))
+                chunk = []
+        chunks.append(cls._reduce(chunk, keep))
+        return cls(np.unique(np.concatenate(chunks)))
+
+    @staticmethod
+    def _reduce(chunk, keep):
+        array = np.unique(np.array(chunk, dtype=ACCESSION_DTYPE))
+        return array[np.isin(array, keep)] if keep is not None else array
+
+    def save(self, path):
+        # Written aside and moved into place: running processes may have the old file memory-mapped
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path + ".tmp", "wb") as file:
+            np.save(file, self.accessions)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        return cls(np.load(path, mmap_mode="r"))
+
+    def contains(self, accessions):
+        # Vectorized membership for any number of accessions
+        keys = np.array([accession.upper() for accession in accessions], dtype=ACCESSION_DTYPE)
+        if not len(self.accessions):
+            return np.zeros(len(keys), dtype=bool)
+        positions = np.searchsorted(self.accessions, keys)
+        found = np.asarray(self.accessions[np.minimum(positions, len(self.accessions) - 1)])
+        return (positions < len(self.accessions)) & (found == keys)
+
+    def __contains__(self, accession):
+        return bool(self.contains([accession])[0])
+
+
+_index = None
+_index_stat = None  # (mtime, size) of the loaded file
+_index_lock = threading.Lock()
+
+
+def get_alphafold_index():
+    # None when no index file exists; availability then falls back to HEAD requests
+    global _index, _index_stat
+    try:
+        stat = os.stat(ALPHAFOLD_INDEX_PATH)
+        current = (stat.st_mtime, stat.st_size)
+    except OSError:
+        current = None
+    with _index_lock:
+        if current != _index_stat:
+            _index = AlphaFoldIndex.load(ALPHAFOLD_INDEX_PATH) if current is not None else None
+            _index_stat = current
+        return _index
+
+
+def alphafold_index_fresh():
+    return _index_stat is not None and time.time() - _index_stat[0] < ALPHAFOLD_INDEX_TTL
+
+
+def remote_has_model(uniprot_id):
+    # One cached HEAD per accession; servers that refuse HEAD get the (cached) GET of the prediction API
+    key = f"alphafold:exists:{uniprot_id}"
+    exists = get_value(key, "alphafold")
+    if exists is None:
+        url = f"{ALPHAFOLD_API}/{uniprot_id}"
+        status = st_http.head(url).status_code
+        if status not in (200, 404):
+            status = cached_get(url, "alphafold").status_code
+        if status not in (200, 404):
+            raise RuntimeError(f"AlphaFold DB answered HTTP {status} for {uniprot_id}")
+        exists = status == 200
+        put_value(key, "alphafold", exists)
+    return exists
+
+
+def has_alphafold_model(uniprot_id):
+    # Models are added, not removed: only a stale index sends its misses upstream
+    index = get_alphafold_index()
+    if index is not None and (uniprot_id in index or alphafold_index_fresh()):
+        return uniprot_id in index
+    return remote_has_model(uniprot_id)
+
+
+def alphafold_entry_url(uniprot_id):
+    return f"{ALPHAFOLD_ENTRY}/{uniprot_id}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the AlphaFold DB accession index.")
+    parser.add_argument("listing", nargs="?", help="local copy of accession_ids.csv")
+    parser.add_argument("--download", action="store_true", help="stream the listing from the EBI FTP server")
+    parser.add_argument("--only", help="file with the accessions to keep (e.g. the human proteome), one per line")
+    parser.add_argument("--out", default=ALPHAFOLD_INDEX_PATH, help="index file to write (.npy)")
+    args = parser.parse_args(argv)
+
+    only = None
+    if args.only:
+        with open(args.only) as file:
+            only = set(read_accessions(file))
+
+    if args.download:
+        response = st_http.get(ALPHAFOLD_ACCESSIONS_URL, stream=True, timeout=(10, 600))
+        response.raise_for_status()
+        index = AlphaFoldIndex.build(read_accessions(response.iter_lines()), only)
+    elif args.listing:
+        with open(args.listing) as file:
+            index = AlphaFoldIndex.build(read_accessions(file), only)
+    else:
+        parser.error("give the accession listing, or use --download")
+    index.save(args.out)
+    print(f"Indexed {len(index)} AlphaFold DB accessions into {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Headless DRARDT scoring for gene panels.
+
+Usage:
+    python st_batch.py genes.txt --email you@example.org --output scores.tsv
+
+Rows are written as soon as each gene finishes. Genes scored without errors are
+recorded in a checkpoint file next to the output, so rerunning the same command
+resumes an interrupted run and retries the genes that hit timeouts or upstream
+failures. A finished run leaves one row per gene in the output.
+"""
+import os
+import csv
+import sys
+import argparse
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import st_http
+import st_metrics
+from st_pubmed import set_ncbi_contact
+from st_kegg import prebuild_kegg_index
+from st_string import CHUNK_SIZE as STRING_CHUNK_SIZE, fetch_string_partners
+from st_fetch import SOURCE_TIMEOUTS, fetch_gene_evidence, iter_evidence
+from st_params import (get_publication_count_score, get_interactors_score, get_KEGG_score,
+                       get_PDB_score, get_AF2_score, calculate_DRARDT_score)
+
+COLUMNS = [
+    "gene", "uniprot_id", "pub_count", "interactors_count", "pathways_count", "pdb_count",
+    "alphafold", "pub_count_score", "interactors_score", "KEGG_score", "PDB_score",
+    "AF2_score", "DRARDT_score", "errors",
+]
+# The one error that a rerun cannot fix
+NO_UNIPROT_ENTRY = "no human UniProt entry"
+
+
+def read_gene_list(path):
+    # One gene per line (first tab/comma separated column); blank lines and '#' comments are skipped
+    seen = set()
+    with open(path) as file:
+        for line in file:
+            gene = line.split('#', 1)[0].replace(',', '\t').split('\t')[0].strip()
+            if gene and gene not in seen:
+                seen.add(gene)
+                yield gene
+
+
+def evidence_row(gene_name, values, errors):
+    row = dict.fromkeys(COLUMNS, "")
+    row["gene"] = gene_name
+    row["uniprot_id"] = values.get("uniprot_id") or ""
+
+    scores = {}
+    if "publications" in values:
+        row["pub_count"] = values["publications"]
+        scores["pub_count_score"] = get_publication_count_score(values["publications"])
+    if "interactors" in values:
+        row["interactors_count"] = values["interactors"][0]
+        scores["interactors_score"] = get_interactors_score(values["interactors"][0])
+    if "pathways" in values:
+        row["pathways_count"] = values["pathways"]
+        scores["KEGG_score"] = get_KEGG_score(values["pathways"])
+    if values.get("structures") is not None:
+        # Scored from the count, not the stored tuple, so cached evidence follows the current cut points
+        row["pdb_count"] = values["structures"][0]
+        scores["PDB_score"] = get_PDB_score(row["pdb_count"])
+    if "alphafold" in values and row["uniprot_id"]:
+        row["alphafold"] = values["alphafold"] or ""
+        scores["AF2_score"] = get_AF2_score(values["alphafold"])
+    row.update(scores)
+
+    if len(scores) == 5:
+        row["DRARDT_score"] = calculate_DRARDT_score(scores["pub_count_score"], scores["interactors_score"],
+                                                     scores["KEGG_score"], scores["PDB_score"], scores["AF2_score"])
+    if not row["uniprot_id"] and "uniprot_id" not in errors:
+        errors = dict(errors, uniprot_id=NO_UNIPROT_ENTRY)
+    row["errors"] = "; ".join(f"{name}: {error}" for name, error in sorted(errors.items()))
+    return row
+
+
+def score_gene(gene_name, source_executor, timeouts=SOURCE_TIMEOUTS):
+    values, errors = {}, {}
+    futures = fetch_gene_evidence(gene_name, source_executor)
+    for name, value, error in iter_evidence(futures, timeouts):
+        if error is not None:
+            errors[name] = error
+        else:
+            values[name] = value
+    return evidence_row(gene_name, values, errors)
+
+
+def prefetch_string_partners(genes):
+    # One STRING request per block of genes; per-gene lookups then hit the cache
+    if genes:
+        try:
+            fetch_string_partners(genes)
+        except Exception:
+            pass  # each gene retries on its own and reports its error in the output row
+
+
+# Columns written as integers to parquet; the rest are strings
+INT_COLUMNS = (
+    "pub_count", "interactors_count", "pathways_count", "pdb_count", "pub_count_score", "interactors_score",
+    "KEGG_score", "PDB_score", "AF2_score", "DRARDT_score",
+)
+
+
+def is_done(row):
+    return row["errors"] in ("", f"uniprot_id: {NO_UNIPROT_ENTRY}")
+
+
+class TsvWriter:
+    def __init__(self, path):
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, "a", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=COLUMNS, delimiter="\t")
+        if not exists:
+            self._writer.writeheader()
+
+    def write(self, row):
+        # Returns the rows now on disk
+        self._writer.writerow(row)
+        self._file.flush()
+        return [row]
+
+    def close(self):
+        self._file.close()
+        return []
+
+
+def parquet_schema():
+    import pyarrow as pa
+    return pa.schema([(column, pa.int64() if column in INT_COLUMNS else pa.string()) for column in COLUMNS])
+
+
+def parquet_values(row):
+    # Missing counts and scores become nulls; part files of older runs stored everything as strings
+    return {column: (None if row[column] in ("", None) else int(row[column])) if column in INT_COLUMNS
+            else ("" if row[column] is None else str(row[column])) for column in COLUMNS}
+
+
+def parquet_parts(path):
+    # path, then path.part1, path.part2, ... in the order they were written
+    root, ext = os.path.splitext(path)
+    parts, part = [], 0
+    while os.path.exists(path if part == 0 else f"{root}.part{part}{ext}"):
+        parts.append(path if part == 0 else f"{root}.part{part}{ext}")
+        part += 1
+    return parts
+
+
+class ParquetWriter:
+    # Every block of rows is written as its own part file and closed before its genes
+    # are checkpointed: a parquet file without its footer cannot be read back
+
+    def __init__(self, path, rows_per_part=500):
+        self._path = path
+        self._rows = []
+        self._rows_per_part = rows_per_part
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self._rows_per_part:
+            return self.flush()
+        return []
+
+    def flush(self):
+        rows, self._rows = self._rows, []
+        if rows:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            root, ext = os.path.splitext(self._path)
+            count = len(parquet_parts(self._path))
+            path = self._path if count == 0 else f"{root}.part{count}{ext}"
+            pq.write_table(pa.Table.from_pylist([parquet_values(row) for row in rows], schema=parquet_schema()),
+                           path + ".tmp")
+            os.replace(path + ".tmp", path)
+        return rows
+
+    def close(self):
+        return self.flush()
+
+
+def open_writer(path):
+    if path.endswith(".parquet"):
+        return ParquetWriter(path)
+    return TsvWriter(path)
+
+
+def read_output(path):
+    # Every row of a st_batch output, part files included, in the order written
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for part in parquet_parts(path):
+            yield from pq.read_table(part).to_pylist()
+    elif os.path.exists(path):
+        with open(path, newline="") as file:
+            yield from csv.DictReader(file, delimiter="\t")
+
+
+def write_output(path, rows):
+    # Replace `path` (and its parquet part files) with exactly these rows
+    tmp = path + ".tmp"
+    if path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.Table.from_pylist([parquet_values(row) for row in rows], schema=parquet_schema()), tmp)
+        stale = parquet_parts(path)[1:]
+    else:
+        with open(tmp, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=COLUMNS, delimiter="\t")
+            writer.writeheader()
+            writer.writerows({column: "" if row[column] is None else row[column] for column in COLUMNS} for row in rows)
+        stale = []
+    os.replace(tmp, path)
+    for part in reversed(stale):  # highest first, so an interrupted cleanup leaves no gap in the numbering
+        os.remove(part)
+
+
+def compact_output(path):
+    """
+    Keep one row per gene in a st_batch output: the last checkpointed row, or
+    the last row when every attempt failed. Merges parquet part files into `path`.
+    """
+    rows = {}
+    for row in read_output(path):
+        previous = rows.get(row["gene"])
+        if previous is None or is_done(row) or not is_done(previous):
+            rows[row["gene"]] = row
+    write_output(path, list(rows.values()))
+    return len(rows)
+
+
+def run_batch(genes, output, gene_workers=16, timeouts=SOURCE_TIMEOUTS, progress=None):
+    """
+    Score every gene in `genes` and stream one row per gene to `output` (.tsv or .parquet).
+
+    Genes listed in the checkpoint file `<output>.done` are skipped; a gene is
+    only listed there once it was scored without errors and its row is on disk.
+    When the run finishes the output is compacted to one row per gene. At most
+    `gene_workers` genes are in flight, so memory stays flat for proteome-sized lists.
+    Per-host concurrency and rate limits are enforced by the shared st_http client.
+    """
+    checkpoint_path = output + ".done"
+    done = set()
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as file:
+            done = {line.strip() for line in file if line.strip()}
+
+    source_workers = st_http.MAX_CONCURRENCY
+
+    writer = open_writer(output)
+    checkpoint = open(checkpoint_path, "a")
+    source_executor = ThreadPoolExecutor(max_workers=source_workers)
+    gene_executor = ThreadPoolExecutor(max_workers=gene_workers)
+    written = 0
+
+    def save(rows):
+        # Only rows the writer reports as on disk are checkpointed
+        for row in rows:
+            if is_done(row):
+                checkpoint.write(row["gene"] + "\n")
+        checkpoint.flush()
+
+    try:
+        pending = set()
+        todo = (gene for gene in genes if gene not in done)
+        queue = deque()
+        exhausted = False
+        while pending or queue or not exhausted:
+            while len(pending) < gene_workers:
+                if not queue and not exhausted:
+                    block = list(islice(todo, STRING_CHUNK_SIZE))
+                    exhausted = len(block) < STRING_CHUNK_SIZE
+                    prefetch_string_partners(block)
+                    queue.extend(block)
+                if not queue:
+                    break
+                pending.add(gene_executor.submit(score_gene, queue.popleft(), source_executor, timeouts))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                row = future.result()
+                save(writer.write(row))
+                written += 1
+                if progress is not None:
+                    progress(row)
+    finally:
+        try:
+            save(writer.close())
+        finally:
+            checkpoint.close()
+            gene_executor.shutdown(wait=False, cancel_futures=True)
+            source_executor.shutdown(wait=False, cancel_futures=True)
+    compact_output(output)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a list of genes with DRARDT without the web app.")
+    parser.add_argument("gene_file", help="file with one gene name per line")
+    parser.add_argument("--email", required=True, help="contact email sent to NCBI E-utilities")
+    parser.add_argument("--api-key", help="NCBI API key (raises the E-utilities limit to 10 requests/s)")
+    parser.add_argument("--output", default="drardt_scores.tsv", help="output .tsv or .parquet file")
+    parser.add_argument("--workers", type=int, default=16, help="genes scored concurrently")
+    parser.add_argument("--metrics", help="write per-stage latency, cache and HTTP metrics (Prometheus text) here")
+    args = parser.parse_args(argv)
+
+    set_ncbi_contact(args.email, args.api_key)
+    prebuild_kegg_index()
+
+    def progress(row):
+        status = row["DRARDT_score"] if row["DRARDT_score"] != "" else "incomplete"
+        print(f"{row['gene']}\t{status}", file=sys.stderr)
+
+    try:
+        count = run_batch(read_gene_list(args.gene_file), args.output, args.workers, progress=progress)
+    finally:
+        if args.metrics:
+            st_metrics.write_prometheus(args.metrics)
+    print(f"Scored {count} genes into {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,512 @@
+"""
+DRARDT benchmark harness.
+
+Every upstream (UniProt, NCBI E-utilities, STRING, KEGG, AlphaFold) is replaced
+by a local stand-in server that replays recorded responses and synthesises the
+rest, with configurable latency and error injection. The pipeline of st-app.py
+then runs headlessly and per-stage timings are written as JSON.
+
+Usage:
+    python st_bench.py --output bench_results.json
+    python st_bench.py --genes 1 100 1000 --latency-ms 80 --error-rate 0.02
+    python st_bench.py --fixtures bench_fixtures.jsonl --record TP53 BRCA1   # capture live responses
+    python st_bench.py --startup                                             # cold-start time and memory
+
+Synthetic genes are named GENE1, GENE2, ...; recorded fixtures take precedence
+over synthetic answers for the requests they cover.
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import zlib
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import numpy as np
+
+import st_http
+import st_cache
+import st_pubmed
+import st_uniprot
+import st_kegg
+import st_sasa
+from st_fetch import GENE_SOURCES, UNIPROT_SOURCES, collect_gene_evidence
+from st_params import (get_publication_count_score, get_interactors_score, get_KEGG_score,
+                       get_AF2_score, calculate_DRARDT_score)
+from st_missense2 import parse_freesasa_output, check_pdb_coverage_batch
+from st_simba import SimbaModel, AMINO_ACIDS, to_one_letter
+
+SYNTHETIC_KEGG_GENES = 20000
+
+
+def fixture_key(method, host, path, query, body=""):
+    return "|".join((method, host, path, urlencode(sorted(parse_qsl(query, keep_blank_values=True))), body))
+
+
+def load_fixtures(path):
+    fixtures = {}
+    if path and os.path.exists(path):
+        with open(path) as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    fixtures[record["key"]] = (record["status"], record["content_type"], record["body"])
+    return fixtures
+
+
+def _gene_number(name):
+    match = re.fullmatch(r"GENE(\d+)", name.strip().upper())
+    return int(match.group(1)) if match else zlib.crc32(name.upper().encode()) % 100000
+
+
+def _accession(number):
+    return f"Q{number:05d}"
+
+
+def synthetic_uniprot_entry(number):
+    entry = {
+        "primaryAccession": _accession(number),
+        "sequence": {"length": 200 + number % 800},
+        "comments": [],
+        "uniProtKBCrossReferences": [],
+    }
+    if number % 3 == 0:
+        entry["comments"].append({"commentType": "DISEASE",
+                                  "disease": {"diseaseId": f"Bench disease {number}", "description": "Synthetic."}})
+    for idx in range(number % 7):
+        entry["uniProtKBCrossReferences"].append({"database": "PDB", "id": f"{idx}B{number % 100:02d}", "properties": [
+            {"key": "Method", "value": "X-ray"}, {"key": "Resolution", "value": f"{1.5 + idx * 0.3:.2f} A"},
+            {"key": "Chains", "value": f"A/B={1 + idx * 20}-{150 + idx * 30}"}]})
+    return entry
+
+
+def synthetic_response(method, host, path, query, body):
+    # (status, content type, body) for any request the fixtures do not cover
+    params = dict(parse_qsl(query))
+    if host == "rest.uniprot.org" and path.endswith("/search"):
+        term = params.get("query", "")
+        match = re.match(r"(gene|accession):([^ +]+)", term)
+        if match is None:
+            return 200, "application/json", json.dumps({"results": []})
+        number = _gene_number(match.group(2)) if match.group(1) == "gene" else int(match.group(2)[1:])
+        return 200, "application/json", json.dumps({"results": [synthetic_uniprot_entry(number)]})
+
+    if host == "eutils.ncbi.nlm.nih.gov":
+        gene = params.get("term", "x").split(" ")[0]
+        years = re.search(r"(\d{4}):(\d{4})", params.get("term", ""))
+        span = int(years.group(2)) - int(years.group(1)) + 1 if years else 1
+        count = (_gene_number(gene) * 37 % 17) * span
+        return 200, "application/json", json.dumps({"esearchresult": {"count": str(count)}})
+
+    if host == "string-db.org":
+        form = dict(parse_qsl(body))
+        if path.endswith("/get_string_ids"):
+            lines = ["queryIndex\tqueryItem\tstringId\tncbiTaxonId\ttaxonName\tpreferredName\tannotation"]
+            for idx, gene in enumerate(form.get("identifiers", "").split("\r")):
+                lines.append(f"{idx}\t{gene}\t9606.{gene}\t9606\tHomo sapiens\t{gene}\tbench protein")
+            return 200, "text/tab-separated-values", "\n".join(lines) + "\n"
+        lines = ["stringId_A\tstringId_B\tpreferredName_A\tpreferredName_B\tncbiTaxonId\tscore\tnscore\tfscore\tpscore\tascore\tescore\tdscore\ttscore"]
+        for gene in form.get("identifiers", "").split("\r"):
+            number = _gene_number(gene)
+            for partner in range(number % 9):
+                escore = ((number + partner) % 10) / 10
+                lines.append(f"9606.{gene}\t9606.P{partner}\t{gene}\tGENE{number + partner + 1}\t9606\t0.9\t0\t0\t0\t0\t{escore}\t0\t0")
+        return 200, "text/tab-separated-values", "\n".join(lines) + "\n"
+
+    if host == "rest.kegg.jp":
+        genes = range(1, SYNTHETIC_KEGG_GENES + 1)
+        if path == "/link/pathway/hsa":
+            text = "".join(f"hsa:{i}\tpath:hsa{i % 300:05d}\n" + (f"hsa:{i}\tpath:hsa{(i * 7) % 300:05d}\n" if i % 2 else "") for i in genes)
+        elif path == "/list/hsa":
+            text = "".join(f"hsa:{i}\tCDS\t1:1..2\tGENE{i}; bench gene {i}\n" for i in genes)
+        elif path == "/list/pathway/hsa":
+            text = "".join(f"path:hsa{i:05d}\tBench pathway {i} - Homo sapiens (human)\n" for i in range(300))
+        elif path == "/conv/ncbi-geneid/hsa":
+            text = "".join(f"ncbi-geneid:{i}\thsa:{i}\n" for i in genes)
+        else:
+            return 404, "text/plain", ""
+        return 200, "text/plain", text
+
+    if host == "alphafold.ebi.ac.uk":
+        accession = path.rstrip("/").rsplit("/", 1)[-1]
+        number = int(accession[1:]) if accession[1:].isdigit() else 0
+        if number % 4 == 0:
+            return 404, "application/json", json.dumps({"detail": "Not found"})
+        return 200, "application/json", json.dumps([{"entryId": f"AF-{accession}-F1"}])
+
+    return 404, "text/plain", ""
+
+
+class UpstreamStandIn:
+    """
+    Threaded local HTTP server answering '/<upstream host>/<path>' requests, the
+    layout produced by st_http.set_upstream_override.
+    """
+
+    def __init__(self, fixtures=None, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=0):
+        self.fixtures = fixtures or {}
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _answer(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode() if length else ""
+                status, content_type, payload = stand_in.respond(method, self.path, body)
+                data = payload.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if method != "HEAD":
+                    self.wfile.write(data)
+
+            def do_GET(self):
+                self._answer("GET")
+
+            def do_POST(self):
+                self._answer("POST")
+
+            def do_HEAD(self):
+                self._answer("HEAD")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def respond(self, method, raw_path, body):
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            fail = self.random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        time.sleep(delay)
+        if fail:
+            return 503, "text/plain", "injected error"
+        parts = urlsplit(raw_path)
+        host, _, path = parts.path.lstrip("/").partition("/")
+        key = fixture_key("GET" if method == "HEAD" else method, host, "/" + path, parts.query, body)
+        if key in self.fixtures:
+            return self.fixtures[key]
+        return synthetic_response(method, host, "/" + path, parts.query, body)
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def reset_state(workdir):
+    # Cold caches: fresh on-disk stores and empty in-process memos
+    shutil.rmtree(workdir, ignore_errors=True)
+    os.makedirs(workdir)
+    st_cache.set_cache(st_cache.ResponseCache(os.path.join(workdir, "responses.sqlite")))
+    st_pubmed.set_store(st_pubmed.PublicationStore(os.path.join(workdir, "pubmed.sqlite")))
+    st_uniprot._records.clear()
+    st_kegg._index = None
+    st_kegg.KEGG_INDEX_PATH = os.path.join(workdir, "kegg_index.json.gz")
+    st_sasa._memory.clear()
+    st_sasa._store = None
+    st_sasa.SASA_CACHE_PATH = os.path.join(workdir, "sasa.sqlite")
+
+
+def timed(timings, stage, fn, *args):
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings.setdefault(stage, []).append(time.perf_counter() - start)
+
+
+def run_gene_stages(gene_name, timings):
+    # The sequence of st-app.py's main(), one stage at a time
+    uniprot_id = timed(timings, "id_resolution", GENE_SOURCES["uniprot_id"], gene_name)
+    pub_count = timed(timings, "publications", GENE_SOURCES["publications"], gene_name)
+    interactors = timed(timings, "interactors", GENE_SOURCES["interactors"], gene_name)
+    pathways = timed(timings, "pathways", GENE_SOURCES["pathways"], gene_name)
+    if uniprot_id:
+        for name in ("disease", "length"):
+            timed(timings, name, UNIPROT_SOURCES[name], uniprot_id)
+        structures = timed(timings, "structures", UNIPROT_SOURCES["structures"], uniprot_id)
+        alphafold = timed(timings, "alphafold", UNIPROT_SOURCES["alphafold"], uniprot_id)
+        timed(timings, "scoring", lambda: calculate_DRARDT_score(
+            get_publication_count_score(pub_count), get_interactors_score(interactors[0]),
+            get_KEGG_score(pathways), structures[2], get_AF2_score(alphafold)))
+    return uniprot_id
+
+
+def bench_genes(count, timings, concurrent):
+    genes = [f"GENE{i}" for i in range(1, count + 1)]
+    start = time.perf_counter()
+    if concurrent:
+        from st_batch import run_batch
+        with tempfile.TemporaryDirectory() as tmp:
+            run_batch(genes, os.path.join(tmp, "scores.tsv"))
+    else:
+        for gene in genes:
+            run_gene_stages(gene, timings)
+    return time.perf_counter() - start
+
+
+def synthetic_pdb(n_residues, n_chains=1):
+    # Helical backbone + CB model: enough atoms for realistic SASA timings
+    residues = ["ALA", "LEU", "SER", "TRP", "GLY", "LYS", "GLU", "VAL", "ARG", "PHE"]
+    lines, serial = [], 1
+    for chain_idx in range(n_chains):
+        chain = chr(ord("A") + chain_idx % 26)
+        for idx in range(n_residues):
+            resname = residues[idx % len(residues)]
+            theta = idx * 100 / 180 * np.pi
+            z = idx * 1.5
+            offset = chain_idx * 25.0
+            atoms = [(" N  ", 2.0, -0.3, -0.5, "N"), (" CA ", 2.3, 0.0, 0.0, "C"),
+                     (" C  ", 2.0, 0.3, 0.5, "C"), (" O  ", 3.2, 0.3, 0.7, "O")]
+            if resname != "GLY":
+                atoms.append((" CB ", 3.8, 0.0, 0.0, "C"))
+            for name, radius, dtheta, dz, element in atoms:
+                x = radius * np.cos(theta + dtheta) + offset
+                y = radius * np.sin(theta + dtheta)
+                lines.append("ATOM  %5d %4s %3s %1s%4d    %8.3f%8.3f%8.3f%6.2f%6.2f          %2s"
+                             % (serial % 100000, name, resname, chain, idx % 10000 + 1, x, y, z + dz, 1.0, 0.0, element))
+                serial += 1
+    lines.append("END")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def format_rsa(sasa):
+    # FreeSASA-style RSA text for the parser benchmark
+    out = io.StringIO()
+    for row in range(len(sasa)):
+        values = " ".join("N/A" if np.isnan(value) else f"{value:.2f}" for value in sasa.areas[row])
+        out.write(f"RES {sasa.resname[row]:>3} {sasa.chain[row]}{sasa.resnum[row]:>4}{sasa.icode[row] or ' '} {values}\n")
+    return out.getvalue()
+
+
+def bench_structure(label, n_residues, n_chains, timings, uniprot_id=None):
+    pdb_bytes = synthetic_pdb(n_residues, n_chains)
+    sasa = timed(timings, f"sasa[{label}]", st_sasa.compute_sasa, pdb_bytes)
+    timed(timings, f"sasa_cached[{label}]", st_sasa.cached_compute_sasa, pdb_bytes)
+    timed(timings, f"sasa_cached[{label}]", st_sasa.cached_compute_sasa, pdb_bytes)
+    rsa_text = format_rsa(sasa)
+    timed(timings, f"parse_freesasa_output[{label}]", parse_freesasa_output, rsa_text)
+
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, len(sasa), size=min(1000, len(sasa)))
+    wt = list(to_one_letter(sasa.resname[rows]))
+    mut = [AMINO_ACIDS[idx] for idx in rng.integers(0, 20, size=len(rows))]
+    simba = SimbaModel("simba.tsv")
+
+    def ddg_loop():
+        found = sasa.rows(sasa.resnum[rows], sasa.chain[rows], sasa.icode[rows])
+        return simba.ddg(wt, mut, sasa.rsa_at(found))
+
+    timed(timings, f"ddg_loop[{label}]", ddg_loop)
+    timed(timings, f"saturation[{label}]", simba.saturation, to_one_letter(sasa.resname), sasa.rsa)
+    from st_structure import StructureModel
+    from st_neighbourhood import compute_neighbourhood
+    timed(timings, f"neighbourhood[{label}]", compute_neighbourhood, StructureModel.parse(pdb_bytes))
+    if uniprot_id:
+        timed(timings, f"coverage[{label}]", check_pdb_coverage_batch, uniprot_id, sasa.resnum)
+    return len(sasa)
+
+
+def summarize(timings):
+    return {stage: {"n": len(values), "mean_s": statistics.fmean(values), "min_s": min(values),
+                    "max_s": max(values), "total_s": sum(values)}
+            for stage, values in timings.items()}
+
+
+def run_benchmarks(args):
+    results = {
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "settings": {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "error_rate": args.error_rate,
+                     "rate_limits": not args.no_rate_limit},
+        "scenarios": [],
+    }
+    if args.no_rate_limit:
+        for host in list(st_http.HOST_LIMITS):
+            st_http.set_host_limit(host, st_http.MAX_CONCURRENCY, 1e6, 1000)
+
+    stand_in = UpstreamStandIn(load_fixtures(args.fixtures), args.latency_ms, args.jitter_ms, args.error_rate)
+    workdir = tempfile.mkdtemp(prefix="drardt-bench-")
+    st_http.set_upstream_override(stand_in.url)
+    try:
+        with stand_in:
+            # Single gene, stage by stage, cold then warm
+            reset_state(workdir)
+            for cache_state in ("cold", "warm"):
+                timings = {}
+                before = stand_in.requests
+                run_gene_stages("GENE42", timings)
+                timed(timings, "concurrent_fetch", lambda: collect_gene_evidence("GENE43" if cache_state == "cold" else "GENE42"))
+                results["scenarios"].append({"name": "single_gene_stages", "cache": cache_state,
+                                             "upstream_requests": stand_in.requests - before, "stages": summarize(timings)})
+
+            for count in args.genes:
+                for cache_state in ("cold", "warm"):
+                    if cache_state == "cold":
+                        reset_state(workdir)
+                    timings = {}
+                    before = stand_in.requests
+                    wall = bench_genes(count, timings, concurrent=True)
+                    results["scenarios"].append({"name": f"batch_{count}_genes", "cache": cache_state, "wall_s": wall,
+                                                 "genes_per_s": count / wall if wall else None,
+                                                 "upstream_requests": stand_in.requests - before})
+
+            for label, n_residues, n_chains in (("small", args.small_residues, 1), ("large", args.large_residues, 4)):
+                timings = {}
+                residues = bench_structure(label, n_residues, n_chains, timings, "Q00045")
+                results["scenarios"].append({"name": f"structure_{label}", "residues": residues, "stages": summarize(timings)})
+            results["upstream"] = {"requests": stand_in.requests, "injected_errors": stand_in.errors}
+    finally:
+        st_http.set_upstream_override(None)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+# Entry points measured by --startup: a module to import, or a script to run (the app runs in Streamlit's bare mode)
+STARTUP_TARGETS = {
+    "python": None,
+    "app": "st-app.py",
+    "batch": "st_batch",
+    "service": "st_service",
+    "scoretable": "st_scoretable",
+}
+HEAVY_MODULES = ("streamlit", "pandas", "altair", "aiohttp", "pyarrow", "freesasa", "Bio")
+_STARTUP_PROBE = """
+import sys, json, time, runpy, resource
+start = time.perf_counter()
+target = sys.argv[1]
+if target.endswith(".py"):
+    runpy.run_path(target, run_name="__main__")
+elif target:
+    __import__(target)
+elapsed = time.perf_counter() - start
+try:
+    # VmHWM restarts at exec; ru_maxrss can carry over the parent's peak
+    with open("/proc/self/status") as status:
+        peak_kb = next(int(line.split()[1]) for line in status if line.startswith("VmHWM"))
+except OSError:
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"import_s": elapsed, "peak_rss_mb": peak_kb / 1024,
+                  "heavy_modules": [name for name in sys.argv[2:] if name in sys.modules]}))
+"""
+
+
+def bench_startup(repeats=5):
+    """
+    Cold start of each entry point in a fresh interpreter: time to import (or run
+    the app script once), peak RSS, and which heavy optional modules got loaded.
+    Medians over `repeats` runs; `python` is the bare interpreter for reference.
+    """
+    import subprocess
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for name, target in STARTUP_TARGETS.items():
+        runs = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = subprocess.run([sys.executable, "-c", _STARTUP_PROBE, target or "", *HEAVY_MODULES], cwd=here,
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append(dict(json.loads(output.strip().splitlines()[-1]), process_s=time.perf_counter() - start))
+        results.append({"name": f"startup_{name}",
+                        "import_s": statistics.median(run["import_s"] for run in runs),
+                        "process_s": statistics.median(run["process_s"] for run in runs),
+                        "peak_rss_mb": statistics.median(run["peak_rss_mb"] for run in runs),
+                        "heavy_modules": runs[-1]["heavy_modules"]})
+    return results
+
+
+def record_fixtures(genes, path):
+    """
+    Run the single-gene stages against the live upstreams and append every
+    response to a JSON-lines fixture file.
+    """
+    original = st_http.request
+    records = []
+
+    def recording(method, url, **kwargs):
+        response = original(method, url, **kwargs)
+        parts = urlsplit(url)
+        query = parts.query
+        if kwargs.get("params"):
+            query = "&".join(filter(None, (query, urlencode(kwargs["params"]))))
+        body = urlencode(kwargs["data"]) if isinstance(kwargs.get("data"), dict) else ""
+        records.append({"key": fixture_key(method, parts.netloc.lower(), parts.path, query, body),
+                        "status": response.status_code,
+                        "content_type": response.headers.get("Content-Type", "text/plain"),
+                        "body": response.text})
+        return response
+
+    st_http.request = recording
+    try:
+        for gene in genes:
+            run_gene_stages(gene, {})
+    finally:
+        st_http.request = original
+    with open(path, "a") as file:
+        for record in records:
+            file.write(json.dumps(record) + "\n")
+    return len(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark DRARDT against a local stand-in for its upstreams.")
+    parser.add_argument("--genes", type=int, nargs="+", default=[1, 100, 1000], help="batch sizes to run")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mean upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="uniform latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--no-rate-limit", action="store_true", help="lift the per-host rate limits of st_http")
+    parser.add_argument("--small-residues", type=int, default=300)
+    parser.add_argument("--large-residues", type=int, default=5000, help="residues per chain (4 chains)")
+    parser.add_argument("--fixtures", default="bench_fixtures.jsonl", help="recorded responses (JSON lines)")
+    parser.add_argument("--record", nargs="+", metavar="GENE", help="record live responses for these genes and exit")
+    parser.add_argument("--startup", action="store_true", help="only measure cold-start time and memory of the entry points")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per entry point for --startup")
+    parser.add_argument("--output", default="bench_results.json", help="machine-readable results")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        count = record_fixtures(args.record, args.fixtures)
+        print(f"Recorded {count} responses into {args.fixtures}", file=sys.stderr)
+        return
+
+    if args.startup:
+        results = {"platform": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+                   "scenarios": bench_startup(args.repeats)}
+    else:
+        results = run_benchmarks(args)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    for scenario in results["scenarios"]:
+        headline = {key: value for key, value in scenario.items() if key != "stages"}
+        print(json.dumps(headline), file=sys.stderr)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
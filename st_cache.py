@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import requests
+import st_http
+import st_metrics
+
+CACHE_PATH = os.environ.get("DRARDT_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "drardt", "responses.sqlite"))
+MAX_CACHE_BYTES = int(os.environ.get("DRARDT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+DAY = 24 * 60 * 60
+
+# How long a stored response is served without asking the upstream again
+SOURCE_TTLS = {
+    "pubmed": DAY,        # publication counts change daily
+    "uniprot": 7 * DAY,   # PDB cross-references and annotations weekly
+    "string": 30 * DAY,
+    "kegg": 30 * DAY,
+    "alphafold": 30 * DAY,
+}
+DEFAULT_TTL = DAY
+
+# Status codes worth remembering: 404 is a valid "no such entry" answer (e.g. AlphaFold)
+CACHEABLE_STATUS = (200, 404)
+
+
+def normalize_key(url, params=None):
+    # Lower-case scheme/host and sort the query so equivalent requests share one entry
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query += list(params.items())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(sorted(query)), ""))
+
+
+class CachedResponse:
+    # The subset of requests.Response used by the fetch functions
+
+    def __init__(self, url, status_code, text, from_cache=False, fetched_at=None):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.from_cache = from_cache
+        # When the upstream produced (or last revalidated) this answer
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+class ResponseCache:
+    """
+    SQLite-backed store of upstream responses with a TTL per source and an LRU size cap.
+
+    Entries past their TTL are kept so they can be revalidated with ETag/Last-Modified.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES, ttls=SOURCE_TTLS):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, source TEXT, status INTEGER, body BLOB,"
+            " etag TEXT, last_modified TEXT, fetched_at REAL, accessed_at REAL, size INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at)")
+        # Stored bytes, kept in the file so every process sharing it sees one total
+        self._db.execute("CREATE TABLE IF NOT EXISTS totals (name TEXT PRIMARY KEY, bytes INTEGER)")
+        with self._transaction():
+            self._recount()
+
+    @contextmanager
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _recount(self):
+        return self._db.execute(
+            "INSERT OR REPLACE INTO totals VALUES ('responses', (SELECT COALESCE(SUM(size), 0) FROM responses))"
+            " RETURNING bytes"
+        ).fetchone()[0]
+
+    def _add_bytes(self, delta):
+        total = self._db.execute("UPDATE totals SET bytes = bytes + ? WHERE name = 'responses' RETURNING bytes",
+                                 (delta,)).fetchone()
+        if total is None or total[0] < 0:
+            return self._recount()
+        return total[0]
+
+    def count(self, event, n=1):
+        with self._lock:
+            self.stats[event] += n
+
+    def ttl(self, source):
+        return self.ttls.get(source, DEFAULT_TTL)
+
+    def lookup(self, key):
+        # Returns (status, body, etag, last_modified, fetched_at) or None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, body, etag, last_modified, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return row
+
+    def is_fresh(self, source, fetched_at):
+        return time.time() - fetched_at < self.ttl(source)
+
+    def store(self, key, source, status, body, etag=None, last_modified=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        now = time.time()
+        with self._lock, self._transaction():
+            previous = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, source, status, body, etag, last_modified, now, now, len(body)),
+            )
+            total = self._add_bytes(len(body) - (previous[0] if previous else 0))
+            if total > self.max_bytes:
+                self._evict(total)
+
+    def touch(self, key):
+        # A 304 answer: the stored body is still current
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+
+    def _evict(self, total):
+        # Walk the LRU index only as far as needed, then drop that many oldest entries in one
+        # statement; the freed bytes are the sizes of the rows it actually deleted
+        count = freed = 0
+        for (size,) in self._db.execute("SELECT size FROM responses ORDER BY accessed_at"):
+            count += 1
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        deleted = self._db.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?) RETURNING size",
+            (count,),
+        ).fetchall()
+        self._add_bytes(-sum(size for (size,) in deleted))
+        self.stats["evictions"] += len(deleted)
+
+    def clear(self):
+        with self._lock, self._transaction():
+            self._db.execute("DELETE FROM responses")
+            self._recount()
+
+    def size(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def set_cache(cache):
+    # Swap the shared cache, e.g. for an in-memory one in batch jobs or benchmarks
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def cached_get(url, source, params=None, headers=None):
+    """
+    GET a URL through the shared response cache.
+
+    Fresh entries are served locally; stale ones are revalidated with the stored
+    ETag/Last-Modified validators when the upstream provided them.
+    """
+    cache = get_cache()
+    key = normalize_key(url, params)
+    entry = cache.lookup(key)
+    headers = dict(headers or {})
+
+    if entry is not None:
+        status, body, etag, last_modified, fetched_at = entry
+        if cache.is_fresh(source, fetched_at):
+            cache.count(f"{source}.hit")
+            st_metrics.cache_event(source, "hit")
+            return CachedResponse(url, status, body.decode("utf-8"), from_cache=True, fetched_at=fetched_at)
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    response = st_http.get(url, params=params, headers=headers)
+    if entry is not None and response.status_code == 304:
+        cache.touch(key)
+        cache.count(f"{source}.revalidated")
+        st_metrics.cache_event(source, "revalidated")
+        return CachedResponse(url, entry[0], entry[1].decode("utf-8"), from_cache=True)
+
+    cache.count(f"{source}.miss")
+    st_metrics.cache_event(source, "miss")
+    if response.status_code in CACHEABLE_STATUS:
+        cache.store(key, source, response.status_code, response.content,
+                    response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return CachedResponse(url, response.status_code, response.text)
+
+
+def get_value(key, source):
+    # A fresh JSON value stored with put_value, or None
+    cache = get_cache()
+    entry = cache.lookup(key)
+    if entry is not None and cache.is_fresh(source, entry[4]):
+        cache.count(f"{source}.hit")
+        st_metrics.cache_event(source, "hit")
+        return json.loads(entry[1])
+    cache.count(f"{source}.miss")
+    st_metrics.cache_event(source, "miss")
+    return None
+
+
+def put_value(key, source, value):
+    get_cache().store(key, source, 200, json.dumps(value))
+
+
+def cached_value(key, source, compute):
+    # Cache the JSON-serialisable result of a non-HTTP call
+    value = get_value(key, source)
+    if value is None:
+        value = compute()
+        put_value(key, source, value)
+    return value
+
+
+def cache_stats():
+    cache = get_cache()
+    with cache._lock:
+        return dict(cache.stats)
@@ -0,0 +1,100 @@
+import re
+import numpy as np
+from st_uniprot import get_uniprot_record
+
+# One chain group of a UniProt PDB cross-reference, e.g. 'A/B=160-453'
+_CHAIN_RANGE = re.compile(r"^\s*([^=]+?)\s*=\s*(-?\d+)\s*-\s*(-?\d+)\s*$")
+
+
+def parse_chain_ranges(chains):
+    """
+    Split a UniProt 'Chains' property such as 'A/B=160-453, C=1-20' into
+    (chain, start, end) tuples. Returns the parsed segments and the malformed parts.
+    """
+    segments, malformed = [], []
+    for part in chains.split(','):
+        if not part.strip():
+            continue
+        match = _CHAIN_RANGE.match(part)
+        if match is None:
+            malformed.append(part.strip())
+            continue
+        start, end = int(match.group(2)), int(match.group(3))
+        if start > end:
+            start, end = end, start
+        for chain in match.group(1).split('/'):
+            segments.append((chain.strip(), start, end))
+    return segments, malformed
+
+
+def parse_resolution(resolution):
+    # '2.50 A' -> 2.5; NMR and other methods without a resolution -> nan
+    match = re.match(r"\s*(\d+(?:\.\d+)?)", resolution or "")
+    return float(match.group(1)) if match else float("nan")
+
+
+class PdbCoverageIndex:
+    """
+    Residue coverage of one UniProt entry by its PDB cross-references.
+
+    Every chain segment is one interval; positions are answered in bulk with
+    sorted-endpoint counts (coverage_counts) or a positions x segments mask (covering).
+    """
+
+    def __init__(self, pdb_xrefs):
+        self.structures = list(pdb_xrefs)
+        self.malformed = []
+        structure_idx, chains, starts, ends = [], [], [], []
+        for idx, pdb in enumerate(self.structures):
+            segments, malformed = parse_chain_ranges(pdb.chains)
+            self.malformed.extend((pdb.pdb_id, part) for part in malformed)
+            for chain, start, end in segments:
+                structure_idx.append(idx)
+                chains.append(chain)
+                starts.append(start)
+                ends.append(end)
+
+        self.structure_idx = np.asarray(structure_idx, dtype=np.int32)
+        self.chains = np.asarray(chains, dtype=object)
+        self.starts = np.asarray(starts, dtype=np.int32)
+        self.ends = np.asarray(ends, dtype=np.int32)
+        self.resolutions = np.asarray([parse_resolution(pdb.resolution) for pdb in self.structures], dtype=np.float32)
+        self._sorted_starts = np.sort(self.starts)
+        self._sorted_ends = np.sort(self.ends)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def coverage_counts(self, positions):
+        # Number of chain segments covering each position: #(start <= p) - #(end < p)
+        positions = np.asarray(positions)
+        return (np.searchsorted(self._sorted_starts, positions, side='right')
+                - np.searchsorted(self._sorted_ends, positions, side='left'))
+
+    def coverage_mask(self, positions):
+        return self.coverage_counts(positions) > 0
+
+    def covering(self, positions):
+        """
+        Return, for each position, every covering (PdbCrossRef, chain) pair,
+        best resolution first (structures without a resolution last).
+        """
+        positions = np.asarray(positions)
+        hits = (self.starts[None, :] <= positions[:, None]) & (positions[:, None] <= self.ends[None, :])
+        resolution = np.where(np.isnan(self.resolutions), np.inf, self.resolutions)[self.structure_idx] if len(self) else np.empty(0)
+        order = np.argsort(resolution, kind='stable')
+        results = []
+        for row in hits[:, order]:
+            segments = order[row]
+            results.append([(self.structures[self.structure_idx[seg]], self.chains[seg]) for seg in segments])
+        return results
+
+    def best_template(self, position):
+        hits = self.covering([position])[0]
+        return hits[0] if hits else None
+
+
+def get_coverage_index(uniprot_id):
+    # Kept on the memoized UniProt record, so it is evicted and expires with it; None if the entry does not exist
+    record = get_uniprot_record(uniprot_id)
+    return record.coverage if record is not None else None
@@ -0,0 +1,203 @@
+"""
+SASA and SimBa-NI ΔΔG across an ensemble of structures: every experimental
+structure covering the target, its chains and the AlphaFold model.
+
+Structures are given as a directory, a zip archive or uploaded files. SASA runs
+in a process pool, so the ensemble takes about as long as its slowest
+structure. Results are cached per structure content like single uploads.
+
+Usage:
+    python st_ensemble.py structures.zip --mutations A123C,B:R45W --output ensemble.tsv
+"""
+import os
+import io
+import sys
+import gzip
+import zipfile
+import argparse
+import threading
+import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import st_metrics
+from st_sasa import SasaError, compute_sasa, sasa_cache_key, sasa_lookup, sasa_store
+from st_structure import StructureError
+from st_simba import UNFOLDING_THRESHOLD
+
+STRUCTURE_SUFFIXES = (".pdb", ".ent", ".cif", ".pdb.gz", ".ent.gz", ".cif.gz")
+MAX_SASA_WORKERS = os.cpu_count() or 1
+
+
+def _is_structure(name):
+    return name.lower().endswith(STRUCTURE_SUFFIXES) and not os.path.basename(name).startswith(".")
+
+
+def _decompress(name, data):
+    return gzip.decompress(data) if name.lower().endswith(".gz") else data
+
+
+def _zip_structures(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for member in sorted(archive.namelist()):
+            if _is_structure(member):
+                yield member, _decompress(member, archive.read(member))
+
+
+def iter_structures(source):
+    """
+    Yield (name, PDB bytes) from a directory, a zip file path, or a list of
+    uploaded files (Streamlit UploadedFile or anything with .name and .getvalue()),
+    where each upload may itself be a zip.
+    """
+    if isinstance(source, str) and os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if _is_structure(name):
+                with open(os.path.join(source, name), "rb") as file:
+                    yield name, _decompress(name, file.read())
+    elif isinstance(source, str):
+        with open(source, "rb") as file:
+            yield from _zip_structures(file.read())
+    else:
+        for upload in source:
+            if upload.name.lower().endswith(".zip"):
+                yield from _zip_structures(upload.getvalue())
+            elif _is_structure(upload.name):
+                yield upload.name, _decompress(upload.name, upload.getvalue())
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_sasa_pool():
+    # Spawned, not forked: the app process runs many threads. Kept warm across Streamlit reruns.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_SASA_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def structure_sasa(pdb_bytes):
+    # Runs in a worker process; errors travel back as text
+    try:
+        return compute_sasa(pdb_bytes), None
+    except (SasaError, StructureError) as e:
+        return None, str(e)
+
+
+@st_metrics.instrumented()
+def ensemble_sasa(structures, pool=None):
+    """
+    SASA of every (name, PDB bytes) structure. Returns ({name: ResidueSasa},
+    {name: error message}); cached structures are not recomputed.
+    """
+    results, errors, pending, order = {}, {}, {}, []
+    for name, pdb_bytes in structures:
+        order.append(name)
+        key = sasa_cache_key(pdb_bytes)
+        sasa = sasa_lookup(key)
+        if sasa is not None:
+            results[name] = sasa
+        else:
+            pending[name] = (key, pdb_bytes)
+
+    if len(pending) == 1:
+        # Not worth a process round trip
+        futures = {name: None for name in pending}
+    else:
+        pool = pool or get_sasa_pool()
+        futures = {name: pool.submit(structure_sasa, pdb_bytes) for name, (_, pdb_bytes) in pending.items()}
+    for name, future in futures.items():
+        key, pdb_bytes = pending[name]
+        sasa, error = future.result() if future is not None else structure_sasa(pdb_bytes)
+        if error is not None:
+            errors[name] = error
+            continue
+        sasa_store(key, sasa)
+        results[name] = sasa
+    return {name: results[name] for name in order if name in results}, errors
+
+
+def consensus_label(votes, observed):
+    if observed == 0:
+        return "no data"
+    if 2 * votes > observed:
+        return "unfolding"
+    if 2 * votes < observed:
+        return "not unfolding"
+    return "split"
+
+
+def ensemble_mutation_stats(sasas, mutations, chains, wt, positions, mut, simba):
+    """
+    Per-mutation RSA and ΔΔG statistics across structures.
+
+    Returns (summary, per_structure) DataFrames. RSA/ΔΔG are nan in structures
+    that lack the residue; these do not count towards the consensus, which is the
+    majority vote of structures predicting unfolding.
+    """
+    import pandas as pd
+    names = list(sasas)
+    rsa = np.full((len(names), len(positions)), np.nan)
+    for idx, name in enumerate(names):
+        rsa[idx] = sasas[name].rsa_at(sasas[name].rows(positions, chains))
+    ddg = simba.ddg(wt, mut, rsa)
+    unfolds = simba.unfolding(np.nan_to_num(ddg, nan=np.inf))
+    n_observed = (~np.isnan(ddg)).sum(axis=0)
+    votes = unfolds.sum(axis=0)
+
+    # An all-nan row keeps the reductions defined when no structure is given
+    rsa_stats = rsa if names else np.full((1, len(positions)), np.nan)
+    ddg_stats = ddg if names else rsa_stats
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-nan columns: residue in no structure
+        summary = pd.DataFrame({
+            "Mutation": mutations,
+            "Structures": n_observed,
+            "RSA min": np.nanmin(rsa_stats, axis=0),
+            "RSA mean": np.nanmean(rsa_stats, axis=0),
+            "RSA max": np.nanmax(rsa_stats, axis=0),
+            "ΔΔG min": np.nanmin(ddg_stats, axis=0),
+            "ΔΔG mean": np.nanmean(ddg_stats, axis=0),
+            "ΔΔG max": np.nanmax(ddg_stats, axis=0),
+            "Unfolding votes": votes,
+            "Consensus": [consensus_label(v, n) for v, n in zip(votes, n_observed)],
+        })
+    per_structure = pd.DataFrame({
+        "Structure": np.repeat(names, len(positions)),
+        "Mutation": np.tile(mutations, len(names)),
+        "RSA": rsa.ravel(),
+        "ΔΔG": ddg.ravel(),
+        f"Unfolding (ΔΔG ≤ {UNFOLDING_THRESHOLD})": unfolds.ravel(),
+    })
+    return summary, per_structure
+
+
+def main(argv=None):
+    from st_simba import SimbaModel, parse_mutations
+    parser = argparse.ArgumentParser(description="SASA and SimBa-NI ΔΔG of mutations across many structures.")
+    parser.add_argument("structures", help="directory of PDB/mmCIF files, or a zip archive")
+    parser.add_argument("--mutations", required=True, help="comma-separated mutations, e.g. A123C,B:R45W")
+    parser.add_argument("--output", default="ensemble.tsv", help="per-mutation summary (TSV)")
+    parser.add_argument("--per-structure", help="also write per-structure values (TSV) here")
+    parser.add_argument("--workers", type=int, default=MAX_SASA_WORKERS, help="SASA processes")
+    args = parser.parse_args(argv)
+
+    mutations = [mutation.strip() for mutation in args.mutations.split(",") if mutation.strip()]
+    chains, wt, positions, mut = parse_mutations(mutations)
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        sasas, errors = ensemble_sasa(list(iter_structures(args.structures)), pool)
+    for name, error in errors.items():
+        print(f"{name}: {error}", file=sys.stderr)
+
+    summary, per_structure = ensemble_mutation_stats(sasas, mutations, chains, wt, positions, mut, SimbaModel("simba.tsv"))
+    summary.to_csv(args.output, sep="\t", index=False)
+    if args.per_structure:
+        per_structure.to_csv(args.per_structure, sep="\t", index=False)
+    print(f"{len(mutations)} mutations across {len(sasas)} structures written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
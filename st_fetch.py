@@ -0,0 +1,155 @@
+import time
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from st_uniprot import get_human_uniprot_id, get_uniprot_disease, get_uniprot_length
+from st_params import (get_publication_count, get_string_interactors, get_kegg_pathways,
+                       get_uniprot_3d, get_alphafold_prediction)
+from st_metrics import submit
+
+# Sources that only need the gene name: they all start at once
+GENE_SOURCES = {
+    "uniprot_id": get_human_uniprot_id,
+    "publications": get_publication_count,
+    "interactors": get_string_interactors,
+    "pathways": get_kegg_pathways,
+}
+
+# Sources that need the UniProt accession: they start as soon as "uniprot_id" resolves
+UNIPROT_SOURCES = {
+    "disease": get_uniprot_disease,
+    "length": get_uniprot_length,
+    "structures": get_uniprot_3d,
+    "alphafold": get_alphafold_prediction,
+}
+
+# Seconds allowed for each source, counted from the moment its work starts on the pool
+SOURCE_TIMEOUTS = {
+    "uniprot_id": 20,
+    "publications": 30,
+    "interactors": 30,
+    "pathways": 20,
+    "disease": 20,
+    "length": 20,
+    "structures": 20,
+    "alphafold": 20,
+}
+
+MAX_WORKERS = len(GENE_SOURCES) + len(UNIPROT_SOURCES)
+# How often iter_evidence looks for sources that started since it last woke up
+START_POLL = 0.05
+
+
+class SourceTimeout(Exception):
+    pass
+
+
+class EvidenceFutures(dict):
+    # {source: Future}, plus the monotonic time each source's work started in `started`
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.started = {}
+
+    def timed(self, name, fn):
+        def run(arg):
+            self.started.setdefault(name, time.monotonic())
+            return fn(arg)
+        return run
+
+
+def _chain(executor, fn, arg, target, context):
+    # Run fn(arg) on the pool and forward its outcome to an already handed-out future
+    def forward(done):
+        if done.exception() is not None:
+            target.set_exception(done.exception())
+        else:
+            target.set_result(done.result())
+    submit(executor, fn, arg, context=context).add_done_callback(forward)
+
+
+def fetch_gene_evidence(gene_name, executor, gene_sources=GENE_SOURCES, uniprot_sources=UNIPROT_SOURCES):
+    """
+    Start every evidence fetch for a gene on the given executor.
+
+    Returns an EvidenceFutures dict mapping each source name to a Future. The
+    UniProt-backed futures resolve to None when no human UniProt accession exists for the gene.
+    """
+    # Workers run in the caller's context, so spans land in the caller's active trace
+    context = contextvars.copy_context()
+    futures = EvidenceFutures()
+    for name, fn in gene_sources.items():
+        futures[name] = submit(executor, futures.timed(name, fn), gene_name, context=context)
+    for name in uniprot_sources:
+        futures[name] = Future()
+
+    def on_uniprot_id(id_future):
+        error = id_future.exception()
+        uniprot_id = None if error is not None else id_future.result()
+        for name, fn in uniprot_sources.items():
+            if error is not None:
+                futures[name].set_exception(error)
+            elif not uniprot_id:
+                futures[name].set_result(None)
+            else:
+                _chain(executor, futures.timed(name, fn), uniprot_id, futures[name], context)
+
+    futures["uniprot_id"].add_done_callback(on_uniprot_id)
+    return futures
+
+
+def iter_evidence(futures, timeouts=SOURCE_TIMEOUTS):
+    """
+    Yield (source, value, error) tuples in completion order.
+
+    A source that raises or exceeds its timeout is yielded with value None and the
+    exception as error, so callers can render partial results. For EvidenceFutures
+    each timeout counts from when the source's work started, so sources queued
+    on a busy pool or waiting for the accession are not charged for the wait;
+    for a plain dict it counts from the first call.
+    """
+    start = time.monotonic()
+    started = getattr(futures, "started", None)
+    pending = {future: name for name, future in futures.items()}
+    given_up = set()
+
+    def deadline(name):
+        begun = start if started is None else started.get(name)
+        return None if begun is None else begun + timeouts.get(name, 30)
+
+    while pending:
+        now = time.monotonic()
+        deadlines = [deadline(name) for name in pending.values()]
+        wake = min((value for value in deadlines if value is not None), default=now + START_POLL)
+        if None in deadlines:
+            wake = min(wake, now + START_POLL)
+        done, _ = wait(pending, timeout=max(0, wake - time.monotonic()), return_when=FIRST_COMPLETED)
+        for future in done:
+            name = pending.pop(future)
+            error = future.exception()
+            yield name, (future.result() if error is None else None), error
+        now = time.monotonic()
+        for future, name in list(pending.items()):
+            limit = deadline(name)
+            if limit is not None and now >= limit:
+                del pending[future]
+                given_up.add(name)
+                yield name, None, SourceTimeout(f"{name} did not answer within {timeouts.get(name, 30)} s")
+            elif limit is None and name in UNIPROT_SOURCES and "uniprot_id" in given_up:
+                # Waiting for an accession that will not be awaited any longer
+                del pending[future]
+                yield name, None, SourceTimeout(f"{name} needs the UniProt accession, which timed out")
+
+
+def collect_gene_evidence(gene_name, timeouts=SOURCE_TIMEOUTS):
+    # Blocking helper: returns ({source: value}, {source: error}) once every source finished or timed out
+    values, errors = {}, {}
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    try:
+        for name, value, error in iter_evidence(fetch_gene_evidence(gene_name, executor), timeouts):
+            if error is not None:
+                errors[name] = error
+            else:
+                values[name] = value
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return values, errors
@@ -0,0 +1,178 @@
+"""
+Shared HTTP client for every upstream DRARDT talks to.
+
+One pooled requests.Session (keep-alive), a token bucket and a concurrency cap
+per host, a global cap on in-flight requests, default timeouts, and bounded
+retries with jittered exponential backoff on 429/5xx and connection errors.
+"""
+import os
+import time
+import random
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit
+import requests
+from requests.adapters import HTTPAdapter
+import st_metrics
+
+# (max concurrent requests, requests per second, burst) for each host
+HOST_LIMITS = {
+    "rest.uniprot.org": (8, 10.0, 10),
+    "eutils.ncbi.nlm.nih.gov": (3, 3.0, 1),  # 10/s with an API key, see set_ncbi_api_key
+    "string-db.org": (2, 1.0, 1),
+    "rest.kegg.jp": (2, 3.0, 1),
+    "alphafold.ebi.ac.uk": (8, 10.0, 10),
+}
+DEFAULT_HOST_LIMIT = (4, 5.0, 5)
+
+MAX_CONCURRENCY = 32
+TIMEOUT = (5, 60)  # (connect, read) seconds
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# Base URL standing in for every upstream, e.g. the local replay server of st_bench.py:
+# https://rest.uniprot.org/uniprotkb/search -> <override>/rest.uniprot.org/uniprotkb/search
+UPSTREAM_OVERRIDE = os.environ.get("DRARDT_UPSTREAM_OVERRIDE")
+
+
+class TokenBucket:
+    # Refills `rate` tokens per second up to `burst`; acquire() blocks until a token is available
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _Host:
+    def __init__(self, concurrency, rate, burst):
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+
+
+_hosts = {}
+_hosts_lock = threading.Lock()
+_global_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+_session = None
+_session_lock = threading.Lock()
+
+
+def _host(host):
+    with _hosts_lock:
+        if host not in _hosts:
+            _hosts[host] = _Host(*HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT))
+        return _hosts[host]
+
+
+def set_host_limit(host, concurrency, rate, burst=1):
+    HOST_LIMITS[host] = (concurrency, rate, burst)
+    with _hosts_lock:
+        _hosts.pop(host, None)
+
+
+def set_ncbi_api_key(api_key):
+    # NCBI allows 10 requests/s per API key instead of 3
+    if api_key:
+        set_host_limit("eutils.ncbi.nlm.nih.gov", 8, 10.0, 1)
+
+
+def set_upstream_override(base_url):
+    global UPSTREAM_OVERRIDE
+    UPSTREAM_OVERRIDE = base_url
+
+
+def _route(url):
+    if not UPSTREAM_OVERRIDE:
+        return url
+    parts = urlsplit(url)
+    base = urlsplit(UPSTREAM_OVERRIDE)
+    return urlunsplit((base.scheme, base.netloc, f"{base.path.rstrip('/')}/{parts.netloc}{parts.path}", parts.query, ""))
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(HOST_LIMITS) + 4, pool_maxsize=MAX_CONCURRENCY)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+@contextmanager
+def host_slot(host):
+    """
+    Hold one request slot for `host`: waits for the global and per-host concurrency
+    caps and for a rate-limit token. Also usable around non-requests clients (e.g. Entrez).
+    """
+    limits = _host(host)
+    with _global_slots, limits.slots:
+        limits.bucket.acquire()
+        yield
+
+
+def _backoff(attempt, response=None):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(BACKOFF_MAX, float(retry_after))
+    # Full jitter: spreads retries from many workers instead of synchronising them
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def request(method, url, timeout=TIMEOUT, retries=MAX_RETRIES, **kwargs):
+    # Limits always apply to the real upstream host, also when requests are routed elsewhere
+    host = urlsplit(url).netloc.lower()
+    url = _route(url)
+    session = get_session()
+    with st_metrics.span("http", host=host, method=method) as attrs:
+        for attempt in range(retries + 1):
+            attrs["attempts"] = attempt + 1
+            try:
+                with host_slot(host):
+                    response = session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    raise
+                time.sleep(_backoff(attempt))
+                continue
+            if response.status_code in RETRY_STATUS and attempt < retries:
+                delay = _backoff(attempt, response)
+                response.close()
+                time.sleep(delay)
+                continue
+            # Streamed bodies are not read here: only a declared Content-Length is counted
+            size = response.headers.get("Content-Length")
+            size = int(size) if size and size.isdigit() else (0 if kwargs.get("stream") else len(response.content))
+            attrs.update(status=response.status_code, bytes=size)
+            st_metrics.http_event(host, response.status_code, size)
+            return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def head(url, **kwargs):
+    return request("HEAD", url, **kwargs)
@@ -0,0 +1,253 @@
+"""
+Gene -> KEGG pathway index built from the KEGG REST mapping files.
+
+Usage:
+    python st_kegg.py --download
+    python st_kegg.py --link link_pathway_hsa.txt --genes list_hsa.txt \
+        --pathways list_pathway_hsa.txt --conv conv_ncbi_hsa.txt
+
+Inputs are the outputs of rest.kegg.jp/link/pathway/hsa, list/hsa,
+list/pathway/hsa and (optionally) conv/ncbi-geneid/hsa. The index lives next
+to the response cache, or at DRARDT_KEGG_INDEX. Without it, the first lookup
+downloads the four mapping files (inside the pathways source timeout) and
+saves the index there; st_batch.py, st_scoretable.py and st_service.py build it
+before they start. An index older than KEGG_INDEX_TTL keeps answering while a
+background thread rebuilds it.
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+import threading
+from st_cache import CACHE_PATH, SOURCE_TTLS, cached_get
+
+KEGG_REST = "https://rest.kegg.jp"
+KEGG_FILES = {
+    "link": "link/pathway/hsa",
+    "genes": "list/hsa",
+    "pathways": "list/pathway/hsa",
+    "conv": "conv/ncbi-geneid/hsa",
+}
+KEGG_INDEX_PATH = os.environ.get("DRARDT_KEGG_INDEX", os.path.join(os.path.dirname(CACHE_PATH), "kegg_index.json.gz"))
+# Age after which the index is rebuilt, and the wait before retrying a failed rebuild
+KEGG_INDEX_TTL = SOURCE_TTLS["kegg"]
+KEGG_RETRY_AFTER = 60 * 60
+
+
+def _lines(source):
+    # A path, or text already in memory (downloaded files)
+    if "\n" not in source and os.path.exists(source):
+        with open(source) as file:
+            yield from file
+    else:
+        yield from source.splitlines()
+
+
+def _strip_prefix(kegg_id):
+    return kegg_id.split(":", 1)[-1]
+
+
+def parse_links(source):
+    # 'hsa:7157\tpath:hsa04115' -> {'7157': ['hsa04115', ...]}
+    links = {}
+    for line in _lines(source):
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) >= 2:
+            links.setdefault(_strip_prefix(fields[0]), []).append(_strip_prefix(fields[1]))
+    return links
+
+
+def parse_gene_symbols(source):
+    """
+    list/hsa lines -> {'7157': ['TP53', 'BCC7', ...]}, primary symbol first. Handles
+    both the current 4-column layout and the older 'hsa:id<TAB>symbols; description' one.
+    """
+    symbols = {}
+    for line in _lines(source):
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) < 2:
+            continue
+        names = fields[-1].split(";", 1)[0] if ";" in fields[-1] else ""
+        symbols[_strip_prefix(fields[0])] = [name.strip() for name in names.split(",") if name.strip()]
+    return symbols
+
+
+def parse_pathway_names(source):
+    # 'path:hsa04115\tp53 signaling pathway - Homo sapiens (human)'
+    names = {}
+    for line in _lines(source):
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) >= 2:
+            names[_strip_prefix(fields[0])] = fields[1].replace(" - Homo sapiens (human)", "")
+    return names
+
+
+def parse_conv(source):
+    # 'ncbi-geneid:7157\thsa:7157' in either column order -> {'7157': '7157'} (NCBI Gene ID -> KEGG id)
+    conv = {}
+    for line in _lines(source):
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) >= 2:
+            ncbi, kegg = (fields[0], fields[1]) if fields[0].startswith("ncbi-geneid:") else (fields[1], fields[0])
+            conv[_strip_prefix(ncbi)] = _strip_prefix(kegg)
+    return conv
+
+
+class KeggIndex:
+    """
+    O(1) gene -> pathway lookups. Keys are upper-case gene symbols (primary symbols
+    win over aliases), KEGG gene ids ('hsa:7157' or '7157') and NCBI Gene IDs.
+    """
+
+    def __init__(self, gene_pathways, pathway_names=None):
+        self.gene_pathways = gene_pathways
+        self.pathway_names = pathway_names or {}
+
+    @classmethod
+    def build(cls, links, symbols, pathway_names=None, conv=None):
+        gene_pathways = {}
+        for kegg_id, pathways in links.items():
+            gene_pathways["HSA:" + kegg_id] = sorted(set(pathways))
+        for kegg_id, names in symbols.items():
+            if names and "HSA:" + kegg_id in gene_pathways:
+                gene_pathways[names[0].upper()] = gene_pathways["HSA:" + kegg_id]
+        for kegg_id, names in symbols.items():
+            for alias in names[1:]:
+                if "HSA:" + kegg_id in gene_pathways:
+                    gene_pathways.setdefault(alias.upper(), gene_pathways["HSA:" + kegg_id])
+        for ncbi_id, kegg_id in (conv or {}).items():
+            if "HSA:" + kegg_id in gene_pathways:
+                gene_pathways.setdefault("NCBI:" + ncbi_id, gene_pathways["HSA:" + kegg_id])
+        return cls(gene_pathways, pathway_names)
+
+    def pathways(self, gene):
+        key = gene.strip().upper()
+        if key.isdigit():
+            return self.gene_pathways.get("NCBI:" + key) or self.gene_pathways.get("HSA:" + key, [])
+        return self.gene_pathways.get(key, [])
+
+    def pathway_names_for(self, gene):
+        return [self.pathway_names.get(pathway, pathway) for pathway in self.pathways(gene)]
+
+    def save(self, path):
+        # Written aside and moved into place, so readers never see a partial file
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as file:
+            json.dump({"genes": self.gene_pathways, "pathways": self.pathway_names}, file)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            data = json.load(file)
+        return cls(data["genes"], data["pathways"])
+
+
+def download_kegg_file(name):
+    response = cached_get(f"{KEGG_REST}/{KEGG_FILES[name]}", "kegg")
+    response.raise_for_status()
+    return response.text
+
+
+def build_from_kegg():
+    return KeggIndex.build(parse_links(download_kegg_file("link")), parse_gene_symbols(download_kegg_file("genes")),
+                           parse_pathway_names(download_kegg_file("pathways")), parse_conv(download_kegg_file("conv")))
+
+
+_index = None
+_expires_at = 0.0
+_index_lock = threading.Lock()  # guards _index and _expires_at
+_build_lock = threading.Lock()  # one load/build at a time; lookups never wait on it once an index exists
+
+
+def _load_or_build():
+    # (index, built at) from a fresh index file, otherwise built from the (cached) KEGG mapping files and saved
+    if os.path.exists(KEGG_INDEX_PATH):
+        built_at = os.path.getmtime(KEGG_INDEX_PATH)
+        if time.time() - built_at < KEGG_INDEX_TTL:
+            return KeggIndex.load(KEGG_INDEX_PATH), built_at
+    index = build_from_kegg()
+    try:
+        index.save(KEGG_INDEX_PATH)
+    except OSError:
+        pass  # read-only directory: the mapping files stay in the response cache
+    return index, time.time()
+
+
+def _refresh():
+    global _index, _expires_at
+    with _build_lock:
+        with _index_lock:
+            if _index is not None and time.time() < _expires_at:
+                return _index  # refreshed by another thread meanwhile
+            current = _index
+        try:
+            index, built_at = _load_or_build()
+            expires_at = built_at + KEGG_INDEX_TTL
+        except Exception:
+            if current is None and os.path.exists(KEGG_INDEX_PATH):
+                current = KeggIndex.load(KEGG_INDEX_PATH)  # an expired file beats no index
+            if current is None:
+                raise
+            index, expires_at = current, time.time() + KEGG_RETRY_AFTER
+        with _index_lock:
+            _index, _expires_at = index, expires_at
+        return index
+
+
+def _refresh_in_background():
+    try:
+        _refresh()
+    except Exception as e:
+        print(f"KEGG index not rebuilt ({e})", file=sys.stderr)
+
+
+def get_kegg_index():
+    """
+    The gene -> pathway index. The first call loads or builds it; later calls
+    return the loaded index at once, and start a background rebuild when it is
+    older than KEGG_INDEX_TTL.
+    """
+    with _index_lock:
+        index, expired = _index, time.time() >= _expires_at
+    if index is None:
+        return _refresh()
+    if expired and not _build_lock.locked():
+        threading.Thread(target=_refresh_in_background, daemon=True).start()
+    return index
+
+
+def prebuild_kegg_index():
+    # Called by long-running entry points, so the first pathway lookup does not spend its timeout downloading
+    try:
+        get_kegg_index()
+    except Exception as e:
+        print(f"KEGG index not built ({e}); pathway lookups will retry", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the gene -> KEGG pathway index.")
+    parser.add_argument("--download", action="store_true", help="fetch the mapping files from rest.kegg.jp")
+    parser.add_argument("--link", help="output of link/pathway/hsa")
+    parser.add_argument("--genes", help="output of list/hsa")
+    parser.add_argument("--pathways", help="output of list/pathway/hsa")
+    parser.add_argument("--conv", help="output of conv/ncbi-geneid/hsa")
+    parser.add_argument("--out", default=KEGG_INDEX_PATH, help="index file to write")
+    args = parser.parse_args(argv)
+
+    if args.download:
+        index = build_from_kegg()
+    elif args.link and args.genes:
+        index = KeggIndex.build(parse_links(args.link), parse_gene_symbols(args.genes),
+                                parse_pathway_names(args.pathways) if args.pathways else None,
+                                parse_conv(args.conv) if args.conv else None)
+    else:
+        parser.error("use --download, or give at least --link and --genes")
+    index.save(args.out)
+    print(f"Indexed {len(index.gene_pathways)} gene keys and {len(index.pathway_names)} pathways into {args.out}")
+
+
+if __name__ == "__main__":
+    main()
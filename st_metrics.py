@@ -0,0 +1,196 @@
+"""
+Per-stage timing spans and counters for the DRARDT pipeline.
+
+Fetch and compute functions are wrapped with @instrumented (or `with span(...)`).
+Every span feeds process-wide Prometheus-style metrics. When a Trace is active,
+for example one app request, the span is also recorded there for the waterfall
+view. HTTP status codes, bytes and cache hits/misses are attached to the
+enclosing span.
+
+Exports:
+    prometheus_text()          Prometheus text exposition format
+    DRARDT_METRICS_LOG=path    every finished span appended as one JSON line
+"""
+import os
+import json
+import time
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from collections import Counter
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRICS_LOG = os.environ.get("DRARDT_METRICS_LOG")
+
+_trace = contextvars.ContextVar("drardt_trace", default=None)
+_span = contextvars.ContextVar("drardt_span", default=None)
+
+
+class Trace:
+    # Spans of one request, possibly recorded from several worker threads
+
+    def __init__(self, name):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    @contextmanager
+    def active(self):
+        token = _trace.set(self)
+        try:
+            yield self
+        finally:
+            _trace.reset(token)
+
+    def rows(self):
+        # Waterfall rows: offsets in milliseconds from the start of the trace
+        with self._lock:
+            spans = sorted(self.spans, key=lambda record: record["start"])
+        return [dict(record["attrs"], stage=record["name"], thread=record["thread"],
+                     start_ms=(record["start"] - self.origin) * 1000,
+                     end_ms=(record["start"] - self.origin + record["duration"]) * 1000,
+                     duration_ms=record["duration"] * 1000)
+                for record in spans]
+
+
+class _Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}  # stage -> [bucket counts..., +Inf count, sum]
+        self.counters = Counter()  # (metric, labels) -> value
+
+    def observe(self, stage, duration):
+        with self._lock:
+            series = self.latency.setdefault(stage, [0] * (len(LATENCY_BUCKETS) + 2))
+            for idx, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    series[idx] += 1
+            series[-2] += 1
+            series[-1] += duration
+
+    def count(self, metric, value=1, **labels):
+        with self._lock:
+            self.counters[(metric, tuple(sorted(labels.items())))] += value
+
+    def reset(self):
+        with self._lock:
+            self.latency.clear()
+            self.counters.clear()
+
+
+registry = _Registry()
+_log_lock = threading.Lock()
+
+
+def _labels(pairs):
+    return ",".join(f'{key}="{value}"' for key, value in pairs)
+
+
+def current_trace():
+    return _trace.get()
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a block as stage `name`. The yielded dict holds the span attributes;
+    callers may add e.g. status or bytes to it.
+    """
+    record = {"name": name, "attrs": dict(attrs), "thread": threading.current_thread().name}
+    token = _span.set(record)
+    record["start"] = time.perf_counter()
+    try:
+        yield record["attrs"]
+    except BaseException as e:
+        record["attrs"]["error"] = type(e).__name__
+        registry.count("drardt_stage_errors_total", stage=name)
+        raise
+    finally:
+        record["duration"] = time.perf_counter() - record["start"]
+        _span.reset(token)
+        registry.observe(name, record["duration"])
+        trace = _trace.get()
+        if trace is not None:
+            trace.add(record)
+        if METRICS_LOG:
+            _log(record, trace)
+
+
+def _log(record, trace):
+    line = json.dumps({"time": time.time(), "trace": trace.name if trace else None, "stage": record["name"],
+                       "duration_s": record["duration"], **record["attrs"]}, default=str)
+    with _log_lock, open(METRICS_LOG, "a") as file:
+        file.write(line + "\n")
+
+
+def instrumented(name=None):
+    # Decorator form of span(); the stage defaults to '<module>.<function>'
+    def wrap(fn):
+        stage = name or f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return wrap
+
+
+def annotate(**attrs):
+    # Attach attributes to the innermost open span, if any
+    record = _span.get()
+    if record is not None:
+        record["attrs"].update(attrs)
+
+
+def cache_event(source, result):
+    # result: 'hit', 'miss' or 'revalidated'
+    registry.count("drardt_cache_events_total", source=source, result=result)
+    annotate(cache=result)
+
+
+def http_event(host, status, size):
+    registry.count("drardt_http_responses_total", host=host, status=status)
+    if size:
+        registry.count("drardt_http_bytes_total", size, host=host)
+
+
+def submit(executor, fn, *args, context=None):
+    # executor.submit() that keeps the active trace in the worker thread
+    context = contextvars.copy_context() if context is None else context.copy()
+    return executor.submit(context.run, fn, *args)
+
+
+def prometheus_text():
+    lines = ["# HELP drardt_stage_seconds Latency of DRARDT pipeline stages.",
+             "# TYPE drardt_stage_seconds histogram"]
+    with registry._lock:
+        latency = {stage: list(series) for stage, series in registry.latency.items()}
+        counters = dict(registry.counters)
+    for stage, series in sorted(latency.items()):
+        for bound, count in zip(LATENCY_BUCKETS, series):
+            lines.append(f'drardt_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+        lines.append(f'drardt_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {series[-2]}')
+        lines.append(f'drardt_stage_seconds_count{{stage="{stage}"}} {series[-2]}')
+        lines.append(f'drardt_stage_seconds_sum{{stage="{stage}"}} {series[-1]:.6f}')
+    typed = set()
+    for (metric, labels), value in sorted(counters.items()):
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{{{_labels(labels)}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    # Atomic write, for the node_exporter textfile collector
+    tmp = path + ".tmp"
+    with open(tmp, "w") as file:
+        file.write(prometheus_text())
+    os.replace(tmp, path)
@@ -0,0 +1,129 @@
+"""
+Structural neighbourhood of every residue, from the parsed atom coordinates.
+
+Heavy atoms (waters excluded) go into one KD-tree (scipy.spatial.cKDTree), and
+all per-residue features come from tree queries instead of pairwise loops:
+
+    contacts         residues with a heavy atom within CONTACT_CUTOFF Å of one of
+                     the residue's atoms (covalent backbone neighbours excluded)
+    packing          heavy atoms within PACKING_RADIUS Å of the residue's CB
+                     (CA for glycine), a local packing density
+    chain_distance   closest heavy atom of another protein chain, in Å
+    ligand_distance  closest ligand (non-water HETATM) heavy atom, in Å
+
+Modified residues of a protein chain (HETATM records such as MSE, with backbone
+N, CA and C) count as protein, not as ligands.
+
+Distances beyond NEIGHBOUR_CUTOFF Å are reported as nan (no partner nearby).
+"""
+import numpy as np
+from st_metrics import instrumented
+
+CONTACT_CUTOFF = 4.5
+PACKING_RADIUS = 10.0
+NEIGHBOUR_CUTOFF = 12.0
+WATER_NAMES = (b"HOH", b"WAT", b"DOD", b"H2O")
+FEATURE_COLUMNS = ("contacts", "packing", "chain_distance", "ligand_distance")
+
+
+class ResidueNeighbourhood:
+    """
+    Feature arrays aligned with the residue table of a StructureModel. Ligands
+    and other non-protein HETATM residues have -1 counts and nan distances.
+    """
+
+    def __init__(self, contacts, packing, chain_distance, ligand_distance):
+        self.contacts = contacts
+        self.packing = packing
+        self.chain_distance = chain_distance
+        self.ligand_distance = ligand_distance
+
+    def at(self, rows):
+        # {feature: array} for residue-table rows (StructureModel.residue_rows); -1 rows give -1 / nan
+        rows = np.asarray(rows)
+        found, safe = rows >= 0, np.maximum(rows, 0)
+        values = {}
+        for name in FEATURE_COLUMNS:
+            column = getattr(self, name)
+            missing = -1 if column.dtype.kind == "i" else np.nan
+            values[name] = np.where(found, column[safe], missing) if len(column) else np.full(len(rows), missing)
+        return values
+
+
+def _nearest_by_residue(source_xyz, target_xyz, target_residue, n_residues):
+    # Per residue: distance from its atoms (target) to the closest source atom, nan beyond NEIGHBOUR_CUTOFF
+    from scipy.spatial import cKDTree
+    nearest = np.full(n_residues, np.inf)
+    if len(source_xyz) and len(target_xyz):
+        distances, _ = cKDTree(source_xyz).query(target_xyz, distance_upper_bound=NEIGHBOUR_CUTOFF)
+        np.minimum.at(nearest, target_residue, distances)
+    nearest[np.isinf(nearest)] = np.nan
+    return nearest
+
+
+def polymer_residues(model):
+    # Protein residues plus modified ones: HETATM residues with N, CA and C in a chain that has protein residues
+    names = model.atoms["name"]
+    backbone = np.ones(len(model), dtype=bool)
+    for atom_name in (b" N  ", b" CA ", b" C  "):
+        backbone &= np.bincount(model.atom_residue[names == atom_name], minlength=len(model)) > 0
+    protein_chain = np.isin(model.res_chain, model.res_chain[~model.res_hetero])
+    return ~model.res_hetero | (backbone & protein_chain)
+
+
+@instrumented()
+def compute_neighbourhood(model):
+    """
+    ResidueNeighbourhood of a StructureModel: one KD-tree over the heavy atoms,
+    one pair query for contacts, one ball query for packing, and nearest-atom
+    queries for other chains and ligands.
+    """
+    from scipy.spatial import cKDTree
+    n_residues = len(model)
+    atoms = model.atoms
+    keep = model.heavy_atom_mask(protein_only=False) & ~np.isin(atoms["resname"], WATER_NAMES)
+    index = np.flatnonzero(keep)
+    xyz = model.coordinates[index].astype(np.float64)
+    residue = model.atom_residue[index]
+    protein = polymer_residues(model)
+    protein_atom = protein[residue]
+
+    contacts = np.zeros(n_residues, dtype=np.int64)
+    packing = np.zeros(n_residues, dtype=np.int64)
+    if len(xyz):
+        tree = cKDTree(xyz)
+
+        # Contacts: atom pairs -> distinct residue pairs, minus the residue itself and its peptide-bonded neighbours
+        pairs = tree.query_pairs(CONTACT_CUTOFF, output_type="ndarray")
+        first, second = residue[pairs[:, 0]], residue[pairs[:, 1]]
+        low, high = np.minimum(first, second), np.maximum(first, second)
+        bonded = ((high - low == 1) & protein[low] & protein[high] & (model.res_chain[low] == model.res_chain[high])
+                  & (model.res_num[high] - model.res_num[low] <= 1))
+        distinct = np.unique((low * n_residues + high)[(low != high) & ~bonded])
+        contacts = (np.bincount(distinct // n_residues, minlength=n_residues)
+                    + np.bincount(distinct % n_residues, minlength=n_residues))
+
+        # Packing around CB (CA for glycine, the centroid when both are missing)
+        counts = np.bincount(residue, minlength=n_residues)
+        centre = np.stack([np.bincount(residue, xyz[:, axis], minlength=n_residues) for axis in range(3)], axis=1)
+        centre /= np.maximum(counts, 1)[:, None]
+        names = atoms["name"][index]
+        for atom_name in (b" CA ", b" CB "):
+            chosen = protein_atom & (names == atom_name)
+            centre[residue[chosen]] = xyz[chosen]
+        packing = tree.query_ball_point(centre, PACKING_RADIUS, return_length=True)
+
+    chain_distance = np.full(n_residues, np.nan)
+    atom_chain = atoms["chain"][index]
+    for chain in np.unique(atom_chain[protein_atom]):
+        own = protein_atom & (atom_chain == chain)
+        nearest = _nearest_by_residue(xyz[protein_atom & ~own], xyz[own], residue[own], n_residues)
+        chain_distance = np.where(np.isnan(chain_distance), nearest, chain_distance)
+
+    ligand_distance = _nearest_by_residue(xyz[~protein_atom], xyz[protein_atom], residue[protein_atom], n_residues)
+
+    contacts = np.where(protein, contacts, -1)
+    packing = np.where(protein, packing, -1)
+    chain_distance[~protein] = np.nan
+    ligand_distance[~protein] = np.nan
+    return ResidueNeighbourhood(contacts, packing, chain_distance, ligand_distance)
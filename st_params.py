@@ -1,130 +1,73 @@
-from Bio import Entrez
-import requests
-import json
-import streamlit as st
+import st_pubmed
+from st_string import fetch_string_partners, filter_interactors, EXPERIMENTAL_CUTOFF
+from st_uniprot import get_uniprot_record
+from st_kegg import get_kegg_index
+from st_alphafold import has_alphafold_model, alphafold_entry_url
+from st_metrics import instrumented
+from st_scoring import sub_score, drardt_score
 
+# First publication year counted by DRARDT; the window always runs to the current year
+PUBLICATION_START_YEAR = 2000
+
+@instrumented()
 def get_publication_count(gene_name):
-    search_term = f"{gene_name} [Title/Abstract] AND 2000:2024 [PDat]"
-    handle = Entrez.esearch(db="pubmed", term=search_term, retmax=1)
-    record = Entrez.read(handle)
-    return int(record["Count"])
+    return st_pubmed.get_publication_count(gene_name, PUBLICATION_START_YEAR)
 
 def get_publication_count_score(pub_count):
-    if pub_count <= 50:
-        pub_count_score = 1
-    elif pub_count <= 100:
-        pub_count_score = 2
-    elif pub_count <= 200:
-        pub_count_score = 3
-    else:
-        pub_count_score = 4 
-    return(pub_count_score)   
+    return sub_score("pub_count_score", pub_count)
 
+@instrumented()
 def get_string_interactors(gene_name):
-    url = f"https://string-db.org/api/tsv-no-header/interaction_partners?identifiers={gene_name}&species=9606&network_type=physical"
-    response = requests.get(url)
-    response.raise_for_status()
-    
-    pathways = response.text.strip().split('\n')
-    filtered_interactors = set()  # Use a set to avoid duplicates
-    
-    for pathway in pathways:
-        if pathway:  # Ensure we don't process empty lines
-            data = pathway.split('\t')
-            experimental_score = float(data[10])  # 11th column (index 10) is the experimental score
-            if experimental_score > 0.700:
-                # Extract all protein names (columns 3 onward)
-                for protein in data[2:4]:
-                    if protein != gene_name:
-                        filtered_interactors.add(protein)
-    
-    return len(filtered_interactors), list(filtered_interactors)
+    # Partner scores are fetched once; the experimental cutoff is applied here
+    partners = fetch_string_partners([gene_name])[gene_name]
+    filtered_interactors = filter_interactors(partners, EXPERIMENTAL_CUTOFF)
+    return len(filtered_interactors), filtered_interactors
 
 def get_interactors_score(interactors_count):
-    if interactors_count < 2:
-        interactors_score = 1
-    elif interactors_count < 4:
-        interactors_score = 2
-    elif interactors_count <= 6:
-        interactors_score = 3
-    else:
-        interactors_score = 4  
-    return(interactors_score)  
+    return sub_score("interactors_score", interactors_count)
 
+@instrumented()
 def get_kegg_pathways(gene_name):
-    url = f"https://rest.kegg.jp/find/pathway/{gene_name}"
-    response = requests.get(url)
-    response.raise_for_status()
-    pathways = response.text.split('\n')
-    return len(pathways) - 1  # subtracting 1 to account for empty string at end
+    # Pathway membership from the KEGG gene -> pathway index, not a free-text pathway search
+    return len(get_kegg_index().pathways(gene_name))
 
 def get_KEGG_score(pathways_count):
-    if pathways_count < 1:
-        KEGG_score = 1
-    elif pathways_count < 2:
-        KEGG_score = 2
-    else:
-        KEGG_score = 3 
-    return(KEGG_score)   
+    return sub_score("KEGG_score", pathways_count)
 
+@instrumented()
 def get_uniprot_3d(uniprot_id):
-    url = f"https://rest.uniprot.org/uniprotkb/search?query={uniprot_id}&fields=xref_pdb"
-    response = requests.get(url)
-    response.raise_for_status()
-    data = json.loads(response.text)
+    record = get_uniprot_record(uniprot_id)
     structures = []
     
     pdb_count = 0
     
-    if data['results'] and 'uniProtKBCrossReferences' in data['results'][0]:
-        pdb_structures = data['results'][0]['uniProtKBCrossReferences']
-        for pdb in pdb_structures:
-            if pdb['database'] == 'PDB':
-                pdb_count += 1
-                structure_info = (
-                    f"PDB ID: {pdb['id']}, Method: {pdb['properties'][0]['value']}, "
-                    f"Resolution: {pdb['properties'][1]['value']}, Chains: {pdb['properties'][2]['value']}"
-                )
-                structures.append(structure_info)
+    if record is not None:
+        for pdb in record.pdb_xrefs:
+            pdb_count += 1
+            structure_info = (
+                f"PDB ID: {pdb.pdb_id}, Method: {pdb.method}, "
+                f"Resolution: {pdb.resolution}, Chains: {pdb.chains}"
+            )
+            structures.append(structure_info)
     
     if pdb_count == 0:
         structures.append("_No experimental 3D structures found_")
 
-    PDB_score = 0
-    if pdb_count < 1:
-        PDB_score = 1
-    elif pdb_count <= 3:
-        PDB_score = 2
-    elif pdb_count <= 4:
-        PDB_score = 3
-    else:
-        PDB_score = 4
-    
-    return pdb_count, structures, PDB_score
+    return pdb_count, structures, get_PDB_score(pdb_count)
+
+def get_PDB_score(pdb_count):
+    return sub_score("PDB_score", pdb_count)
 
+@instrumented()
 def get_alphafold_prediction(uniprot_id):
-    url = f"https://alphafold.ebi.ac.uk/api/prediction/{uniprot_id}"
-    response = requests.get(url)
-    if response.status_code == 200:
-        return f"https://alphafold.ebi.ac.uk/entry/{uniprot_id}"
-    else:
-        return "No AlphaFold prediction found"
+    # Entry URL when AlphaFold DB has a model for the accession, None otherwise
+    if has_alphafold_model(uniprot_id):
+        return alphafold_entry_url(uniprot_id)
+    return None
 
 def get_AF2_score(alphafold2_prediction):
-    if alphafold2_prediction is not None:
-        AF2_score = 2
-    else:
-        AF2_score = 1
-    return(AF2_score)
+    return sub_score("AF2_score", 1 if alphafold2_prediction else 0)
 
 def calculate_DRARDT_score(pub_count_score, interactors_score, KEGG_score, PDB_score, AF2_score):
-    sum_scores = pub_count_score + interactors_score + KEGG_score + PDB_score + AF2_score
-    if sum_scores < 8:
-        DRARDT_score = 0
-    elif 8 <= sum_scores < 11:
-        DRARDT_score = 1
-    elif 11 <= sum_scores < 14:
-        DRARDT_score = 2
-    elif sum_scores >= 14:
-        DRARDT_score = 3
-    return(DRARDT_score)
\ No newline at end of file
+    # Cut points for all scores live in st_scoring (DRARDT_SCORING_CONFIG overrides them)
+    return drardt_score(pub_count_score + interactors_score + KEGG_score + PDB_score + AF2_score)
\ No newline at end of file
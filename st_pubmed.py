@@ -0,0 +1,182 @@
+"""
+PubMed publication counts stored per gene in publication-year buckets.
+
+Closed years are stored in fixed blocks of BLOCK_YEARS aligned years (a cold
+lookup of 2000-2024 costs five searches, not 25) and single years where a
+window starts or ends inside a block. A count for any window is the sum of
+stored buckets inside it, and only the uncovered years are searched, so later
+windows reuse every block they contain. Closed years are never refreshed; the
+current year is refreshed daily and the previous one monthly, while PubMed
+indexing catches up.
+"""
+import os
+import time
+import sqlite3
+import datetime
+import threading
+import st_http
+import st_metrics
+
+ESEARCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+PUBMED_DB_PATH = os.environ.get("DRARDT_PUBMED_DB", os.path.join(os.path.expanduser("~"), ".cache", "drardt", "pubmed.sqlite"))
+
+DAY = 24 * 60 * 60
+CURRENT_YEAR_TTL = DAY
+PREVIOUS_YEAR_TTL = 30 * DAY
+# Closed years are searched and stored in blocks starting at multiples of BLOCK_YEARS
+BLOCK_YEARS = 5
+
+NCBI_TOOL = "DRARDT"
+NCBI_EMAIL = None
+NCBI_API_KEY = None
+
+
+def set_ncbi_contact(email, api_key=None):
+    # NCBI asks every E-utilities client to identify itself; an API key raises the rate limit to 10/s
+    global NCBI_EMAIL, NCBI_API_KEY
+    NCBI_EMAIL = email
+    NCBI_API_KEY = api_key
+    st_http.set_ncbi_api_key(api_key)
+
+
+def search_term(gene_name, first_year, last_year):
+    return f"{gene_name} [Title/Abstract] AND {first_year}:{last_year} [PDat]"
+
+
+def esearch_count(term):
+    # rettype=count returns only the hit count: the cheapest possible E-utilities search
+    params = {"db": "pubmed", "term": term, "rettype": "count", "retmode": "json", "tool": NCBI_TOOL}
+    if NCBI_EMAIL:
+        params["email"] = NCBI_EMAIL
+    if NCBI_API_KEY:
+        params["api_key"] = NCBI_API_KEY
+    response = st_http.get(ESEARCH_URL, params=params)
+    response.raise_for_status()
+    return int(response.json()["esearchresult"]["count"])
+
+
+class PublicationStore:
+    def __init__(self, path=PUBMED_DB_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS counts ("
+            " gene TEXT, first_year INTEGER, last_year INTEGER, count INTEGER, fetched_at REAL,"
+            " PRIMARY KEY (gene, first_year, last_year))"
+        )
+
+    def buckets(self, gene_name, start_year, end_year):
+        # (first_year, last_year, count, fetched_at) buckets lying inside the window
+        with self._lock:
+            return self._db.execute(
+                "SELECT first_year, last_year, count, fetched_at FROM counts"
+                " WHERE gene = ? AND first_year >= ? AND last_year <= ?",
+                (gene_name.upper(), start_year, end_year),
+            ).fetchall()
+
+    def store(self, gene_name, first_year, last_year, count):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO counts VALUES (?, ?, ?, ?, ?)",
+                             (gene_name.upper(), first_year, last_year, count, time.time()))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PublicationStore()
+        return _store
+
+
+def set_store(store):
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def bucket_ttl(last_year, current_year):
+    # None: the bucket only holds closed years and never goes stale
+    if last_year >= current_year:
+        return CURRENT_YEAR_TTL
+    if last_year == current_year - 1:
+        return PREVIOUS_YEAR_TTL
+    return None
+
+
+def split_years(first_year, last_year, current_year):
+    """
+    Query ranges for uncovered years: aligned BLOCK_YEARS blocks of closed
+    years where the range holds a whole block, single years elsewhere. Closed
+    years never share a bucket with the refreshed previous and current years.
+    """
+    ranges = []
+    year, closed_last = first_year, min(last_year, current_year - 2)
+    while year <= closed_last:
+        block_last = year + BLOCK_YEARS - 1
+        if year % BLOCK_YEARS == 0 and block_last <= closed_last:
+            ranges.append((year, block_last))
+            year = block_last + 1
+        else:
+            ranges.append((year, year))
+            year += 1
+    if first_year <= current_year - 1 <= last_year:
+        ranges.append((current_year - 1, current_year - 1))
+    if last_year >= current_year:
+        ranges.append((max(first_year, current_year), last_year))
+    return ranges
+
+
+def plan_window(buckets, start_year, end_year, current_year, now=None):
+    """
+    Cover start_year..end_year with fresh stored buckets (longest first) and
+    return (buckets to sum, year ranges to search).
+    """
+    now = time.time() if now is None else now
+    longest = {}
+    for first, last, count, fetched_at in buckets:
+        if first < start_year or last > end_year:
+            continue
+        ttl = bucket_ttl(last, current_year)
+        if ttl is not None and now - fetched_at > ttl:
+            continue
+        if first not in longest or last > longest[first][1]:
+            longest[first] = (first, last, count, fetched_at)
+
+    used, missing = [], []
+    year = start_year
+    while year <= end_year:
+        if year in longest:
+            used.append(longest[year])
+            year = longest[year][1] + 1
+            continue
+        next_start = min((first for first in longest if first > year), default=end_year + 1)
+        missing.extend(split_years(year, next_start - 1, current_year))
+        year = next_start
+    return used, missing
+
+
+def get_publication_count(gene_name, start_year=2000, end_year=None, executor=None):
+    """
+    Number of PubMed articles mentioning the gene in title/abstract, published
+    between start_year and end_year (default: current year) inclusive.
+    """
+    current_year = datetime.date.today().year
+    end_year = end_year or current_year
+    store = get_store()
+    used, missing = plan_window(store.buckets(gene_name, start_year, end_year), start_year, end_year, current_year)
+    st_metrics.cache_event("pubmed", "miss" if missing else "hit")
+
+    def fetch(years):
+        count = esearch_count(search_term(gene_name, *years))
+        store.store(gene_name, *years, count)
+        return count
+
+    # Searches are pipelined when an executor is given; st_http keeps them under the NCBI rate limit
+    fetched = executor.map(fetch, missing) if executor is not None else map(fetch, missing)
+    return sum(bucket[2] for bucket in used) + sum(fetched)
@@ -0,0 +1,348 @@
+import io
+import os
+import json
+import string
+import hashlib
+import threading
+import subprocess
+from collections import OrderedDict
+import numpy as np
+import st_metrics
+from st_structure import load_structure
+
+# Same settings as the FreeSASA command line used by the app: Lee-Richards with 20 slices, NACCESS radii
+FREESASA_COMMAND = ["freesasa", "-L", "-n", "20", "-t", "8", "--radii", "naccess"]
+SASA_PARAMETERS = {"algorithm": "LeeRichards", "n-slices": 20}
+
+# The Python bindings only ship the ProtOr radii, so the NACCESS classifier of the CLI is loaded from naccess.config
+NACCESS_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "naccess.config")
+CLASSIFIER_CONFIG = os.environ.get("DRARDT_FREESASA_CLASSIFIER", NACCESS_CONFIG)
+
+# NACCESS reference areas of the standard residues (FreeSASA's built-in NACCESS classifier), in absolute
+# AREA_COLUMNS order: a classifier loaded from a file carries no reference values for relative areas.
+# Only applied while the classifier is naccess.config; other radii leave relative areas nan
+NACCESS_REFERENCE = {
+    "ALA": (107.89, 63.94, 43.94, 71.17, 36.71),
+    "ARG": (238.33, 196.61, 41.72, 77.23, 161.10),
+    "ASN": (143.97, 102.94, 41.03, 46.14, 97.83),
+    "ASP": (140.48, 98.72, 41.76, 49.29, 91.19),
+    "CYS": (134.24, 92.33, 41.92, 97.75, 36.49),
+    "GLN": (178.24, 136.52, 41.72, 51.89, 126.35),
+    "GLU": (172.09, 130.37, 41.72, 59.96, 112.13),
+    "GLY": (80.30, 0.00, 80.30, 37.69, 42.62),
+    "HIS": (182.75, 143.99, 38.76, 97.14, 85.61),
+    "ILE": (175.10, 133.94, 41.16, 139.00, 36.10),
+    "LEU": (178.40, 138.90, 39.50, 141.95, 36.45),
+    "LYS": (200.21, 158.49, 41.72, 115.90, 84.31),
+    "MET": (193.72, 152.00, 41.72, 157.27, 36.45),
+    "PHE": (199.40, 161.27, 38.12, 165.14, 34.25),
+    "PRO": (135.84, 108.76, 27.09, 120.67, 15.17),
+    "SER": (116.56, 73.18, 43.38, 48.53, 68.03),
+    "THR": (139.25, 97.55, 41.70, 75.75, 63.50),
+    "TRP": (248.97, 206.59, 42.38, 189.14, 59.83),
+    "TYR": (212.23, 174.10, 38.13, 135.89, 76.34),
+    "VAL": (151.40, 110.23, 41.17, 115.28, 36.12),
+}
+
+SASA_CACHE_PATH = os.environ.get("DRARDT_SASA_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "drardt", "sasa.sqlite"))
+SASA_CACHE_MAX_BYTES = int(os.environ.get("DRARDT_SASA_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+MEMORY_CACHE_SIZE = 16
+
+# FreeSASA keys residues by a one-character chain label
+CHAIN_LABELS = string.ascii_uppercase + string.ascii_lowercase + string.digits
+
+# Absolute / relative (%) areas in FreeSASA RSA column order
+AREA_COLUMNS = ("Area", "RSA", "Sidechain", "SidechainRel", "Mainchain", "MainchainRel",
+                "NonPolar", "NonPolarRel", "AllPolar", "AllPolarRel")
+
+
+class SasaError(Exception):
+    pass
+
+
+class ResidueSasa:
+    """
+    Per-residue solvent accessibility as parallel NumPy columns.
+
+    `areas` is an (n_residues, 10) float array in AREA_COLUMNS order; relative
+    areas are percentages and nan where FreeSASA has no reference value.
+    """
+
+    def __init__(self, resname, chain, resnum, icode, areas):
+        self.resname = np.asarray(resname, dtype="U3")
+        self.chain = np.asarray(chain, dtype="U4")
+        self.resnum = np.asarray(resnum, dtype=np.int32)
+        self.icode = np.asarray(icode, dtype="U1")
+        self.areas = np.asarray(areas, dtype=np.float64).reshape(len(self.resnum), len(AREA_COLUMNS))
+        self._index = None
+        self._first_rows = None
+
+    def __len__(self):
+        return len(self.resnum)
+
+    @property
+    def total(self):
+        return self.areas[:, 0]
+
+    @property
+    def rsa(self):
+        return self.areas[:, 1]
+
+    def to_frame(self):
+        import pandas as pd
+        frame = pd.DataFrame({"Res": self.resname, "Chain": self.chain, "ResNum": self.resnum, "ICode": self.icode})
+        for idx, column in enumerate(AREA_COLUMNS):
+            frame[column] = self.areas[:, idx]
+        return frame
+
+    @property
+    def index(self):
+        # (chain, residue number, insertion code) -> row, built on first use
+        if self._index is None:
+            self._index = {key: row for row, key in enumerate(zip(self.chain.tolist(), self.resnum.tolist(), self.icode.tolist()))}
+        return self._index
+
+    def rows(self, resnums, chains=None, icodes=None):
+        """
+        Row of each requested residue, -1 where it is missing. A chain of None or ''
+        picks the first chain (in file order) that has the residue.
+        """
+        count = len(resnums)
+        chains = [None] * count if chains is None else chains
+        icodes = [""] * count if icodes is None else icodes
+        if self._first_rows is None:
+            self._first_rows = {}
+            for row, key in enumerate(zip(self.resnum.tolist(), self.icode.tolist())):
+                self._first_rows.setdefault(key, row)
+        rows = np.empty(count, dtype=np.int64)
+        for idx, (resnum, chain, icode) in enumerate(zip(resnums, chains, icodes)):
+            if chain:
+                rows[idx] = self.index.get((chain, int(resnum), icode or ""), -1)
+            else:
+                rows[idx] = self._first_rows.get((int(resnum), icode or ""), -1)
+        return rows
+
+    def rsa_at(self, rows):
+        # RSA for rows returned by rows(), nan where the residue is missing
+        rows = np.asarray(rows)
+        return np.where(rows >= 0, self.rsa[np.maximum(rows, 0)], np.nan) if len(self) else np.full(len(rows), np.nan)
+
+    def to_bytes(self):
+        # Compact stored form: compressed NumPy columns
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, resname=self.resname, chain=self.chain, resnum=self.resnum,
+                            icode=self.icode, areas=self.areas.astype(np.float32))
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data)) as columns:
+            return cls(columns["resname"], columns["chain"], columns["resnum"], columns["icode"], columns["areas"])
+
+    @classmethod
+    def from_rsa_text(cls, rsa_text):
+        """
+        Columnar parse of the RES lines of FreeSASA/NACCESS RSA output, e.g.
+        'RES ALA A  12    107.95 100.4 ...': fixed-width residue fields, and all
+        area values converted to floats in one NumPy call.
+        """
+        lines = [line for line in rsa_text.splitlines() if line.startswith("RES")]
+        values = " ".join(line[14:] for line in lines).replace("N/A", "nan").split()
+        if len(values) != len(lines) * len(AREA_COLUMNS):
+            # Some line is short or carries extra fields: keep only the well-formed ones
+            lines = [line for line in lines if len(line[14:].split()) == len(AREA_COLUMNS)]
+            values = " ".join(line[14:] for line in lines).replace("N/A", "nan").split()
+        areas = np.array(values, dtype=np.float64).reshape(-1, len(AREA_COLUMNS))
+        return cls([line[4:7].strip() for line in lines], [line[8] for line in lines],
+                   [int(line[9:13]) for line in lines], [line[13:14].strip() for line in lines], areas)
+
+
+def chain_labels(chains):
+    """
+    {chain ID: one-character label} for FreeSASA. One-character IDs keep their
+    own label; longer mmCIF IDs (e.g. 'AA' in large assemblies) get unused ones.
+    """
+    distinct = list(dict.fromkeys(chains))
+    labels = {chain: chain for chain in distinct if len(chain) <= 1}
+    free = (label for label in CHAIN_LABELS if label not in labels)
+    for chain in distinct:
+        if chain not in labels:
+            label = next(free, None)
+            if label is None:
+                raise SasaError(f"The structure has {len(distinct)} chains, more than FreeSASA's "
+                                f"{len(CHAIN_LABELS)} one-character chain labels.")
+            labels[chain] = label
+    return labels
+
+
+_classifiers = {}
+_digests = {}
+
+
+def classifier_digest(path=None):
+    # SHA-256 of a classifier file, re-read only when the file changes
+    path = CLASSIFIER_CONFIG if path is None else path
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _digests:
+        with open(path, "rb") as file:
+            _digests[key] = hashlib.sha256(file.read()).hexdigest()
+    return _digests[key]
+
+
+def _classifier():
+    # Loaded once per file content and kept: the bindings do not keep a Structure's classifier alive,
+    # and freeing it crashes
+    import freesasa
+    digest = classifier_digest()
+    if digest not in _classifiers:
+        _classifiers[digest] = freesasa.Classifier(CLASSIFIER_CONFIG)
+    return _classifiers[digest]
+
+
+def sasa_in_process(pdb_bytes):
+    import freesasa
+    freesasa.setVerbosity(freesasa.silent)
+    structure = freesasa.Structure(classifier=_classifier())
+
+    # Atoms and residues come from the shared structure model, parsed once per upload
+    model = load_structure(pdb_bytes)
+    mask = model.heavy_atom_mask()
+    if not mask.any():
+        raise SasaError("No protein atoms found in the uploaded structure.")
+    atoms = model.atoms[mask]
+    names = atoms["name"].astype("U4").tolist()
+    resnames = atoms["resname"].astype("U3").tolist()
+    numbers = np.char.add(atoms["resnum"].astype("U6"), atoms["icode"].astype("U1")).tolist()
+    labels = chain_labels(model.res_chain[np.unique(model.atom_residue[mask])].tolist())
+    chains = [labels[chain] for chain in atoms["chain"].astype("U4").tolist()]
+    for name, resname, number, chain, (x, y, z) in zip(names, resnames, numbers, chains, atoms["xyz"].tolist()):
+        structure.addAtom(name, resname, number, chain, x, y, z)
+
+    result = freesasa.calc(structure, freesasa.Parameters(SASA_PARAMETERS))
+    residue_areas = result.residueAreas()
+
+    rows = np.unique(model.atom_residue[mask])
+    references = NACCESS_REFERENCE if classifier_digest() == classifier_digest(NACCESS_CONFIG) else {}
+    areas = np.full((len(rows), len(AREA_COLUMNS)), np.nan)
+    for idx, row in enumerate(rows):
+        area = residue_areas[labels[model.res_chain[row]]][f"{model.res_num[row]}{model.res_icode[row]}"]
+        areas[idx, 0::2] = (area.total, area.sideChain, area.mainChain, area.apolar, area.polar)
+        if area.hasRelativeAreas:
+            areas[idx, 1::2] = 100 * np.array((area.relativeTotal, area.relativeSideChain, area.relativeMainChain,
+                                               area.relativeApolar, area.relativePolar))
+        reference = references.get(model.res_name[row])
+        if reference is not None and np.isnan(areas[idx, 1]):
+            # As the CLI's RSA output: N/A where the reference area is zero (glycine side chain)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                areas[idx, 1::2] = np.where(np.array(reference) > 0, 100 * areas[idx, 0::2] / reference, np.nan)
+    return ResidueSasa(model.res_name[rows], model.res_chain[rows], model.res_num[rows], model.res_icode[rows], areas)
+
+
+def run_freesasa_cli(pdb_bytes):
+    # The structure is piped through stdin, so nothing is written to disk
+    try:
+        result = subprocess.run(FREESASA_COMMAND, input=pdb_bytes, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError as e:
+        raise SasaError(f"An error occurred while running FreeSASA: {e.stderr.decode(errors='replace').strip() or e}")
+    except FileNotFoundError:
+        raise SasaError("FreeSASA is not installed or not found in your PATH.")
+    return result.stdout.decode()
+
+
+def _has_bindings():
+    try:
+        import freesasa
+    except ImportError:
+        return False
+    return True
+
+
+@st_metrics.instrumented()
+def compute_sasa(pdb_bytes):
+    """
+    Per-residue SASA of a PDB file's contents with the FreeSASA Python bindings,
+    falling back to the freesasa command line when the bindings are not installed.
+    """
+    if not _has_bindings():
+        model = load_structure(pdb_bytes)
+        if model.format == "pdb":
+            return ResidueSasa.from_rsa_text(run_freesasa_cli(pdb_bytes))
+        # The command line reads PDB only: mmCIF uploads go through the parsed model, with one-character chain labels
+        labels = chain_labels(model.res_chain.tolist())
+        sasa = ResidueSasa.from_rsa_text(run_freesasa_cli(model.to_pdb_bytes(chain_labels=labels)))
+        chains = {label: chain for chain, label in labels.items()}
+        sasa.chain = np.array([chains.get(label, label) for label in sasa.chain.tolist()], dtype="U4")
+        return sasa
+    return sasa_in_process(pdb_bytes)
+
+
+def sasa_cache_key(pdb_bytes):
+    # Content hash of the structure plus everything that changes the SASA values
+    if _has_bindings():
+        settings = {"backend": "bindings", "parameters": SASA_PARAMETERS, "classifier": classifier_digest()}
+    else:
+        settings = {"backend": "cli", "command": FREESASA_COMMAND}
+    digest = hashlib.sha256(pdb_bytes)
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return "sasa:" + digest.hexdigest()
+
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+_store = None
+
+
+def _sasa_store():
+    global _store
+    with _memory_lock:
+        if _store is None:
+            from st_cache import ResponseCache
+            _store = ResponseCache(SASA_CACHE_PATH, SASA_CACHE_MAX_BYTES, ttls={"sasa": float("inf")})
+        return _store
+
+
+def sasa_lookup(key):
+    # Stored result for a sasa_cache_key, or None
+    with _memory_lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            st_metrics.cache_event("sasa", "hit")
+            return _memory[key]
+
+    store = _sasa_store()
+    entry = store.lookup(key)
+    if entry is None:
+        store.count("sasa.miss")
+        st_metrics.cache_event("sasa", "miss")
+        return None
+    store.count("sasa.hit")
+    st_metrics.cache_event("sasa", "hit")
+    sasa = ResidueSasa.from_bytes(entry[1])
+    _remember(key, sasa)
+    return sasa
+
+
+def _remember(key, sasa):
+    with _memory_lock:
+        _memory[key] = sasa
+        while len(_memory) > MEMORY_CACHE_SIZE:
+            _memory.popitem(last=False)
+
+
+def sasa_store(key, sasa):
+    _sasa_store().store(key, "sasa", 200, sasa.to_bytes())
+    _remember(key, sasa)
+
+
+def cached_compute_sasa(pdb_bytes):
+    """
+    compute_sasa with results kept by structure content hash: a small in-memory LRU
+    for Streamlit reruns, backed by a size-capped on-disk store for re-uploads.
+    """
+    key = sasa_cache_key(pdb_bytes)
+    sasa = sasa_lookup(key)
+    if sasa is None:
+        sasa = compute_sasa(pdb_bytes)
+        sasa_store(key, sasa)
+    return sasa
@@ -0,0 +1,344 @@
+"""
+Precomputed DRARDT scores for a whole gene set, refreshed incrementally.
+
+Usage:
+    python st_scoretable.py --email you@example.org --genes genes.txt            # build / extend
+    python st_scoretable.py --email you@example.org --uniprot-db uniprot_human.sqlite   # every reviewed human gene
+    python st_scoretable.py --email you@example.org                              # refresh stale sources only
+    python st_scoretable.py --export scores.parquet
+    DRARDT_SCORING_CONFIG=cuts.json python st_scoretable.py --rescore            # new cut points, no refetch
+
+Every evidence source of every gene is stored with the time it was fetched and
+the time its value last changed. A refresh re-fetches only the sources older
+than their REFRESH_AFTER age, and rescores a gene only when one of its values
+changed. The app and the HTTP service serve lookups from the table, fetching
+live only the sources a gene has never had a value for.
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import st_http
+from st_pubmed import set_ncbi_contact
+from st_kegg import prebuild_kegg_index
+from st_fetch import GENE_SOURCES, UNIPROT_SOURCES, SOURCE_TIMEOUTS, fetch_gene_evidence, iter_evidence
+from st_batch import COLUMNS, evidence_row, read_gene_list, write_output
+
+SCORE_TABLE_PATH = os.environ.get("DRARDT_SCORE_TABLE", "drardt_scores.sqlite")
+
+DAY = 24 * 60 * 60
+# Age after which a stored source value is fetched again
+REFRESH_AFTER = {
+    "uniprot_id": 90 * DAY,
+    "disease": 90 * DAY,
+    "length": 90 * DAY,
+    "structures": 30 * DAY,
+    "alphafold": 180 * DAY,
+    "publications": 30 * DAY,
+    "interactors": 180 * DAY,
+    "pathways": 90 * DAY,
+}
+SOURCES = list(GENE_SOURCES) + list(UNIPROT_SOURCES)
+
+
+class ScoreTable:
+    """
+    SQLite file with one `scores` row per gene (the st_batch columns) and one
+    `evidence` row per (gene, source) holding the JSON value and its timestamps.
+    """
+
+    def __init__(self, path=SCORE_TABLE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        columns = ", ".join(f'"{column}"' for column in COLUMNS[1:])
+        self._db.executescript(
+            f'CREATE TABLE IF NOT EXISTS scores (gene TEXT PRIMARY KEY COLLATE NOCASE, {columns}, updated_at REAL);'
+            "CREATE INDEX IF NOT EXISTS scores_by_accession ON scores (uniprot_id);"
+            "CREATE TABLE IF NOT EXISTS evidence ("
+            " gene TEXT COLLATE NOCASE, source TEXT, value TEXT, fetched_at REAL, changed_at REAL,"
+            " PRIMARY KEY (gene, source));"
+        )
+
+    def genes(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT gene FROM scores ORDER BY gene")]
+
+    def lookup(self, gene_name):
+        # The stored score row as a dict (st_batch columns plus updated_at), or None
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM scores WHERE gene = ?", (gene_name.strip(),))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def evidence(self, gene_name):
+        # {source: (value, fetched_at, changed_at)}
+        with self._lock:
+            rows = self._db.execute("SELECT source, value, fetched_at, changed_at FROM evidence WHERE gene = ?",
+                                    (gene_name.strip(),)).fetchall()
+        return {source: (json.loads(value), fetched_at, changed_at) for source, value, fetched_at, changed_at in rows}
+
+    def save(self, gene_name, fetched, errors, now=None):
+        """
+        Merge freshly fetched source values into the gene's evidence and rescore it
+        when anything changed. Failed sources keep their previous value. Returns True
+        if the score row was rewritten. A new gene whose every source failed is
+        not added.
+        """
+        now = time.time() if now is None else now
+        stored = self.evidence(gene_name)
+        previous_row = self.lookup(gene_name)
+        if previous_row is None and not fetched:
+            return False
+        changed = previous_row is None
+        updates = []
+        for source, value in fetched.items():
+            encoded = json.dumps(value)
+            previous = stored.get(source)
+            if previous is None or json.dumps(previous[0]) != encoded:
+                changed = True
+                updates.append((gene_name, source, encoded, now, now))
+            else:
+                updates.append((gene_name, source, encoded, now, previous[2]))
+        values = {source: value for source, (value, _, _) in stored.items()}
+        values.update(fetched)
+        # Also rescored when the errors column would change
+        row = evidence_row(gene_name, values, errors) if changed or errors or previous_row["errors"] else None
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO evidence VALUES (?, ?, ?, ?, ?)", updates)
+            if row is not None:
+                self._db.execute(f"INSERT OR REPLACE INTO scores VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+                                 [row[column] for column in COLUMNS] + [now])
+            self._db.commit()
+        return row is not None
+
+    def rescore(self, cuts=None):
+        """
+        Recompute every score column from the stored raw counts under `cuts`
+        (default: the current st_scoring cut points). No network access.
+        """
+        from st_scoring import SCORE_RULES, raw_arrays, score_arrays
+        genes, raw = raw_arrays(self.rows())
+        scores = score_arrays(raw, cuts)
+        names = list(SCORE_RULES) + ["DRARDT_score"]
+        updates = [[int(scores[name][idx]) if scores[name][idx] >= 0 else "" for name in names] + [gene]
+                   for idx, gene in enumerate(genes)]
+        with self._lock:
+            self._db.executemany(f"UPDATE scores SET {', '.join(f'{name} = ?' for name in names)} WHERE gene = ?", updates)
+            self._db.commit()
+        return len(updates)
+
+    def rows(self):
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM scores ORDER BY gene")
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def close(self):
+        self._db.close()
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_score_table():
+    # The table named by DRARDT_SCORE_TABLE, or None when it has not been built
+    global _table
+    with _table_lock:
+        if _table is None and os.path.exists(SCORE_TABLE_PATH):
+            _table = ScoreTable(SCORE_TABLE_PATH)
+        return _table
+
+
+def stored_evidence(gene_name):
+    """
+    ({source: value}, oldest fetch time) for the app's renderers, or None when
+    the gene has no stored evidence. Sources that were never fetched
+    successfully are absent; see fetch_missing.
+    """
+    table = get_score_table()
+    if table is None or table.lookup(gene_name) is None:
+        return None
+    evidence = table.evidence(gene_name)
+    if not evidence:
+        return None
+    return {source: value for source, (value, _, _) in evidence.items()}, min(fetched for _, fetched, _ in evidence.values())
+
+
+def missing_sources(values):
+    return [source for source in SOURCES if source not in values]
+
+
+def fetch_missing(gene_name, values, executor):
+    """
+    Start live fetches for the sources absent from stored `values`. Returns
+    {source: Future} for those sources only; the accession-based ones use the
+    stored UniProt accession when there is one.
+    """
+    missing = missing_sources(values)
+    if not missing:
+        return {}
+    gene_sources = {name: fn for name, fn in GENE_SOURCES.items() if name in missing}
+    uniprot_sources = {name: fn for name, fn in UNIPROT_SOURCES.items() if name in missing}
+    if "uniprot_id" not in values:
+        return fetch_gene_evidence(gene_name, executor, gene_sources, uniprot_sources)
+    gene_sources["uniprot_id"] = lambda _: values["uniprot_id"]
+    futures = fetch_gene_evidence(gene_name, executor, gene_sources, uniprot_sources)
+    del futures["uniprot_id"]
+    return futures
+
+
+def save_fetched(gene_name, values, errors):
+    # Keep the live fetches of missing sources, so the next lookup is complete
+    table = get_score_table()
+    if table is not None and values:
+        table.save(gene_name, values, errors)
+
+
+def stored_score(gene_name, source_executor, timeouts=SOURCE_TIMEOUTS):
+    """
+    Score row of a gene from the table, with the sources it lacks fetched live
+    and saved back. None when the gene is not in the table.
+    """
+    stored = stored_evidence(gene_name)
+    if stored is None:
+        return None
+    values = stored[0]
+    if not missing_sources(values):
+        return get_score_table().lookup(gene_name)
+    fetched, errors = {}, {}
+    for name, value, error in iter_evidence(fetch_missing(gene_name, values, source_executor), timeouts):
+        if error is not None:
+            errors[name] = error
+        else:
+            fetched[name] = value
+    save_fetched(gene_name, fetched, errors)
+    return evidence_row(gene_name, dict(values, **fetched), errors)
+
+
+def stale_sources(stored, now, refresh_after=REFRESH_AFTER):
+    return {source for source in SOURCES
+            if source not in stored or now - stored[source][1] > refresh_after.get(source, 30 * DAY)}
+
+
+def refresh_gene(gene_name, stored, executor, now=None, timeouts=SOURCE_TIMEOUTS):
+    """
+    Fetch the stale sources of one gene. Returns ({source: value}, {source: error}).
+    A changed UniProt accession makes every accession-based source stale.
+    """
+    now = time.time() if now is None else now
+    stale = stale_sources(stored, now)
+    values, errors = {}, {}
+
+    def collect(futures):
+        for name, future in futures.items():
+            try:
+                values[name] = future.result(timeout=timeouts.get(name, 30))
+            except Exception as e:
+                errors[name] = e
+
+    collect({name: executor.submit(fn, gene_name) for name, fn in GENE_SOURCES.items() if name in stale})
+    if "uniprot_id" in values:
+        uniprot_id = values["uniprot_id"]
+        if "uniprot_id" not in stored or stored["uniprot_id"][0] != uniprot_id:
+            stale |= set(UNIPROT_SOURCES)
+    elif "uniprot_id" in stored:
+        uniprot_id = stored["uniprot_id"][0]
+    else:
+        uniprot_id = None
+    if uniprot_id:
+        collect({name: executor.submit(fn, uniprot_id) for name, fn in UNIPROT_SOURCES.items() if name in stale})
+    elif "uniprot_id" in values:
+        values.update({name: None for name in UNIPROT_SOURCES})
+    return values, errors
+
+
+def refresh_table(table, genes, gene_workers=16, progress=None):
+    """
+    Bring every gene in `genes` up to date: new genes are fetched in full,
+    known ones only for their stale sources. At most `gene_workers` genes are
+    in flight and each is saved as it completes, so a proteome refresh holds
+    only their evidence. Returns (checked, rescored) counts.
+    """
+    checked = rescored = 0
+    source_executor = ThreadPoolExecutor(max_workers=st_http.MAX_CONCURRENCY)
+    gene_executor = ThreadPoolExecutor(max_workers=gene_workers)
+
+    def refresh(gene):
+        return refresh_gene(gene, table.evidence(gene), source_executor)
+
+    try:
+        todo = iter(genes)
+        pending = {}
+        while True:
+            for gene in islice(todo, gene_workers - len(pending)):
+                pending[gene_executor.submit(refresh, gene)] = gene
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                gene = pending.pop(future)
+                values, errors = future.result()
+                checked += 1
+                if (values or errors) and table.save(gene, values, errors):
+                    rescored += 1
+                if progress is not None:
+                    progress(gene, values, errors)
+    finally:
+        gene_executor.shutdown(wait=False, cancel_futures=True)
+        source_executor.shutdown(wait=False, cancel_futures=True)
+    return checked, rescored
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or refresh the precomputed DRARDT score table.")
+    parser.add_argument("--db", default=SCORE_TABLE_PATH, help="score table (SQLite)")
+    parser.add_argument("--email", help="contact email sent to NCBI E-utilities (needed to fetch)")
+    parser.add_argument("--api-key", help="NCBI API key (raises the E-utilities limit to 10 requests/s)")
+    parser.add_argument("--genes", help="file with genes to add (one per line); default: refresh the genes already stored")
+    parser.add_argument("--uniprot-db", help="add the primary gene name of every entry in a local UniProt store")
+    parser.add_argument("--workers", type=int, default=16, help="genes refreshed concurrently")
+    parser.add_argument("--export", help="write the score table to a .tsv or .parquet file and exit")
+    parser.add_argument("--rescore", action="store_true",
+                        help="re-apply the current cut points (DRARDT_SCORING_CONFIG) to the stored counts and exit")
+    args = parser.parse_args(argv)
+
+    table = ScoreTable(args.db)
+    if args.rescore:
+        print(f"Rescored {table.rescore()} genes in {args.db}", file=sys.stderr)
+        return
+    if args.export:
+        write_output(args.export, [{column: row[column] for column in COLUMNS} for row in table.rows()])
+        return
+    if not args.email:
+        parser.error("--email is required to fetch evidence")
+    set_ncbi_contact(args.email, args.api_key)
+    prebuild_kegg_index()
+
+    genes = list(table.genes())
+    if args.genes:
+        genes.extend(read_gene_list(args.genes))
+    if args.uniprot_db:
+        from st_uniprot_store import UniProtStore
+        genes.extend(UniProtStore(args.uniprot_db).primary_genes())
+    genes = list(dict.fromkeys(genes))
+
+    def progress(gene, values, errors):
+        if values or errors:
+            print(f"{gene}\trefreshed {', '.join(sorted(values)) or '-'}"
+                  + (f"\tfailed {', '.join(sorted(errors))}" if errors else ""), file=sys.stderr)
+
+    checked, rescored = refresh_table(table, genes, args.workers, progress)
+    print(f"Checked {checked} genes, rescored {rescored} into {args.db}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
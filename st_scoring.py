@@ -0,0 +1,301 @@
+"""
+DRARDT scoring rules as a table of cut points, evaluated on arrays of raw counts.
+
+A sub-score is its base value plus the number of cut points the raw count
+reaches, so the published rules are:
+
+    publications   <=50: 1, <=100: 2, <=200: 3, more: 4      cuts (51, 101, 201)
+    interactors      <2: 1,    <4: 2,   <=6: 3, more: 4      cuts (2, 4, 7)
+    KEGG pathways    <1: 1,    <2: 2,  more: 3               cuts (1, 2)
+    PDB entries      <1: 1,   <=3: 2,   <=4: 3, more: 4      cuts (1, 4, 5)
+    AlphaFold model  no: 1,   yes: 2                         cuts (1,)
+    DRARDT (sum)     <8: 0,   <11: 1,   <14: 2, more: 3      cuts (8, 11, 14)
+
+DRARDT_SCORING_CONFIG can name a JSON file of {score: [cut points]} overrides.
+With the raw counts stored (st_scoretable.py or a st_batch.py TSV), any rule
+change is a local rescore, and a sweep re-scores every gene under thousands of
+cut configurations at once to show how the ranking shifts.
+
+Usage:
+    python st_scoring.py --db drardt_scores.sqlite --factors 0.5 0.75 1 1.5 2 --drardt-shifts -1 0 1 --output sweep.tsv
+    python st_scoring.py --input scores.tsv --config configs.json --genes-output stability.tsv
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+
+# Sub-score -> (raw column it bins, base value)
+SCORE_RULES = {
+    "pub_count_score": ("pub_count", 1),
+    "interactors_score": ("interactors_count", 1),
+    "KEGG_score": ("pathways_count", 1),
+    "PDB_score": ("pdb_count", 1),
+    "AF2_score": ("alphafold", 1),  # 1 when a model exists, 0 otherwise
+}
+DRARDT_BASE = 0
+DEFAULT_CUTS = {
+    "pub_count_score": (51, 101, 201),
+    "interactors_score": (2, 4, 7),
+    "KEGG_score": (1, 2),
+    "PDB_score": (1, 4, 5),
+    "AF2_score": (1,),
+    "DRARDT_score": (8, 11, 14),
+}
+SWEEP_BLOCK = 256
+
+
+def check_cuts(overrides, source):
+    """
+    {score: cut points} overrides as tuples. Raises ValueError for unknown
+    scores and for cut points that are not numbers in non-decreasing order
+    (bin_score and the sweep only agree on sorted cuts).
+    """
+    if not isinstance(overrides, dict):
+        raise ValueError(f"Cut overrides in {source} must be an object of {{score: [cut points]}}")
+    unknown = set(overrides) - set(DEFAULT_CUTS)
+    if unknown:
+        raise ValueError(f"Unknown scores in {source}: {', '.join(sorted(unknown))}")
+    checked = {}
+    for name, values in overrides.items():
+        if (not isinstance(values, (list, tuple)) or not values
+                or not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values)):
+            raise ValueError(f"{name} in {source} must be a list of numbers, not {values!r}")
+        if any(later < earlier for earlier, later in zip(values, values[1:])):
+            raise ValueError(f"{name} in {source} must list its cut points in non-decreasing order, not {list(values)}")
+        checked[name] = tuple(values)
+    return checked
+
+
+def load_cuts(path=None):
+    # DEFAULT_CUTS with the overrides of a JSON file ({"pub_count_score": [41, 81, 161], ...})
+    cuts = dict(DEFAULT_CUTS)
+    if path:
+        with open(path) as file:
+            cuts.update(check_cuts(json.load(file), path))
+    return cuts
+
+
+SCORING_CUTS = load_cuts(os.environ.get("DRARDT_SCORING_CONFIG"))
+
+
+def bin_score(values, cuts, base):
+    # base + number of cut points each value reaches; scalars or arrays
+    return base + np.searchsorted(np.asarray(cuts), values, side="right")
+
+
+def sub_score(name, raw, cuts=None):
+    cuts = SCORING_CUTS if cuts is None else cuts
+    return int(bin_score(raw, cuts[name], SCORE_RULES[name][1]))
+
+
+def drardt_score(sum_scores, cuts=None):
+    cuts = SCORING_CUTS if cuts is None else cuts
+    return int(bin_score(sum_scores, cuts["DRARDT_score"], DRARDT_BASE))
+
+
+def raw_arrays(rows):
+    """
+    (genes, {raw column: float array}) from score rows (dicts with the st_batch
+    columns, e.g. ScoreTable.rows() or a st_batch TSV). Counts that were not
+    retrieved are nan; the alphafold column becomes 1/0.
+    """
+    rows = list(rows)
+    genes = np.array([row["gene"] for row in rows], dtype=object)
+    raw = {}
+    for name, (column, _) in SCORE_RULES.items():
+        if column == "alphafold":
+            # The URL is empty both for "no model" and "not retrieved"; the sub-score column tells them apart
+            values = [np.nan if row.get(name) in ("", None) else float(bool(row.get(column))) for row in rows]
+        else:
+            values = [np.nan if row.get(column) in ("", None) else float(row[column]) for row in rows]
+        raw[column] = np.array(values, dtype=float)
+    return genes, raw
+
+
+def score_arrays(raw, cuts=None):
+    """
+    Every sub-score and the DRARDT score for arrays of raw counts. Genes with a
+    missing count get -1 for that sub-score and for DRARDT_score.
+    """
+    cuts = SCORING_CUTS if cuts is None else cuts
+    scores, complete = {}, None
+    for name, (column, base) in SCORE_RULES.items():
+        values = raw[column]
+        known = ~np.isnan(values)
+        scores[name] = np.where(known, bin_score(np.nan_to_num(values), cuts[name], base), -1)
+        complete = known if complete is None else complete & known
+    total = sum(scores[name] for name in SCORE_RULES)
+    scores["DRARDT_score"] = np.where(complete, bin_score(total, cuts["DRARDT_score"], DRARDT_BASE), -1)
+    return scores
+
+
+def _stacked_cuts(configs, name):
+    # (n_configs, max cuts) array; shorter lists are padded with +inf, a cut no value reaches
+    width = max(len(config[name]) for config in configs)
+    stacked = np.full((len(configs), width), np.inf)
+    for idx, config in enumerate(configs):
+        stacked[idx, :len(config[name])] = config[name]
+    return stacked
+
+
+def _block_scores(distinct, configs):
+    """
+    (n_configs, n_genes) sums of sub-scores and DRARDT scores for a block of
+    configurations. `distinct` maps each raw column to (distinct values, inverse
+    index): every rule is binned once per distinct value, then gathered per gene.
+    """
+    total = None
+    for name, (column, base) in SCORE_RULES.items():
+        values, inverse = distinct[column]
+        cuts = _stacked_cuts(configs, name)
+        table = (base + (values[None, None, :] >= cuts[:, :, None]).sum(axis=1)).astype(np.int16)
+        total = table[:, inverse] if total is None else total + table[:, inverse]
+    sums = np.arange(int(total.max()) + 1)
+    cuts = _stacked_cuts(configs, "DRARDT_score")
+    table = (DRARDT_BASE + (sums[None, None, :] >= cuts[:, :, None]).sum(axis=1)).astype(np.int8)
+    return total, np.take_along_axis(table, total.astype(np.intp), axis=1)
+
+
+def _tied_ranks(counts):
+    # Average rank of each value given its per-row counts (ties share their mean rank)
+    return np.cumsum(counts, axis=-1) - counts + (counts + 1) / 2
+
+
+def _spearman(total, baseline_total):
+    """
+    Row-wise Spearman correlation of score sums with the baseline sums. Sums are
+    small integers, so ranks come from per-row histograms instead of sorting.
+    """
+    rows, n = total.shape
+    width = int(max(total.max(), baseline_total.max())) + 1
+    base = _tied_ranks(np.bincount(baseline_total, minlength=width))[baseline_total] - (n + 1) / 2
+    flat = (total.astype(np.intp) + width * np.arange(rows)[:, None]).ravel()
+    counts = np.bincount(flat, minlength=rows * width).reshape(rows, width)
+    base_sums = np.bincount(flat, np.tile(base, rows), minlength=rows * width).reshape(rows, width)
+    ranks = _tied_ranks(counts) - (n + 1) / 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (ranks * base_sums).sum(axis=1) / np.sqrt((counts * ranks ** 2).sum(axis=1) * (base ** 2).sum())
+
+
+def sweep(raw, configs, baseline=None, block=SWEEP_BLOCK):
+    """
+    Re-score every complete gene under each configuration (a dict of cut
+    overrides) and compare with `baseline`. Returns (per-configuration
+    summaries, per-gene number of configurations that changed its DRARDT score,
+    mask of the genes that were scored).
+    """
+    baseline = SCORING_CUTS if baseline is None else baseline
+    complete = np.logical_and.reduce([~np.isnan(raw[column]) for column, _ in SCORE_RULES.values()])
+    if not complete.any():
+        raise ValueError("No gene has every raw count; nothing to re-score")
+    distinct = {column: np.unique(values[complete], return_inverse=True) for column, values in raw.items()}
+    configs = [dict(baseline, **config) for config in configs]
+    base_total, base_drardt = _block_scores(distinct, [baseline])
+    changed_by_gene = np.zeros(int(complete.sum()), dtype=np.int64)
+
+    summaries = []
+    for start in range(0, len(configs), block):
+        chunk = configs[start:start + block]
+        total, drardt = _block_scores(distinct, chunk)
+        promoted = (drardt > base_drardt).sum(axis=1)
+        demoted = (drardt < base_drardt).sum(axis=1)
+        changed_by_gene += (drardt != base_drardt).sum(axis=0)
+        correlation = _spearman(total, base_total[0])
+        levels = np.stack([(drardt == level).sum(axis=1) for level in range(4)], axis=1)
+        for idx, config in enumerate(chunk):
+            summary = {"config": start + idx,
+                       "changes": json.dumps({name: list(cuts) for name, cuts in config.items()
+                                              if tuple(cuts) != tuple(baseline[name])}),
+                       "changed": int(promoted[idx] + demoted[idx]),
+                       "promoted": int(promoted[idx]),
+                       "demoted": int(demoted[idx]),
+                       "spearman": round(float(correlation[idx]), 4)}
+            summary.update({f"DRARDT_{level}": int(levels[idx, level]) for level in range(4)})
+            summaries.append(summary)
+    return summaries, changed_by_gene, complete
+
+
+def scaled_configs(factors, drardt_shifts=(0,), baseline=None):
+    """
+    Every combination of the count rules' cut points scaled by one of `factors`
+    (rounded, at least 1) with the DRARDT cut points shifted by one of `drardt_shifts`.
+    The AlphaFold rule is binary and is left as is.
+    """
+    baseline = SCORING_CUTS if baseline is None else baseline
+    scaled = [name for name in SCORE_RULES if name != "AF2_score"]
+    configs = []
+    for combination in itertools.product(factors, repeat=len(scaled)):
+        for shift in drardt_shifts:
+            config = {name: tuple(max(1, int(round(cut * factor))) for cut in baseline[name])
+                      for name, factor in zip(scaled, combination)}
+            config["DRARDT_score"] = tuple(cut + shift for cut in baseline["DRARDT_score"])
+            configs.append(config)
+    return configs
+
+
+def read_rows(path):
+    with open(path, newline="") as file:
+        yield from csv.DictReader(file, delimiter="\t")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep DRARDT cut points over stored raw counts.")
+    parser.add_argument("--db", help="score table built by st_scoretable.py")
+    parser.add_argument("--input", help="st_batch.py TSV output")
+    parser.add_argument("--config", help="JSON list of cut overrides to compare, e.g. [{\"pub_count_score\": [41, 81, 161]}]")
+    parser.add_argument("--factors", type=float, nargs="+", default=[0.5, 0.75, 1.0, 1.5, 2.0],
+                        help="scale factors for the count cut points (all combinations)")
+    parser.add_argument("--drardt-shifts", type=int, nargs="+", default=[-1, 0, 1], help="shifts of the DRARDT cut points")
+    parser.add_argument("--output", default="drardt_sweep.tsv", help="one summary row per configuration")
+    parser.add_argument("--genes-output", help="per gene: configurations that change its DRARDT score")
+    parser.add_argument("--top", type=int, default=10, help="most sensitive genes to print")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        from st_scoretable import ScoreTable
+        rows = ScoreTable(args.db).rows()
+    elif args.input:
+        rows = read_rows(args.input)
+    else:
+        parser.error("give --db or --input")
+    genes, raw = raw_arrays(rows)
+    if args.config:
+        with open(args.config) as file:
+            configs = json.load(file)
+        try:
+            configs = [check_cuts(config, f"{args.config} entry {idx}") for idx, config in enumerate(configs)]
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        configs = scaled_configs(args.factors, args.drardt_shifts)
+
+    start = time.perf_counter()
+    summaries, changed_by_gene, complete = sweep(raw, configs)
+    elapsed = time.perf_counter() - start
+
+    with open(args.output, "w", newline="") as file:
+        writer = csv.DictWriter(file, list(summaries[0]), delimiter="\t", lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(summaries)
+    scored = genes[complete]
+    order = np.argsort(-changed_by_gene, kind="stable")
+    if args.genes_output:
+        baseline = score_arrays({column: values[complete] for column, values in raw.items()})["DRARDT_score"]
+        with open(args.genes_output, "w") as file:
+            file.write("gene\tDRARDT_score\tconfigs_changed\tfraction_changed\n")
+            for idx in order:
+                file.write(f"{scored[idx]}\t{baseline[idx]}\t{changed_by_gene[idx]}\t{changed_by_gene[idx] / len(configs):.4f}\n")
+
+    print(f"Re-scored {len(scored)} complete genes under {len(configs)} configurations in {elapsed * 1000:.1f} ms "
+          f"({len(genes) - len(scored)} incomplete genes skipped); summaries in {args.output}", file=sys.stderr)
+    for idx in order[:args.top]:
+        print(f"{scored[idx]}\tDRARDT score changes in {changed_by_gene[idx]}/{len(configs)} configurations", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
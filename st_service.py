@@ -0,0 +1,267 @@
+"""
+DRARDT as an HTTP/JSON service for other pipelines (requires aiohttp).
+
+Usage:
+    python st_service.py --email you@example.org --port 8080
+
+Endpoints:
+    GET  /score/{gene}   raw counts, sub-scores and DRARDT score of a gene (from the
+                         precomputed score table when the gene is in it)
+    POST /mutations      {"mutations": ["A123C", "B:R45W"], "structure": "<PDB or mmCIF text>",
+                          "uniprot_id": "P04637" (optional, adds PDB coverage)}
+                         404 for an unknown uniprot_id
+    GET  /metrics        Prometheus metrics
+    GET  /health
+
+Errors are JSON {"error": ...}: 400 for malformed requests, 422 for unusable
+structures, 502 when an upstream source fails.
+
+The upstream clients are blocking, so they run on a bounded thread pool and
+leave the event loop free. Concurrent requests for the same gene, or for SASA of
+the same structure, share one in-flight computation. SASA runs on a
+bounded process pool.
+"""
+import sys
+import asyncio
+import argparse
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+from aiohttp import web
+import st_http
+import st_metrics
+from st_pubmed import set_ncbi_contact
+from st_kegg import prebuild_kegg_index
+from st_fetch import SOURCE_TIMEOUTS
+from st_batch import score_gene
+from st_scoretable import stored_score
+from st_sasa import SasaError, sasa_cache_key, sasa_lookup, sasa_store
+from st_structure import StructureError, load_structure
+from st_ensemble import get_sasa_pool, structure_sasa
+from st_simba import SimbaModel, parse_mutations
+from st_uniprot import get_uniprot_record
+from st_missense2 import check_pdb_coverage_batch
+
+FETCH_WORKERS = st_http.MAX_CONCURRENCY
+MAX_MUTATIONS = 10000
+MAX_STRUCTURE_BYTES = 64 * 1024 * 1024
+
+
+class UnknownAccession(LookupError):
+    pass
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller starts the
+    work, later callers await the same task. Nothing is kept once it finishes;
+    caching is left to the layers below.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.shared = 0
+
+    async def do(self, key, factory):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.shared += 1
+        # shield: a client that disconnects must not cancel the work for the others
+        return await asyncio.shield(task)
+
+
+class ScoringService:
+    def __init__(self, timeouts=SOURCE_TIMEOUTS):
+        self.timeouts = timeouts
+        self.gene_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="drardt-gene")
+        self.source_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="drardt-source")
+        self.flights = SingleFlight()
+        self.simba = SimbaModel("simba.tsv")
+
+    async def _run(self, fn, *args, executor=None):
+        return await asyncio.get_running_loop().run_in_executor(executor or self.gene_executor, fn, *args)
+
+    async def score(self, gene_name):
+        # Precomputed genes are answered from the score table; only the sources it lacks are fetched
+        async def compute():
+            row = await self._run(stored_score, gene_name, self.source_executor, self.timeouts)
+            if row is None:
+                row = await self._run(score_gene, gene_name, self.source_executor, self.timeouts)
+            return row
+
+        return await self.flights.do(("score", gene_name.upper()), compute)
+
+    async def sasa(self, pdb_bytes):
+        key = sasa_cache_key(pdb_bytes)
+
+        async def compute():
+            sasa = await self._run(sasa_lookup, key)
+            if sasa is None:
+                sasa, error = await self._run(structure_sasa, pdb_bytes, executor=get_sasa_pool())
+                if error is not None:
+                    raise SasaError(error)
+                await self._run(sasa_store, key, sasa)
+            return sasa
+
+        return await self.flights.do(("sasa", key), compute)
+
+    async def mutations(self, mutations, pdb_bytes, uniprot_id=None):
+        chains, wt, positions, mut = parse_mutations(mutations)
+        structure = await self._run(load_structure, pdb_bytes)
+        coverage = None
+        if uniprot_id:
+            await self.flights.do(("record", uniprot_id), lambda: self._run(check_accession, uniprot_id))
+            coverage = await self.flights.do(("coverage", uniprot_id, tuple(positions.tolist())),
+                                             lambda: self._run(check_pdb_coverage_batch, uniprot_id, positions))
+        sasa = await self.sasa(pdb_bytes)
+        rsa = sasa.rsa_at(sasa.rows(positions, chains))
+        ddg = self.simba.ddg(wt, mut, rsa)
+        unfolding = self.simba.unfolding(ddg)
+        problems = structure.validate_mutations(chains, wt, positions)
+        neighbourhood = (await self._run(lambda: structure.neighbourhood)).at(structure.residue_rows(positions, chains))
+
+        results = []
+        for idx, mutation in enumerate(mutations):
+            result = {
+                "mutation": mutation,
+                "chain": chains[idx] or None,
+                "wild_type": wt[idx],
+                "position": int(positions[idx]),
+                "mutant": mut[idx],
+                "structure_problem": problems[idx],
+                "rsa": None if np.isnan(rsa[idx]) else float(rsa[idx]),
+                "ddG": None if np.isnan(ddg[idx]) else float(ddg[idx]),
+                "unfolding": None if np.isnan(ddg[idx]) else bool(unfolding[idx]),
+                "contacts": None if neighbourhood["contacts"][idx] < 0 else int(neighbourhood["contacts"][idx]),
+                "packing": None if neighbourhood["packing"][idx] < 0 else int(neighbourhood["packing"][idx]),
+                "chain_distance": None if np.isnan(neighbourhood["chain_distance"][idx]) else float(neighbourhood["chain_distance"][idx]),
+                "ligand_distance": None if np.isnan(neighbourhood["ligand_distance"][idx]) else float(neighbourhood["ligand_distance"][idx]),
+            }
+            if uniprot_id:
+                hits = coverage[idx] if coverage else []
+                result["pdb_coverage"] = [{"pdb_id": pdb_id, "chain": chain, "method": method, "resolution": resolution}
+                                          for pdb_id, chain, method, resolution in hits]
+            results.append(result)
+        return results
+
+    def close(self):
+        self.gene_executor.shutdown(wait=False, cancel_futures=True)
+        self.source_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def check_accession(uniprot_id):
+    # UniProt answers an unknown accession with no results, a malformed one with a 4xx
+    try:
+        record = get_uniprot_record(uniprot_id)
+    except requests.HTTPError as e:
+        if e.response is None or not 400 <= e.response.status_code < 500:
+            raise
+        record = None
+    if record is None:
+        raise UnknownAccession(f"UniProt has no entry {uniprot_id}")
+
+
+def _bad_request(message):
+    return web.json_response({"error": message}, status=400)
+
+
+@web.middleware
+async def json_errors(request, handler):
+    # Failures below the handlers still answer with a JSON body
+    try:
+        return await handler(request)
+    except web.HTTPException:
+        raise
+    except UnknownAccession as e:
+        return web.json_response({"error": str(e)}, status=404)
+    except requests.RequestException as e:
+        return web.json_response({"error": f"upstream request failed: {e}"}, status=502)
+    except Exception as e:
+        traceback.print_exc(file=sys.stderr)
+        return web.json_response({"error": f"internal error: {e}"}, status=500)
+
+
+async def handle_score(request):
+    service = request.app["service"]
+    gene_name = request.match_info["gene"].strip()
+    with st_metrics.span("service.score"):
+        row = await service.score(gene_name)
+    return web.json_response(row)
+
+
+async def handle_mutations(request):
+    service = request.app["service"]
+    try:
+        payload = await request.json()
+    except ValueError:
+        return _bad_request("expected a JSON body")
+    if not isinstance(payload, dict):
+        return _bad_request("expected a JSON object")
+    mutations = payload.get("mutations")
+    if isinstance(mutations, str):
+        mutations = [mutation.strip() for mutation in mutations.split(",") if mutation.strip()]
+    structure = payload.get("structure")
+    uniprot_id = payload.get("uniprot_id")
+    if not mutations or not isinstance(mutations, list) or not structure or not isinstance(structure, str):
+        return _bad_request("'mutations' (a list of strings) and 'structure' (PDB or mmCIF text) are required")
+    if not all(isinstance(mutation, str) for mutation in mutations):
+        return _bad_request("every mutation must be a string like A123C or B:A123C")
+    if uniprot_id is not None and not isinstance(uniprot_id, str):
+        return _bad_request("'uniprot_id' must be a string")
+    if len(mutations) > MAX_MUTATIONS:
+        return _bad_request(f"at most {MAX_MUTATIONS} mutations per request")
+    try:
+        parse_mutations(mutations)
+    except ValueError as e:
+        return _bad_request(str(e))
+    try:
+        with st_metrics.span("service.mutations", count=len(mutations)):
+            results = await service.mutations(mutations, structure.encode(), uniprot_id)
+    except (SasaError, StructureError) as e:
+        return web.json_response({"error": str(e)}, status=422)
+    return web.json_response({"mutations": results})
+
+
+async def handle_metrics(request):
+    return web.Response(text=st_metrics.prometheus_text(), content_type="text/plain")
+
+
+async def handle_health(request):
+    return web.json_response({"status": "ok", "coalesced_requests": request.app["service"].flights.shared})
+
+
+def make_app(service=None):
+    app = web.Application(client_max_size=MAX_STRUCTURE_BYTES, middlewares=[json_errors])
+    app["service"] = service or ScoringService()
+    app.router.add_get("/score/{gene}", handle_score)
+    app.router.add_post("/mutations", handle_mutations)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/health", handle_health)
+
+    async def close(app):
+        app["service"].close()
+    app.on_cleanup.append(close)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve DRARDT scores and mutation analysis over HTTP.")
+    parser.add_argument("--email", required=True, help="contact email sent to NCBI E-utilities")
+    parser.add_argument("--api-key", help="NCBI API key (raises the E-utilities limit to 10 requests/s)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args(argv)
+
+    set_ncbi_contact(args.email, args.api_key)
+    prebuild_kegg_index()
+    print(f"Serving DRARDT on http://{args.host}:{args.port}", file=sys.stderr)
+    web.run_app(make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
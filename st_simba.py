@@ -0,0 +1,117 @@
+import re
+import csv
+import numpy as np
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+THREE_TO_ONE = {
+    "ALA": "A", "CYS": "C", "ASP": "D", "GLU": "E", "PHE": "F", "GLY": "G", "HIS": "H",
+    "ILE": "I", "LYS": "K", "LEU": "L", "MET": "M", "ASN": "N", "PRO": "P", "GLN": "Q",
+    "ARG": "R", "SER": "S", "THR": "T", "VAL": "V", "TRP": "W", "TYR": "Y",
+}
+
+# SimBa-NI: ddG = -1.64 + 1.9 * RSA/100 + 0.49 * Vdiff/100 - 0.12 * Hdiff
+INTERCEPT = -1.64
+RSA_COEF = 1.9 / 100
+VOLUME_COEF = 0.49 / 100
+POLARITY_COEF = -0.12
+
+# Mutations with ddG at or below this value are expected to unfold the protein
+UNFOLDING_THRESHOLD = -1.5
+
+
+class SimbaModel:
+    """
+    SimBa-NI ddG with the simba.tsv volume/polarity differences precomputed as
+    20x20 (wild type x mutant) matrices, so any number of mutations is one array expression.
+    """
+
+    def __init__(self, tsv_file="simba.tsv"):
+        volume, polarity = {}, {}
+        with open(tsv_file, 'r') as file:
+            for row in csv.DictReader(file, delimiter='\t'):
+                volume[row['AA']] = float(row['V'])
+                polarity[row['AA']] = float(row['H'])
+
+        self.volume = np.array([volume[aa] for aa in AMINO_ACIDS])
+        self.polarity = np.array([polarity[aa] for aa in AMINO_ACIDS])
+        self.volume_diff = self.volume[None, :] - self.volume[:, None]
+        self.polarity_diff = self.polarity[None, :] - self.polarity[:, None]
+        # Everything but the RSA term depends only on the (wt, mut) pair
+        self.pair_term = INTERCEPT + VOLUME_COEF * self.volume_diff + POLARITY_COEF * self.polarity_diff
+
+        # Byte value of a one-letter code -> row/column, -1 for anything else
+        self._code_index = np.full(256, -1, dtype=np.int8)
+        for idx, aa in enumerate(AMINO_ACIDS):
+            self._code_index[ord(aa)] = idx
+
+    def indices(self, residues):
+        # One-letter codes (string or sequence of single characters) -> matrix indices
+        codes = np.frombuffer("".join(residues).upper().encode("ascii"), dtype=np.uint8)
+        return self._code_index[codes]
+
+    def ddg(self, wt, mut, rsa):
+        """
+        Vectorized SimBa-NI ddG. `wt` and `mut` are sequences of one-letter codes and
+        `rsa` the matching relative solvent accessibilities (%). Unknown residues give nan.
+        """
+        wt_idx, mut_idx = self.indices(wt), self.indices(mut)
+        rsa = np.asarray(rsa, dtype=float)
+        ddg = self.pair_term[wt_idx, mut_idx] + RSA_COEF * rsa
+        return np.where((wt_idx < 0) | (mut_idx < 0), np.nan, ddg)
+
+    def saturation(self, sequence, rsa):
+        """
+        Full saturation mutagenesis: a (len(sequence), 20) ddG matrix with columns in
+        AMINO_ACIDS order. Wild-type and unknown residues are nan.
+        """
+        wt_idx = self.indices(sequence)
+        rsa = np.asarray(rsa, dtype=float)
+        matrix = self.pair_term[wt_idx] + RSA_COEF * rsa[:, None]
+        matrix[wt_idx < 0] = np.nan
+        known = wt_idx >= 0
+        matrix[np.flatnonzero(known), wt_idx[known]] = np.nan
+        return matrix
+
+    def unfolding(self, ddg):
+        return np.asarray(ddg) <= UNFOLDING_THRESHOLD
+
+
+# 'A123C', 'B:A123C', 'p.Ala123Val', 'p.(A123V)' or 'NP_000537.3:p.Arg175His'
+_VARIANT = re.compile(r"(?:(?P<chain>[A-Za-z0-9]{1,4}):)?(?:[A-Z]{2}_\d+(?:\.\d+)?:)?(?:p\.)?\(?"
+                      r"(?P<wt>[A-Z][a-z]{2}|[A-Za-z])(?P<position>\d+)(?P<mut>[A-Z][a-z]{2}|[A-Za-z])\)?")
+
+
+def _one_letter(code):
+    return THREE_TO_ONE.get(code.upper(), "?") if len(code) == 3 else code.upper()
+
+
+def parse_variant(text):
+    """
+    One missense change -> (chain, wild type, position, mutant) with one-letter
+    codes. Raises ValueError for anything else (synonymous, nonsense, frameshift,
+    non-standard residues, malformed text).
+    """
+    match = _VARIANT.fullmatch(text.strip())
+    if match is None:
+        raise ValueError(f"'{text.strip()}' is not a missense change like A123C, B:A123C or p.Ala123Val")
+    wt, mut = _one_letter(match["wt"]), _one_letter(match["mut"])
+    if wt not in AMINO_ACIDS or mut not in AMINO_ACIDS:
+        raise ValueError(f"'{text.strip()}' does not change one standard amino acid into another")
+    if wt == mut:
+        raise ValueError(f"'{text.strip()}' is synonymous")
+    return match["chain"] or "", wt, int(match["position"]), mut
+
+
+def parse_mutations(mutations):
+    # Mutation strings (see parse_variant) -> (chains, wild-type codes, positions, mutant codes); ValueError if any is invalid
+    parsed = [parse_variant(mutation) for mutation in mutations]
+    chains = [chain for chain, _, _, _ in parsed]
+    wt = [code for _, code, _, _ in parsed]
+    positions = np.array([position for _, _, position, _ in parsed], dtype=np.int64)
+    mut = [code for _, _, _, code in parsed]
+    return chains, wt, positions, mut
+
+
+def to_one_letter(residue_names):
+    return "".join(THREE_TO_ONE.get(name.upper(), "X") for name in residue_names)
@@ -0,0 +1,126 @@
+"""
+STRING interaction partners fetched for many genes per request.
+
+Responses are parsed line by line from the stream, and every partner keeps its
+experimental and combined scores so cutoffs are applied after the fetch.
+"""
+import st_http
+from st_cache import get_value, put_value
+
+STRING_PARTNERS_URL = "https://string-db.org/api/tsv/interaction_partners"
+STRING_IDS_URL = "https://string-db.org/api/tsv/get_string_ids"
+STRING_CALLER = "DRARDT"
+HUMAN_SPECIES = 9606
+
+# Identifiers sent per request
+CHUNK_SIZE = 100
+
+# Minimum experimental score for a partner to count as an interactor
+EXPERIMENTAL_CUTOFF = 0.7
+
+
+def iter_partner_rows(genes, network_type="physical", species=HUMAN_SPECIES):
+    """
+    Yield (query name, partner name, experimental score, combined score) for every
+    partner of the given genes, parsing the TSV as it arrives.
+    """
+    data = {
+        "identifiers": "\r".join(genes),
+        "species": species,
+        "network_type": network_type,
+        "caller_identity": STRING_CALLER,
+    }
+    response = st_http.post(STRING_PARTNERS_URL, data=data, stream=True)
+    try:
+        response.raise_for_status()
+        lines = response.iter_lines(decode_unicode=True)
+        header = next(lines, "").split("\t")
+        if "preferredName_A" not in header:
+            return
+        name_a, name_b = header.index("preferredName_A"), header.index("preferredName_B")
+        escore, score = header.index("escore"), header.index("score")
+        for line in lines:
+            if line:
+                fields = line.split("\t")
+                yield fields[name_a], fields[name_b], float(fields[escore]), float(fields[score])
+    finally:
+        response.close()
+
+
+def _cache_key(gene, network_type):
+    return f"string:partners:{network_type}:{gene.upper()}"
+
+
+def preferred_names(genes, species=HUMAN_SPECIES):
+    # {gene: STRING preferred name} for many identifiers in one request; unknown genes are left out
+    data = {
+        "identifiers": "\r".join(genes),
+        "species": species,
+        "limit": 1,
+        "echo_query": 1,
+        "caller_identity": STRING_CALLER,
+    }
+    response = st_http.post(STRING_IDS_URL, data=data)
+    response.raise_for_status()
+    lines = response.text.splitlines()
+    header = lines[0].split("\t") if lines else []
+    if "queryIndex" not in header or "preferredName" not in header:
+        return {}
+    index, name = header.index("queryIndex"), header.index("preferredName")
+    names = {}
+    for line in lines[1:]:
+        fields = line.split("\t")
+        if line and int(fields[index]) < len(genes):
+            names.setdefault(genes[int(fields[index])], fields[name])
+    return names
+
+
+def _fetch_chunk(genes, network_type):
+    partners = {gene: {} for gene in genes}
+    by_name = {gene.upper(): gene for gene in genes}
+    unmatched = {}  # partner rows of queries STRING answered under another name
+    for query, partner, experimental, combined in iter_partner_rows(genes, network_type):
+        # With a single identifier every row belongs to it, whatever name STRING prefers
+        gene = genes[0] if len(genes) == 1 else by_name.get(query.upper())
+        if gene is None:
+            unmatched.setdefault(query.upper(), {})[partner] = (experimental, combined)
+        elif partner.upper() not in (gene.upper(), query.upper()):
+            partners[gene][partner] = (experimental, combined)
+
+    if unmatched:
+        # Aliases are answered under STRING's preferred name: map the genes left empty to
+        # their preferred names in one call. Genes still empty have no partners.
+        empty = [gene for gene in genes if not partners[gene]]
+        for gene, name in preferred_names(empty).items():
+            for partner, scores in unmatched.get(name.upper(), {}).items():
+                if partner.upper() not in (gene.upper(), name.upper()):
+                    partners[gene][partner] = scores
+    return partners
+
+
+def fetch_string_partners(genes, network_type="physical", chunk_size=CHUNK_SIZE):
+    """
+    Return {gene: {partner: (experimental score, combined score)}}. Cached genes are
+    served locally (an empty table is a valid answer); the others are requested
+    chunk_size identifiers at a time.
+    """
+    partners, missing = {}, []
+    for gene in dict.fromkeys(genes):
+        cached = get_value(_cache_key(gene, network_type), "string")
+        if cached is not None:
+            partners[gene] = {name: tuple(scores) for name, scores in cached.items()}
+        else:
+            missing.append(gene)
+
+    for start in range(0, len(missing), chunk_size):
+        for gene, table in _fetch_chunk(missing[start:start + chunk_size], network_type).items():
+            put_value(_cache_key(gene, network_type), "string", table)
+            partners[gene] = table
+    return partners
+
+
+def filter_interactors(partners, min_experimental=EXPERIMENTAL_CUTOFF, min_combined=0.0):
+    # Partner names passing the cutoffs, strongest experimental evidence first
+    kept = [(scores[0], name) for name, scores in partners.items()
+            if scores[0] > min_experimental and scores[1] >= min_combined]
+    return [name for _, name in sorted(kept, key=lambda item: (-item[0], item[1]))]
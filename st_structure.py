@@ -0,0 +1,307 @@
+"""
+Structure model parsed once per uploaded PDB/mmCIF file.
+
+Atoms of the first model sit in one NumPy structured array, with float32
+coordinates and grouped by residue. The residue table holds one row per
+residue, and `residue_starts` gives each residue's first atom. SASA, mutation
+validation and coverage all read the same model instead of re-parsing the file.
+"""
+import shlex
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from st_simba import to_one_letter
+
+ATOM_DTYPE = np.dtype([
+    ("name", "S4"),      # PDB-padded atom name, e.g. b" CA "
+    ("resname", "S3"),
+    ("chain", "S4"),
+    ("resnum", "i4"),
+    ("icode", "S1"),
+    ("element", "S2"),
+    ("hetero", "?"),
+    ("xyz", "f4", (3,)),
+])
+MODEL_CACHE_SIZE = 8
+KEPT_ALTLOCS = (b" ", b"A", b"1", b"", b".", b"?")
+
+
+class StructureError(Exception):
+    pass
+
+
+def _columns(table, start, end):
+    # Fixed-width columns of an (n_lines, 80) byte table as one S-array
+    return np.ascontiguousarray(table[:, start:end]).view(f"S{end - start}").ravel()
+
+
+def _strip(values):
+    return np.char.strip(values)
+
+
+_ATOM_RECORDS = (b"ATOM  ", b"HETATM")
+
+
+def parse_pdb(data):
+    """
+    ATOM/HETATM records of the first model. Every fixed-width column is converted
+    for all atoms at once; only the first alternate location is kept.
+    """
+    end = data.find(b"\nENDMDL")
+    lines = (data if end < 0 else data[:end]).split(b"\n")
+    records = [line[:80].ljust(80) for line in lines if line[:6] in _ATOM_RECORDS]
+    atoms = np.zeros(len(records), dtype=ATOM_DTYPE)
+    if not records:
+        return atoms
+    table = np.frombuffer(b"".join(records), dtype=np.uint8).reshape(len(records), 80)
+    keep = np.isin(_strip(_columns(table, 16, 17)), KEPT_ALTLOCS)
+    table = table[keep]
+    atoms = atoms[:len(table)]
+    try:
+        atoms["resnum"] = _columns(table, 22, 26).astype(np.int32)
+        for axis, start in enumerate((30, 38, 46)):
+            atoms["xyz"][:, axis] = _columns(table, start, start + 8).astype(np.float32)
+    except ValueError as e:
+        raise StructureError(f"Malformed coordinate record in the PDB file: {e}")
+    atoms["name"] = _columns(table, 12, 16)
+    atoms["resname"] = _strip(_columns(table, 17, 20))
+    atoms["chain"] = _strip(_columns(table, 21, 22))
+    atoms["icode"] = _strip(_columns(table, 26, 27))
+    atoms["hetero"] = _columns(table, 0, 6) == b"HETATM"
+    element = _strip(_columns(table, 76, 78))
+    missing = element == b""
+    if missing.any():
+        # Old files without the element column: first letter of the atom name
+        element[missing] = np.char.lstrip(_strip(atoms["name"][missing]), b"0123456789").astype("S1")
+    atoms["element"] = np.char.upper(element)
+    return atoms
+
+
+def _cif_rows(lines, start, width):
+    # Rows of a loop_ body; values split on whitespace unless quoted
+    for line in lines[start:]:
+        if not line or line[0] in "#_" or line.startswith("loop_") or line.startswith("data_"):
+            break
+        values = shlex.split(line) if ("'" in line or '"' in line) else line.split()
+        if len(values) == width:
+            yield values
+
+
+def pdb_atom_name(name, element):
+    # mmCIF atom names back to the padded 4-character PDB form FreeSASA expects
+    if len(name) >= 4 or len(element) == 2:
+        return name[:4].ljust(4)
+    return (" " + name).ljust(4)
+
+
+def parse_mmcif(data):
+    """
+    _atom_site loop of the first model. Author numbering and chain names are
+    used (as in PDB files), falling back to the label_ fields.
+    """
+    lines = data.decode("ascii", errors="replace").splitlines()
+    header, start = [], None
+    for idx, line in enumerate(lines):
+        if line.startswith("_atom_site."):
+            header.append(line.split()[0][len("_atom_site."):])
+            start = idx + 1
+        elif header:
+            break
+    if not header:
+        return np.zeros(0, dtype=ATOM_DTYPE)
+    columns = dict(zip(header, zip(*_cif_rows(lines, start, len(header)))))
+    if not columns:
+        return np.zeros(0, dtype=ATOM_DTYPE)
+
+    def column(*names, default="?"):
+        for name in names:
+            if name in columns:
+                return np.array(columns[name])
+        return np.full(len(next(iter(columns.values()))), default)
+
+    keep = np.ones(len(next(iter(columns.values()))), dtype=bool)
+    models = column("pdbx_PDB_model_num", default="1")
+    keep &= models == models[0]
+    keep &= np.isin(column("label_alt_id", default="."), (".", "?", "A", "1"))
+
+    element = np.char.upper(column("type_symbol", default="")[keep])
+    names = column("auth_atom_id", "label_atom_id")[keep]
+    icode = column("pdbx_PDB_ins_code", default="?")[keep]
+    atoms = np.zeros(int(keep.sum()), dtype=ATOM_DTYPE)
+    try:
+        atoms["resnum"] = column("auth_seq_id", "label_seq_id")[keep].astype(np.int32)
+        for axis, name in enumerate(("Cartn_x", "Cartn_y", "Cartn_z")):
+            atoms["xyz"][:, axis] = column(name)[keep].astype(np.float32)
+    except ValueError as e:
+        raise StructureError(f"Malformed _atom_site record in the mmCIF file: {e}")
+    atoms["name"] = [pdb_atom_name(name, symbol) for name, symbol in zip(names, element)]
+    atoms["resname"] = column("auth_comp_id", "label_comp_id")[keep]
+    atoms["chain"] = column("auth_asym_id", "label_asym_id")[keep]
+    atoms["icode"] = np.where(np.isin(icode, ("?", ".")), "", icode)
+    atoms["hetero"] = column("group_PDB", default="ATOM")[keep] == "HETATM"
+    atoms["element"] = element
+    return atoms
+
+
+def is_mmcif(data):
+    head = data[:4096].lstrip()
+    return head.startswith(b"data_") or b"\n_atom_site." in data[:1 << 20]
+
+
+class StructureModel:
+    """
+    Atoms of one structure plus a residue table (res_chain, res_num, res_icode,
+    res_name: one entry per residue, in file order). Residue i owns atoms
+    residue_starts[i]:residue_starts[i + 1].
+    """
+
+    def __init__(self, atoms, fmt="pdb"):
+        self.atoms = atoms
+        self.format = fmt
+        if len(atoms):
+            changed = ((atoms["chain"][1:] != atoms["chain"][:-1]) | (atoms["resnum"][1:] != atoms["resnum"][:-1])
+                       | (atoms["icode"][1:] != atoms["icode"][:-1]))
+            starts = np.concatenate(([0], np.flatnonzero(changed) + 1))
+        else:
+            starts = np.zeros(0, dtype=np.int64)
+        self.residue_starts = np.append(starts, len(atoms))
+        first = atoms[starts]
+        self.res_chain = first["chain"].astype("U4")
+        self.res_num = first["resnum"]
+        self.res_icode = first["icode"].astype("U1")
+        self.res_name = first["resname"].astype("U3")
+        self.res_hetero = first["hetero"]
+        self.atom_residue = np.repeat(np.arange(len(starts)), np.diff(self.residue_starts))
+        self._index = None
+        self._first_rows = None
+        self._neighbourhood = None
+
+    @classmethod
+    def parse(cls, data):
+        if is_mmcif(data):
+            return cls(parse_mmcif(data), "mmcif")
+        return cls(parse_pdb(data), "pdb")
+
+    def __len__(self):
+        return len(self.res_num)
+
+    @property
+    def nbytes(self):
+        return self.atoms.nbytes + self.residue_starts.nbytes + self.atom_residue.nbytes
+
+    @property
+    def coordinates(self):
+        return self.atoms["xyz"]
+
+    def heavy_atom_mask(self, protein_only=True):
+        # Like the FreeSASA defaults: no hydrogens, and no HETATM records unless asked for
+        mask = ~np.isin(self.atoms["element"], (b"H", b"D"))
+        if protein_only:
+            mask &= ~self.atoms["hetero"]
+        return mask
+
+    @property
+    def neighbourhood(self):
+        # Per-residue contacts, packing and distances to other chains/ligands (st_neighbourhood), computed on first use
+        if self._neighbourhood is None:
+            from st_neighbourhood import compute_neighbourhood
+            self._neighbourhood = compute_neighbourhood(self)
+        return self._neighbourhood
+
+    def sequence(self, chain=None):
+        rows = ~self.res_hetero if chain is None else (~self.res_hetero & (self.res_chain == chain))
+        return to_one_letter(self.res_name[rows])
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {key: row for row, key in enumerate(zip(self.res_chain.tolist(), self.res_num.tolist(), self.res_icode.tolist()))}
+        return self._index
+
+    def residue_rows(self, resnums, chains=None, icodes=None):
+        """
+        Residue-table row of each requested residue, -1 where it is missing. A chain
+        of None or '' picks the first chain (in file order) with that residue.
+        """
+        count = len(resnums)
+        chains = [None] * count if chains is None else chains
+        icodes = [""] * count if icodes is None else icodes
+        if self._first_rows is None:
+            self._first_rows = {}
+            for row, key in enumerate(zip(self.res_num.tolist(), self.res_icode.tolist())):
+                if not self.res_hetero[row]:
+                    self._first_rows.setdefault(key, row)
+        rows = np.empty(count, dtype=np.int64)
+        for idx, (resnum, chain, icode) in enumerate(zip(resnums, chains, icodes)):
+            if chain:
+                rows[idx] = self.index.get((chain, int(resnum), icode or ""), -1)
+            else:
+                rows[idx] = self._first_rows.get((int(resnum), icode or ""), -1)
+        return rows
+
+    def validate_mutations(self, chains, wt, positions):
+        """
+        One message per mutation: None when the structure has the residue with the
+        expected wild type, otherwise why it does not.
+        """
+        rows = self.residue_rows(positions, chains)
+        observed = to_one_letter(self.res_name[np.maximum(rows, 0)]) if len(self) else ""
+        messages = []
+        for idx, (chain, code, position, row) in enumerate(zip(chains, wt, positions, rows)):
+            where = f"chain {chain}" if chain else "any chain"
+            if row < 0:
+                messages.append(f"residue {position} is missing from {where} of the structure")
+            elif observed[idx] != code.upper():
+                messages.append(f"wild-type mismatch at {position}: the structure has "
+                                f"{self.res_name[row]} ({observed[idx]}) in chain {self.res_chain[row]}, not {code}")
+            else:
+                messages.append(None)
+        return messages
+
+    def gaps(self):
+        # {chain: [(first missing, last missing), ...]} from breaks in the protein residue numbering
+        gaps = {}
+        protein = ~self.res_hetero
+        for chain in dict.fromkeys(self.res_chain[protein].tolist()):
+            numbers = np.unique(self.res_num[protein & (self.res_chain == chain)])
+            breaks = np.flatnonzero(np.diff(numbers) > 1)
+            if len(breaks):
+                gaps[chain] = [(int(numbers[idx]) + 1, int(numbers[idx + 1]) - 1) for idx in breaks]
+        return gaps
+
+    def to_pdb_bytes(self, mask=None, chain_labels=None):
+        # PDB text, e.g. to feed an mmCIF upload to the FreeSASA command line; chain_labels maps long chain IDs to one character
+        atoms = self.atoms if mask is None else self.atoms[mask]
+        chain_labels = chain_labels or {}
+        lines = []
+        for serial, atom in enumerate(atoms, 1):
+            x, y, z = atom["xyz"]
+            chain = atom["chain"].decode()
+            lines.append("%-6s%5d %4s %3s %1s%4d%1s   %8.3f%8.3f%8.3f%6.2f%6.2f          %2s" % (
+                "HETATM" if atom["hetero"] else "ATOM", serial % 100000, atom["name"].decode(), atom["resname"].decode(),
+                chain_labels.get(chain, chain[:1]), atom["resnum"], atom["icode"].decode(), x, y, z, 1.0, 0.0, atom["element"].decode()))
+        lines.append("END")
+        return ("\n".join(lines) + "\n").encode()
+
+
+_models = OrderedDict()
+_models_lock = threading.Lock()
+
+
+def load_structure(data):
+    """
+    StructureModel of a PDB or mmCIF file's contents, parsed once per distinct
+    content (small LRU), so every step of a request shares one parse.
+    """
+    key = hashlib.sha256(data).digest()
+    with _models_lock:
+        if key in _models:
+            _models.move_to_end(key)
+            return _models[key]
+    model = StructureModel.parse(data)
+    with _models_lock:
+        _models[key] = model
+        while len(_models) > MODEL_CACHE_SIZE:
+            _models.popitem(last=False)
+    return model
@@ -1,34 +1,160 @@
-import requests
-import json
-import streamlit as st
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from st_cache import SOURCE_TTLS, cached_get
+from st_metrics import instrumented, cache_event
 
+# Everything DRARDT needs from a UniProt entry, requested in a single search call
+RECORD_FIELDS = "accession,length,cc_disease,xref_pdb"
+
+
+@dataclass(frozen=True)
+class PdbCrossRef:
+    pdb_id: str
+    method: str
+    resolution: str
+    chains: str  # e.g. 'A/B=160-453'
+
+
+@dataclass(frozen=True)
+class UniProtRecord:
+    accession: str
+    length: int
+    diseases: tuple  # (disease_id, description) pairs
+    pdb_xrefs: tuple  # PdbCrossRef entries
+
+    @cached_property
+    def coverage(self):
+        # PdbCoverageIndex of pdb_xrefs, built on first use
+        from st_coverage import PdbCoverageIndex
+        return PdbCoverageIndex(self.pdb_xrefs)
+
+
+# "rest" queries rest.uniprot.org; "local" reads a store built by st_uniprot_store.py
+UNIPROT_BACKEND = os.environ.get("DRARDT_UNIPROT_BACKEND", "rest")
+UNIPROT_DB = os.environ.get("DRARDT_UNIPROT_DB", "uniprot_human.sqlite")
+
+# Parsed records kept in process: an LRU of RECORD_CACHE_SIZE entries, each kept as long as the response cache keeps UniProt answers
+RECORD_CACHE_SIZE = 4096
+RECORD_TTL = SOURCE_TTLS["uniprot"]
+
+_records = OrderedDict()  # accession -> (UniProtRecord, time its response was fetched)
+_records_lock = threading.Lock()
+_store = None
+
+
+def set_uniprot_backend(backend, db_path=None):
+    global UNIPROT_BACKEND, UNIPROT_DB, _store
+    if backend not in ("rest", "local"):
+        raise ValueError(f"Unknown UniProt backend: {backend}")
+    UNIPROT_BACKEND = backend
+    if db_path is not None:
+        UNIPROT_DB = db_path
+    with _records_lock:
+        _records.clear()
+        _store = None
+
+
+def _local_store():
+    global _store
+    with _records_lock:
+        if _store is None:
+            if not os.path.exists(UNIPROT_DB):
+                raise FileNotFoundError(f"UniProt store {UNIPROT_DB} not found; build it with st_uniprot_store.py")
+            from st_uniprot_store import UniProtStore
+            _store = UniProtStore(UNIPROT_DB)
+        return _store
+
+
+def parse_uniprot_record(entry):
+    length = entry.get('sequence', {}).get('length')
+
+    diseases = []
+    for comment in entry.get('comments', []):
+        if comment['commentType'] == 'DISEASE' and 'disease' in comment:
+            disease = comment['disease']
+            diseases.append((disease['diseaseId'], disease['description']))
+
+    pdb_xrefs = []
+    for xref in entry.get('uniProtKBCrossReferences', []):
+        if xref['database'] == 'PDB':
+            properties = {prop['key']: prop['value'] for prop in xref.get('properties', [])}
+            pdb_xrefs.append(PdbCrossRef(xref['id'], properties.get('Method', '-'),
+                                         properties.get('Resolution', '-'), properties.get('Chains', '')))
+
+    return UniProtRecord(entry['primaryAccession'], length, tuple(diseases), tuple(pdb_xrefs))
+
+
+def _remember(record, fetched_at=None):
+    # fetched_at of the response the record came from, so a record read from the cache expires with it
+    with _records_lock:
+        _records[record.accession] = (record, time.time() if fetched_at is None else fetched_at)
+        _records.move_to_end(record.accession)
+        while len(_records) > RECORD_CACHE_SIZE:
+            _records.popitem(last=False)
+    return record
+
+
+@instrumented()
+def get_uniprot_record(uniprot_id):
+    """
+    Return the UniProtRecord for an accession, served from the in-process LRU while
+    its response is younger than RECORD_TTL. Returns None if UniProt has no such entry.
+    """
+    record = None
+    with _records_lock:
+        entry = _records.get(uniprot_id)
+        if entry is not None and time.time() - entry[1] < RECORD_TTL:
+            record = entry[0]
+            _records.move_to_end(uniprot_id)
+    if record is not None:
+        cache_event("uniprot_record", "hit")
+        return record
+
+    if UNIPROT_BACKEND == "local":
+        record = _local_store().get(uniprot_id)
+        return _remember(record) if record is not None else None
+
+    url = f"https://rest.uniprot.org/uniprotkb/search?query=accession:{uniprot_id}&fields={RECORD_FIELDS}"
+    response = cached_get(url, "uniprot")
+    response.raise_for_status()
+    data = response.json()
+    if not data['results']:
+        return None
+    return _remember(parse_uniprot_record(data['results'][0]), response.fetched_at)
+
+
+@instrumented()
 def get_human_uniprot_id(gene_name):
-    url = f"https://rest.uniprot.org/uniprotkb/search?query=gene:{gene_name}+AND+organism_id:9606&fields=accession"
-    response = requests.get(url)
+    if UNIPROT_BACKEND == "local":
+        return _local_store().find_gene(gene_name)
+
+    # The same call returns the full record, so the accession-based lookups that follow are free
+    url = f"https://rest.uniprot.org/uniprotkb/search?query=gene:{gene_name}+AND+organism_id:9606&fields={RECORD_FIELDS}"
+    response = cached_get(url, "uniprot")
     data = response.json()
-    return data['results'][0]['primaryAccession'] if data['results'] else None
+    if not data['results']:
+        return None
+    return _remember(parse_uniprot_record(data['results'][0]), response.fetched_at).accession
 
+@instrumented()
 def get_uniprot_length(uniprot_id):
-    url = f"https://rest.uniprot.org/uniprotkb/search?query={uniprot_id}&fields=length"
-    response = requests.get(url)
-    response.raise_for_status()
-    data = json.loads(response.text)
-    if data['results']:
-        return data['results'][0]['sequence']['length']
+    record = get_uniprot_record(uniprot_id)
+    if record is not None and record.length is not None:
+        return record.length
     return "Length not found"
 
+@instrumented()
 def get_uniprot_disease(uniprot_id):
-    url = f"https://rest.uniprot.org/uniprotkb/search?query={uniprot_id}&fields=cc_disease"
-    response = requests.get(url)
-    response.raise_for_status()
-    data = json.loads(response.text)
+    record = get_uniprot_record(uniprot_id)
     
     diseases = []
-    if data['results'] and 'comments' in data['results'][0]:
-        disease_comments = [comment for comment in data['results'][0]['comments'] if comment['commentType'] == 'DISEASE']
-        for comment in disease_comments:
-            disease = comment['disease']
-            diseases.append(f"**_{disease['diseaseId']}_**. {disease['description']}")
+    if record is not None:
+        for disease_id, description in record.diseases:
+            diseases.append(f"**_{disease_id}_**. {description}")
     
     if diseases:
         return "\n".join(diseases)
@@ -0,0 +1,226 @@
+"""
+Local UniProt knowledge store built from bulk dumps.
+
+Usage:
+    python st_uniprot_store.py uniprotkb_human.xml.gz --db uniprot_human.sqlite
+
+Accepted dumps (optionally gzipped): UniProtKB XML, the REST JSON stream
+({"results": [...]}) or one JSON entry per line, and TSV downloads with the
+Entry, Gene Names, Length, Involvement in disease and PDB columns.
+Point the app at the store with DRARDT_UNIPROT_BACKEND=local and DRARDT_UNIPROT_DB.
+"""
+import re
+import csv
+import gzip
+import json
+import sqlite3
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+from dataclasses import astuple
+from st_uniprot import PdbCrossRef, UniProtRecord, parse_uniprot_record
+
+UNIPROT_NS = "{http://uniprot.org/uniprot}"
+HUMAN_TAXON = "9606"
+
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def _detect_format(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith(".xml"):
+        return "xml"
+    if name.endswith((".tsv", ".tab", ".txt")):
+        return "tsv"
+    return "json"
+
+
+def iter_xml_entries(path):
+    # Streams <entry> elements and frees each one once converted, so memory stays flat
+    with _open_text(path) as file:
+        for _, elem in ET.iterparse(file, events=("end",)):
+            if elem.tag != UNIPROT_NS + "entry":
+                continue
+            taxon = elem.find(f"{UNIPROT_NS}organism/{UNIPROT_NS}dbReference[@type='NCBI Taxonomy']")
+            if taxon is None or taxon.get("id") == HUMAN_TAXON:
+                yield _xml_entry(elem)
+            elem.clear()
+
+
+def _xml_entry(elem):
+    ns = UNIPROT_NS
+    accession = elem.findtext(ns + "accession")
+    genes = []
+    for name in elem.findall(f"{ns}gene/{ns}name"):
+        if name.get("type") in ("primary", "synonym"):
+            genes.append(name.text)
+
+    diseases = []
+    for comment in elem.findall(ns + "comment"):
+        if comment.get("type") == "disease":
+            disease = comment.find(ns + "disease")
+            if disease is not None:
+                diseases.append((disease.findtext(ns + "name"), disease.findtext(ns + "description")))
+
+    pdb_xrefs = []
+    for xref in elem.findall(ns + "dbReference"):
+        if xref.get("type") == "PDB":
+            properties = {prop.get("type"): prop.get("value") for prop in xref.findall(ns + "property")}
+            pdb_xrefs.append(PdbCrossRef(xref.get("id"), properties.get("method", "-"),
+                                         properties.get("resolution", "-"), properties.get("chains", "")))
+
+    sequence = elem.find(ns + "sequence")
+    length = int(sequence.get("length")) if sequence is not None and sequence.get("length") else None
+    record = UniProtRecord(accession, length, tuple(diseases), tuple(pdb_xrefs))
+    return record, genes, elem.get("dataset") == "Swiss-Prot"
+
+
+def _json_entry(entry):
+    genes = []
+    for gene in entry.get("genes", []):
+        if "geneName" in gene:
+            genes.append(gene["geneName"]["value"])
+        genes.extend(synonym["value"] for synonym in gene.get("synonyms", []))
+    reviewed = "reviewed" in entry.get("entryType", "").lower() and "unreviewed" not in entry.get("entryType", "").lower()
+    return parse_uniprot_record(entry), genes, reviewed
+
+
+def iter_json_entries(path, chunk_size=1 << 20):
+    # Handles both {"results": [...]} and JSON lines without loading the whole file
+    decoder = json.JSONDecoder()
+    with _open_text(path) as file:
+        buffer = file.read(chunk_size)
+        stripped = buffer.lstrip()
+        if stripped.startswith("{") and '"results"' in stripped[:200]:
+            buffer = buffer[buffer.index("[", buffer.index('"results"')) + 1:]
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                entry, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                more = file.read(chunk_size)
+                if not more:
+                    return
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            pos = end
+            organism = entry.get("organism", {}).get("taxonId")
+            if organism is None or str(organism) == HUMAN_TAXON:
+                yield _json_entry(entry)
+
+
+_TSV_DISEASE = re.compile(r"DISEASE:\s*(.+?)\s*(?:\([A-Z0-9-]+\)\s*)?(?:\[MIM:\d+\])?:\s*(.*?)(?=\s*DISEASE:|$)", re.S)
+
+
+def iter_tsv_entries(path):
+    # TSV downloads carry PDB IDs only, without method, resolution or chain ranges
+    with _open_text(path) as file:
+        for row in csv.DictReader(file, delimiter="\t"):
+            diseases = tuple((name, description.split(" Note=")[0].strip())
+                             for name, description in _TSV_DISEASE.findall(row.get("Involvement in disease", "")))
+            pdb_ids = [pdb_id for pdb_id in row.get("PDB", "").split(";") if pdb_id.strip()]
+            pdb_xrefs = tuple(PdbCrossRef(pdb_id.strip(), "-", "-", "") for pdb_id in pdb_ids)
+            length = int(row["Length"]) if row.get("Length") else None
+            genes = row.get("Gene Names", "").split()
+            record = UniProtRecord(row["Entry"], length, diseases, pdb_xrefs)
+            yield record, genes, row.get("Reviewed", "reviewed") == "reviewed"
+
+
+ENTRY_READERS = {"xml": iter_xml_entries, "json": iter_json_entries, "tsv": iter_tsv_entries}
+
+
+class UniProtStore:
+    """
+    SQLite store of UniProtRecords indexed by accession and by gene name.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " accession TEXT PRIMARY KEY, length INTEGER, reviewed INTEGER, diseases TEXT, pdb_xrefs TEXT);"
+            "CREATE TABLE IF NOT EXISTS genes (gene TEXT, accession TEXT, rank INTEGER);"
+            "CREATE INDEX IF NOT EXISTS genes_by_name ON genes (gene COLLATE NOCASE, rank);"
+            "CREATE INDEX IF NOT EXISTS genes_by_accession ON genes (accession);"
+        )
+
+    def import_dump(self, path, dump_format=None, batch_size=5000):
+        reader = ENTRY_READERS[dump_format or _detect_format(path)]
+        count = 0
+        entries, genes = [], []
+        with self._lock:
+            for record, gene_names, reviewed in reader(path):
+                entries.append((record.accession, record.length, int(reviewed),
+                                json.dumps(record.diseases), json.dumps([astuple(xref) for xref in record.pdb_xrefs])))
+                # Primary names rank before synonyms, reviewed entries before unreviewed ones
+                genes.extend((name, record.accession, (0 if rank == 0 else 2) + (0 if reviewed else 1))
+                             for rank, name in enumerate(gene_names))
+                count += 1
+                if len(entries) >= batch_size:
+                    self._flush(entries, genes)
+                    entries, genes = [], []
+            self._flush(entries, genes)
+        return count
+
+    def _flush(self, entries, genes):
+        accessions = [(entry[0],) for entry in entries]
+        self._db.executemany("DELETE FROM genes WHERE accession = ?", accessions)
+        self._db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", entries)
+        self._db.executemany("INSERT INTO genes VALUES (?, ?, ?)", genes)
+        self._db.commit()
+
+    def get(self, accession):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT accession, length, diseases, pdb_xrefs FROM entries WHERE accession = ?", (accession,)
+            ).fetchone()
+        if row is None:
+            return None
+        diseases = tuple(tuple(disease) for disease in json.loads(row[2]))
+        pdb_xrefs = tuple(PdbCrossRef(*xref) for xref in json.loads(row[3]))
+        return UniProtRecord(row[0], row[1], diseases, pdb_xrefs)
+
+    def find_gene(self, gene_name):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT accession FROM genes WHERE gene = ? COLLATE NOCASE ORDER BY rank LIMIT 1", (gene_name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def primary_genes(self):
+        # Primary gene name of every reviewed entry, e.g. to score the whole proteome
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT gene FROM genes WHERE rank = 0 ORDER BY gene").fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        self._db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a UniProt human proteome dump into a local store.")
+    parser.add_argument("dumps", nargs="+", help="UniProtKB XML, JSON or TSV dump files (optionally .gz)")
+    parser.add_argument("--db", default="uniprot_human.sqlite", help="SQLite store to create or update")
+    parser.add_argument("--format", choices=sorted(ENTRY_READERS), help="dump format (default: from the file name)")
+    args = parser.parse_args(argv)
+
+    store = UniProtStore(args.db)
+    for dump in args.dumps:
+        count = store.import_dump(dump, args.format)
+        print(f"Imported {count} entries from {dump} into {args.db}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
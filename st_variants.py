@@ -0,0 +1,278 @@
+"""
+Bulk variant screening against one structure: coverage, RSA and SimBa-NI ΔΔG.
+
+Input files are VCFs annotated with VEP (CSQ) or SnpEff (ANN), ClinVar-style
+tables (TSV/CSV with a protein change or Name column), or plain lists of
+protein changes (A123C, B:A123C, p.Ala123Val). Plain or gzipped.
+
+Usage:
+    python st_variants.py clinvar_result.txt --structure model.pdb --uniprot P04637 --output screen.tsv
+    python st_variants.py patient.vcf.gz --structure model.cif --gene TP53
+
+Files are read line by line and variants are screened in chunks of CHUNK_SIZE,
+rejected ones included, so memory is bounded by one chunk plus the set of
+distinct variants already seen. Result rows are written as each chunk completes.
+"""
+import io
+import re
+import csv
+import sys
+import gzip
+import argparse
+import itertools
+from collections import Counter
+import numpy as np
+from st_simba import parse_variant
+
+CHUNK_SIZE = 2000
+VARIANT_FILE_TYPES = ["vcf", "tsv", "csv", "txt", "gz"]
+# Table columns holding the protein change, most specific first (compared lower-case). ClinVar's Name
+# carries the canonical-transcript change, while its "Protein change" column lists every isoform.
+PROTEIN_COLUMNS = ("hgvsp", "hgvs.p", "hgvs_p", "name", "protein change", "protein_change", "proteinchange",
+                   "aa_change", "mutation", "variant")
+GENE_COLUMNS = ("gene", "gene(s)", "symbol", "gene_symbol", "genesymbol", "gene_name")
+SCREEN_COLUMNS = ("line", "input", "variant", "chain", "wild_type", "position", "mutant", "status",
+                  "rsa", "ddG", "unfolding", "contacts", "packing", "chain_distance", "ligand_distance",
+                  "pdb_structures", "best_template")
+
+_HGVS_P = re.compile(r"p\.\(?(?:[A-Z][a-z]{2}|[A-Z])\d+(?:[A-Z][a-z]{2}|[A-Z*=])\)?")
+_SHORT_CHANGE = re.compile(r"\b[A-Z]\d+[A-Z]\b")
+
+
+def open_lines(source, name=None):
+    """
+    Text lines of a path or a binary file object (e.g. a Streamlit upload),
+    gunzipped when the name ends in .gz. Nothing is read ahead.
+    """
+    if isinstance(source, str):
+        name, source = source, open(source, "rb")
+    else:
+        name = name or getattr(source, "name", "")
+        source.seek(0)
+    if name.lower().endswith(".gz"):
+        source = gzip.GzipFile(fileobj=source)
+    return io.TextIOWrapper(source, encoding="utf-8", errors="replace", newline="")
+
+
+def protein_changes(text):
+    # Protein changes mentioned in free text, e.g. ClinVar's 'NM_000546.6(TP53):c.524G>A (p.Arg175His)'
+    changes = [change if "(" in change else change.rstrip(")") for change in _HGVS_P.findall(text)]
+    return changes or _SHORT_CHANGE.findall(text)
+
+
+def _annotation_fields(header_line):
+    # '##INFO=<ID=CSQ,...,Description="... Format: Allele|Consequence|...">' -> field names
+    description = header_line.split("Description=", 1)[-1].strip('">\n\r ')
+    description = description.split("Format:", 1)[-1].strip(" '")
+    return [field.strip(" '") for field in description.split("|")]
+
+
+def vcf_variants(lines, gene=None):
+    """
+    (line number, record, protein change text) for every distinct protein
+    change annotated on each VCF record. Records without one are yielded with
+    None so that they can be reported.
+    """
+    formats = {}
+    for line_no, line in enumerate(lines, 1):
+        if line.startswith("##INFO=<ID=CSQ,") or line.startswith("##INFO=<ID=ANN,"):
+            formats[line[11:14]] = _annotation_fields(line)
+            continue
+        if line.startswith("#") or not line.strip():
+            continue
+        fields = line.rstrip("\r\n").split("\t")
+        if len(fields) < 8:
+            yield line_no, line.strip()[:80], None
+            continue
+        record = f"{fields[0]}:{fields[1]} {fields[3]}>{fields[4]}"
+        changes = []
+        for entry in fields[7].split(";"):
+            key, _, value = entry.partition("=")
+            if key in formats:
+                names = formats[key]
+                change_field = next((names.index(name) for name in ("HGVSp", "HGVS.p") if name in names), None)
+                gene_field = next((names.index(name) for name in ("SYMBOL", "Gene_Name") if name in names), None)
+                for annotation in value.split(","):
+                    values = annotation.split("|")
+                    if change_field is None or change_field >= len(values):
+                        continue
+                    if gene and gene_field is not None and values[gene_field] and values[gene_field].upper() != gene.upper():
+                        continue
+                    changes.extend(protein_changes(values[change_field].replace("%3D", "=")))
+            elif key.upper() in ("HGVSP", "HGVS_P", "AA_CHANGE"):
+                changes.extend(protein_changes(value))
+        if not changes:
+            yield line_no, record, None
+        for change in dict.fromkeys(changes):
+            yield line_no, record, change
+
+
+def table_variants(lines, delimiter, gene=None):
+    # ClinVar-style table: the protein change is read from the first PROTEIN_COLUMNS column in the header
+    rows = csv.reader(lines, delimiter=delimiter)
+    header = [column.strip().lower() for column in next(rows, [])]
+    column = next((header.index(name) for name in PROTEIN_COLUMNS if name in header), None)
+    gene_column = next((header.index(name) for name in GENE_COLUMNS if name in header), None)
+    if column is None:
+        raise ValueError(f"No protein change column found; expected one of: {', '.join(PROTEIN_COLUMNS)}")
+    for line_no, row in enumerate(rows, 2):
+        if len(row) <= column:
+            continue
+        if gene and gene_column is not None and gene_column < len(row):
+            genes = {name.strip().upper() for name in re.split(r"[|,;]", row[gene_column])}
+            if genes != {""} and gene.upper() not in genes:
+                continue
+        changes = protein_changes(row[column])
+        if not changes:
+            yield line_no, row[column], None
+        for change in dict.fromkeys(changes):
+            yield line_no, row[column], change
+
+
+def list_variants(lines):
+    # One or more changes per line, separated by commas or whitespace; '#' starts a comment
+    for line_no, line in enumerate(lines, 1):
+        for token in re.split(r"[,\s]+", line.split("#", 1)[0]):
+            if token:
+                yield line_no, token, token
+
+
+def iter_variants(lines, name="", gene=None):
+    """
+    (line number, input text, change text or None) from a variant file in any
+    supported format, detected from the name and the first line.
+    """
+    lines = iter(lines)
+    first = next(lines, "")
+    lines = itertools.chain([first], lines)
+    lower = name.lower()
+    if ".vcf" in lower or first.startswith("##fileformat=VCF"):
+        return vcf_variants(lines, gene)
+    delimiter = "\t" if "\t" in first else ("," if lower.endswith((".csv", ".csv.gz")) else None)
+    if delimiter and any(column.strip().lower() in PROTEIN_COLUMNS for column in first.split(delimiter)):
+        return table_variants(lines, delimiter, gene)
+    return list_variants(lines)
+
+
+class VariantScreen:
+    """
+    Screens a stream of variants against one StructureModel and its ResidueSasa.
+    `run` yields lists of result rows (dicts with SCREEN_COLUMNS), one list per
+    chunk; `counts` tracks read, duplicate, rejected and screened variants.
+    """
+
+    def __init__(self, structure, sasa, simba, uniprot_id=None, chunk_size=CHUNK_SIZE):
+        self.structure = structure
+        self.sasa = sasa
+        self.simba = simba
+        self.uniprot_id = uniprot_id
+        self.chunk_size = chunk_size
+        self.counts = Counter()
+        self._seen = set()
+
+    def run(self, variants):
+        rows, pending = [], []
+        for line_no, text, change in variants:
+            self.counts["read"] += 1
+            row = {"line": line_no, "input": text}
+            try:
+                if change is None:
+                    raise ValueError("no protein change found")
+                chain, wt, position, mut = parse_variant(change)
+            except ValueError as e:
+                self.counts["rejected"] += 1
+                rows.append(dict(row, status=str(e)))
+            else:
+                key = (chain, wt, position, mut)
+                if key in self._seen:
+                    self.counts["duplicates"] += 1
+                    continue
+                self._seen.add(key)
+                pending.append(dict(row, variant=(f"{chain}:" if chain else "") + f"{wt}{position}{mut}",
+                                    chain=chain, wild_type=wt, position=position, mutant=mut))
+            if len(rows) + len(pending) >= self.chunk_size:
+                yield self._merge(rows, pending)
+                rows, pending = [], []
+        if rows or pending:
+            yield self._merge(rows, pending)
+
+    def _merge(self, rejected, pending):
+        # Back in file order
+        return sorted(rejected + self._screen(pending), key=lambda row: row["line"])
+
+    def _screen(self, pending):
+        # Coverage, RSA and ΔΔG of one chunk, each as one vectorized step
+        if not pending:
+            return pending
+        from st_missense2 import check_pdb_coverage_batch
+        chains = [row["chain"] for row in pending]
+        wt = [row["wild_type"] for row in pending]
+        positions = np.array([row["position"] for row in pending], dtype=np.int64)
+        mut = [row["mutant"] for row in pending]
+
+        problems = self.structure.validate_mutations(chains, wt, positions)
+        neighbourhood = self.structure.neighbourhood.at(self.structure.residue_rows(positions, chains))
+        rsa = self.sasa.rsa_at(self.sasa.rows(positions, chains))
+        ddg = self.simba.ddg(wt, mut, rsa)
+        unfolding = self.simba.unfolding(ddg)
+        coverage = check_pdb_coverage_batch(self.uniprot_id, positions) if self.uniprot_id else None
+
+        for idx, row in enumerate(pending):
+            row["status"] = problems[idx] or "ok"
+            # No ΔΔG for a residue the structure lacks or has with another wild type
+            if problems[idx] is None and not np.isnan(ddg[idx]):
+                row.update(rsa=round(float(rsa[idx]), 2), ddG=round(float(ddg[idx]), 3), unfolding=bool(unfolding[idx]))
+            if problems[idx] is None:
+                row.update(contacts=int(neighbourhood["contacts"][idx]), packing=int(neighbourhood["packing"][idx]))
+                row.update({name: round(float(neighbourhood[name][idx]), 2) for name in ("chain_distance", "ligand_distance")
+                            if not np.isnan(neighbourhood[name][idx])})
+            if coverage is not None:
+                hits = coverage[idx]
+                row["pdb_structures"] = len(hits)
+                row["best_template"] = f"{hits[0][0]} {hits[0][1]}" if hits else ""
+        self.counts["screened"] += len(pending)
+        self.counts["valid"] += sum(problem is None for problem in problems)
+        return pending
+
+
+def write_rows(file, chunks):
+    # Streams the result chunks as TSV; yields each chunk again for progress or previews
+    writer = csv.DictWriter(file, SCREEN_COLUMNS, delimiter="\t", restval="", lineterminator="\n")
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield chunk
+
+
+def main(argv=None):
+    from st_structure import load_structure
+    from st_sasa import cached_compute_sasa
+    from st_simba import SimbaModel
+    parser = argparse.ArgumentParser(description="Screen a file of missense variants against one structure.")
+    parser.add_argument("variants", help="VCF (VEP/SnpEff annotated), ClinVar-style TSV/CSV or a list of protein changes")
+    parser.add_argument("--structure", required=True, help="PDB or mmCIF file the positions refer to")
+    parser.add_argument("--uniprot", help="UniProt accession, adds the experimental structures covering each position")
+    parser.add_argument("--gene", help="keep only annotations of this gene (multi-gene VCFs and tables)")
+    parser.add_argument("--output", default="-", help="result TSV (default: standard output)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    with open(args.structure, "rb") as file:
+        pdb_bytes = file.read()
+    screen = VariantScreen(load_structure(pdb_bytes), cached_compute_sasa(pdb_bytes), SimbaModel("simba.tsv"),
+                           args.uniprot, args.chunk_size)
+    output = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        with open_lines(args.variants) as lines:
+            for _ in write_rows(output, screen.run(iter_variants(lines, args.variants, args.gene))):
+                pass
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    counts = screen.counts
+    print(f"{counts['read']} variants read: {counts['screened']} screened ({counts['valid']} matching the structure), "
+          f"{counts['duplicates']} duplicates, {counts['rejected']} rejected", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
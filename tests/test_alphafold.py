@@ -0,0 +1,37 @@
+import os
+import time
+import st_alphafold
+from st_alphafold import AlphaFoldIndex, has_alphafold_model
+
+
+def _use_index(monkeypatch, path):
+    monkeypatch.setattr(st_alphafold, "ALPHAFOLD_INDEX_PATH", path)
+    monkeypatch.setattr(st_alphafold, "_index", None)
+    monkeypatch.setattr(st_alphafold, "_index_stat", None)
+
+
+def test_index_membership_and_reload(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache" / "alphafold_accessions.npy")
+    _use_index(monkeypatch, path)
+    monkeypatch.setattr(st_alphafold, "remote_has_model", lambda uniprot_id: "remote")
+    assert has_alphafold_model("P04637") == "remote"  # no index yet
+
+    AlphaFoldIndex.build(["P04637", "Q00001", "P04637"]).save(path)
+    assert has_alphafold_model("P04637") is True and has_alphafold_model("Q00001") is True
+    assert has_alphafold_model("P99999") is False
+
+    AlphaFoldIndex.build(["P04637", "P99999", "Q00001"]).save(path)
+    assert has_alphafold_model("P99999") is True  # a rebuilt file is picked up
+
+
+def test_stale_index_checks_misses_remotely(tmp_path, monkeypatch):
+    path = str(tmp_path / "alphafold_accessions.npy")
+    _use_index(monkeypatch, path)
+    AlphaFoldIndex.build(["P04637"]).save(path)
+    old = time.time() - st_alphafold.ALPHAFOLD_INDEX_TTL - 60
+    os.utime(path, (old, old))
+    remote = []
+    monkeypatch.setattr(st_alphafold, "remote_has_model", lambda uniprot_id: remote.append(uniprot_id) or True)
+    assert has_alphafold_model("P04637") is True
+    assert has_alphafold_model("P99999") is True
+    assert remote == ["P99999"]
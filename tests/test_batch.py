@@ -0,0 +1,83 @@
+import pytest
+import st_batch
+from st_batch import COLUMNS, NO_UNIPROT_ENTRY, ParquetWriter, compact_output, read_output, run_batch
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def _row(gene, errors="", pub_count=120):
+    row = dict.fromkeys(COLUMNS, "")
+    row.update(gene=gene, uniprot_id="P00001", pub_count=pub_count, pub_count_score=3, errors=errors)
+    return row
+
+
+def _fake_scores(outcomes):
+    # score_gene stand-in: each gene fails until its outcomes list runs out
+    def score_gene(gene, source_executor, timeouts):
+        errors = outcomes.get(gene, [])
+        return _row(gene, errors.pop(0) if errors else "")
+    return score_gene
+
+
+def test_parquet_rows_checkpointed_only_once_their_part_is_closed(tmp_path):
+    path = str(tmp_path / "scores.parquet")
+    writer = ParquetWriter(path, rows_per_part=2)
+    assert writer.write(_row("A")) == []
+    durable = writer.write(_row("B"))
+    assert [row["gene"] for row in durable] == ["A", "B"]
+    assert writer.write(_row("C")) == []
+    # "Crash" here: C was never flushed, but the finished part is readable on its own
+    assert pq.read_table(path).column("gene").to_pylist() == ["A", "B"]
+    assert [row["gene"] for row in writer.close()] == ["C"]
+    assert [row["gene"] for row in read_output(path)] == ["A", "B", "C"]
+
+
+def test_parquet_columns_are_typed(tmp_path):
+    path = str(tmp_path / "scores.parquet")
+    writer = ParquetWriter(path)
+    writer.write(_row("A"))
+    writer.write(_row("B", errors="publications: timeout", pub_count=""))
+    writer.close()
+    table = pq.read_table(path)
+    assert str(table.schema.field("pub_count").type) == "int64"
+    assert str(table.schema.field("errors").type) == "string"
+    assert table.column("pub_count").to_pylist() == [120, None]
+
+
+def test_resumed_run_retries_failures_and_compacts(tmp_path, monkeypatch):
+    path = str(tmp_path / "scores.parquet")
+    outcomes = {"B": ["publications: timeout"]}
+    monkeypatch.setattr(st_batch, "score_gene", _fake_scores(outcomes))
+    monkeypatch.setattr(st_batch, "prefetch_string_partners", lambda genes: None)
+
+    assert run_batch(["A", "B", "C"], path, gene_workers=2) == 3
+    with open(path + ".done") as file:
+        assert sorted(file.read().split()) == ["A", "C"]
+
+    assert run_batch(["A", "B", "C"], path, gene_workers=2) == 1
+    rows = list(read_output(path))
+    assert sorted(row["gene"] for row in rows) == ["A", "B", "C"]
+    assert all(row["errors"] == "" for row in rows)
+    assert st_batch.parquet_parts(path) == [path]
+
+
+def test_compaction_keeps_the_checkpointed_row(tmp_path):
+    path = str(tmp_path / "scores.tsv")
+    writer = st_batch.TsvWriter(path)
+    writer.write(_row("A", errors="interactors: timeout"))
+    writer.write(_row("A", pub_count=7))
+    writer.write(_row("A", errors="pathways: timeout"))  # a late failed retry never replaces a good row
+    writer.write(_row("B", errors=f"uniprot_id: {NO_UNIPROT_ENTRY}"))
+    writer.close()
+    assert compact_output(path) == 2
+    rows = list(read_output(path))
+    assert [(row["gene"], row["pub_count"]) for row in rows] == [("A", "7"), ("B", "120")]
+
+
+def test_pdb_score_follows_current_cuts(monkeypatch):
+    import st_scoring
+    cuts = dict(st_scoring.SCORING_CUTS, PDB_score=(10, 20, 30))
+    monkeypatch.setattr(st_scoring, "SCORING_CUTS", cuts)
+    # The stored tuple still carries the score from the default cuts
+    row = st_batch.evidence_row("A", {"uniprot_id": "P00001", "structures": (6, [], 4)}, {})
+    assert row["pdb_count"] == 6 and row["PDB_score"] == 1
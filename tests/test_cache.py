@@ -0,0 +1,126 @@
+import time
+import pytest
+import st_cache
+from st_cache import ResponseCache, cached_get, normalize_key
+
+
+def _total(cache):
+    return cache._db.execute("SELECT bytes FROM totals").fetchone()[0]
+
+
+def _actual(cache):
+    return cache.size()[1]
+
+
+def test_eviction_drops_oldest_and_keeps_total_exact(tmp_path):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), max_bytes=100)
+    for idx in range(5):
+        cache.store(f"k{idx}", "x", 200, b"x" * 30)
+    assert cache.size() == (3, 90)
+    assert _total(cache) == 90
+    assert cache.lookup("k0") is None and cache.lookup("k4") is not None
+    assert cache.stats["evictions"] == 2
+
+
+def test_replacing_a_key_counts_only_the_new_size(tmp_path):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), max_bytes=100)
+    cache.store("k", "x", 200, b"x" * 60)
+    cache.store("k", "x", 200, b"x" * 10)
+    cache.store("j", "x", 200, b"x" * 80)
+    assert cache.size() == (2, 90) and _total(cache) == 90
+
+
+def test_tied_access_times_keep_the_total_exact(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), max_bytes=100)
+    monkeypatch.setattr(st_cache.time, "time", lambda: 1000.0)  # every entry ties on accessed_at
+    for idx in range(20):
+        cache.store(f"k{idx}", "x", 200, b"x" * (7 + idx % 5 * 11))
+        assert _total(cache) == _actual(cache) <= 100
+
+
+def test_an_entry_larger_than_the_cache_is_dropped(tmp_path):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), max_bytes=100)
+    cache.store("small", "x", 200, b"x" * 10)
+    cache.store("huge", "x", 200, b"x" * 500)
+    assert cache.size() == (0, 0) and _total(cache) == 0
+
+
+def test_processes_sharing_a_file_share_the_total(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    first, second = ResponseCache(path, max_bytes=100), ResponseCache(path, max_bytes=100)
+    first.store("a", "x", 200, b"x" * 40)
+    second.store("b", "x", 200, b"x" * 40)
+    first.store("c", "x", 200, b"x" * 40)
+    assert first.size() == (2, 80) and _total(second) == 80
+
+
+def test_total_recounted_on_open_and_when_negative(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    cache = ResponseCache(path, max_bytes=1000)
+    cache.store("a", "x", 200, b"x" * 40)
+    cache._db.execute("UPDATE totals SET bytes = 7")
+    assert _total(ResponseCache(path, max_bytes=1000)) == 40
+    cache._db.execute("UPDATE totals SET bytes = 0")
+    cache.store("b", "x", 200, b"x" * 5)
+    cache.store("a", "x", 200, b"x" * 10)  # 0 + 5 - 40 < 0: recounted from the table
+    assert _total(cache) == _actual(cache) == 15
+
+
+def test_clear_resets_the_total(tmp_path):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), max_bytes=1000)
+    cache.store("a", "x", 200, b"x" * 40)
+    cache.clear()
+    assert cache.size() == (0, 0) and _total(cache) == 0
+
+
+def test_normalize_key_sorts_the_query():
+    assert normalize_key("HTTPS://Example.org/a?b=2&a=1") == normalize_key("https://example.org/a", {"a": "1", "b": "2"})
+
+
+class FakeUpstream:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, params=None, headers=None):
+        self.calls.append(dict(headers or {}))
+        if headers and headers.get("If-None-Match") == '"v1"':
+            return FakeResponse(304, b"")
+        return FakeResponse(200, b'{"value": 1}', {"ETag": '"v1"'})
+
+
+class FakeResponse:
+    def __init__(self, status_code, content, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.text = content.decode()
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    fake = FakeUpstream()
+    monkeypatch.setattr(st_cache.st_http, "get", fake.get)
+    st_cache.set_cache(ResponseCache(str(tmp_path / "c.sqlite"), ttls={"fast": 60, "stale": 0}))
+    try:
+        yield fake
+    finally:
+        st_cache.set_cache(None)
+
+
+def test_fresh_entries_are_served_locally(upstream):
+    assert cached_get("https://example.org/x", "fast").json() == {"value": 1}
+    response = cached_get("https://example.org/x", "fast")
+    assert response.from_cache and response.json() == {"value": 1}
+    assert len(upstream.calls) == 1
+    assert st_cache.cache_stats() == {"fast.miss": 1, "fast.hit": 1}
+
+
+def test_stale_entries_are_revalidated_with_the_etag(upstream):
+    cached_get("https://example.org/x", "stale")
+    before = st_cache.get_cache().lookup(normalize_key("https://example.org/x"))[4]
+    time.sleep(0.01)
+    response = cached_get("https://example.org/x", "stale")
+    assert upstream.calls[1] == {"If-None-Match": '"v1"'}
+    assert response.from_cache and response.json() == {"value": 1}
+    assert st_cache.get_cache().lookup(normalize_key("https://example.org/x"))[4] > before
+    assert st_cache.cache_stats()["stale.revalidated"] == 1
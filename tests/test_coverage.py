@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+import st_coverage
+from st_coverage import PdbCoverageIndex, parse_chain_ranges, parse_resolution
+from st_uniprot import PdbCrossRef, UniProtRecord
+
+
+def _baseline_covered(pdb_xrefs, pos_wt):
+    # Position test of the original check_pdb_coverage: first structure with a chain range covering the position
+    for pdb in pdb_xrefs:
+        for chain in pdb.chains.split(','):
+            chain_parts = chain.split('=')
+            if len(chain_parts) == 2 and '-' in chain_parts[1]:
+                start, end = map(int, chain_parts[1].split('-'))
+                if start <= pos_wt <= end:
+                    return True, f"PDB ID: {pdb.pdb_id}"
+    return False, None
+
+
+def _random_xrefs(rng, count):
+    xrefs = []
+    for idx in range(count):
+        groups = []
+        for _ in range(rng.integers(1, 4)):
+            chains = "/".join(rng.choice(list("ABCDEF"), rng.integers(1, 3), replace=False))
+            start = int(rng.integers(1, 400))
+            groups.append(f"{chains}={start}-{start + int(rng.integers(0, 200))}")
+        resolution = "" if rng.random() < 0.2 else f"{rng.uniform(1, 4):.2f} A"
+        xrefs.append(PdbCrossRef(f"{idx}X{idx:02d}", "X-ray" if resolution else "NMR", resolution, ",".join(groups)))
+    return xrefs
+
+
+def _naive_covering(xrefs, position):
+    # Every (structure, chain) covering the position, best resolution first, file order among ties
+    hits = []
+    for order, pdb in enumerate(xrefs):
+        resolution = parse_resolution(pdb.resolution)
+        for chain, start, end in parse_chain_ranges(pdb.chains)[0]:
+            if start <= position <= end:
+                hits.append((np.inf if np.isnan(resolution) else resolution, order, pdb, chain))
+    return [(pdb, chain) for _, _, pdb, chain in sorted(hits, key=lambda hit: hit[:2])]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_coverage_matches_the_per_structure_loop(seed):
+    rng = np.random.default_rng(seed)
+    xrefs = _random_xrefs(rng, int(rng.integers(1, 15)))
+    index = PdbCoverageIndex(xrefs)
+    positions = np.arange(0, 650)
+
+    mask = index.coverage_mask(positions)
+    assert mask.tolist() == [_baseline_covered(xrefs, int(position))[0] for position in positions]
+
+    counts = index.coverage_counts(positions)
+    naive = [sum(start <= position <= end for pdb in xrefs for _, start, end in parse_chain_ranges(pdb.chains)[0])
+             for position in positions]
+    assert counts.tolist() == naive
+
+    covering = index.covering(positions)
+    assert covering == [_naive_covering(xrefs, int(position)) for position in positions]
+    assert index.best_template(int(positions[mask][0])) == covering[int(np.flatnonzero(mask)[0])][0]
+
+
+def test_parse_chain_ranges_edge_cases():
+    segments, malformed = parse_chain_ranges(" A/B = 160-453, C=20-1,,D=5, E=-3-4")
+    assert segments == [("A", 160, 453), ("B", 160, 453), ("C", 1, 20), ("E", -3, 4)]
+    assert malformed == ["D=5"]
+
+
+def test_index_without_segments():
+    index = PdbCoverageIndex([PdbCrossRef("1ABC", "NMR", "-", "A=?")])
+    assert len(index) == 0 and index.malformed == [("1ABC", "A=?")]
+    assert index.coverage_counts([1, 2]).tolist() == [0, 0]
+    assert index.covering([1]) == [[]] and index.best_template(1) is None
+
+
+def test_segment_endpoints_are_inclusive():
+    index = PdbCoverageIndex([PdbCrossRef("1ABC", "X-ray", "2.0 A", "A=10-20"),
+                              PdbCrossRef("2ABC", "X-ray", "1.5 A", "B=20-20")])
+    assert index.coverage_counts([9, 10, 20, 21]).tolist() == [0, 1, 2, 0]
+    assert [pdb.pdb_id for pdb, _ in index.covering([20])[0]] == ["2ABC", "1ABC"]
+
+
+def test_index_lives_on_the_record(monkeypatch):
+    record = UniProtRecord("P00001", 100, (), (PdbCrossRef("1ABC", "X-ray", "2.0 A", "A=1-50"),))
+    monkeypatch.setattr(st_coverage, "get_uniprot_record", lambda uniprot_id: record if uniprot_id == "P00001" else None)
+    assert st_coverage.get_coverage_index("P00001") is st_coverage.get_coverage_index("P00001")
+    assert st_coverage.get_coverage_index("P99999") is None
@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from st_fetch import SourceTimeout, fetch_gene_evidence, iter_evidence
+
+
+def _sleeper(seconds, value):
+    def fetch(arg):
+        time.sleep(seconds)
+        return value
+    return fetch
+
+
+def _collect(futures, timeouts):
+    return {name: (value, error) for name, value, error in iter_evidence(futures, timeouts)}
+
+
+def test_queued_sources_are_not_charged_for_the_wait():
+    # One worker: the sources run one after the other, each well within its own timeout
+    sources = {"uniprot_id": _sleeper(0.15, None), "publications": _sleeper(0.15, 5), "pathways": _sleeper(0.15, 2)}
+    timeouts = dict.fromkeys(sources, 0.3)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results = _collect(fetch_gene_evidence("GENE", executor, sources, {}), timeouts)
+    assert results == {"uniprot_id": (None, None), "publications": (5, None), "pathways": (2, None)}
+
+
+def test_dependent_timeout_counts_from_its_own_start():
+    sources = {"uniprot_id": _sleeper(0, "P00001")}
+    dependents = {"structures": _sleeper(1.0, "late")}
+    timeouts = {"uniprot_id": 5, "structures": 0.2}
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = _collect(fetch_gene_evidence("GENE", executor, sources, dependents), timeouts)
+        elapsed = time.monotonic() - start
+    assert isinstance(results["structures"][1], SourceTimeout)
+    assert elapsed < 0.6  # not uniprot_id's 5 s on top
+
+
+def test_dependents_given_up_with_the_accession():
+    sources = {"uniprot_id": _sleeper(1.0, "P00001")}
+    dependents = {"length": _sleeper(0, 100)}
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = _collect(fetch_gene_evidence("GENE", executor, sources, dependents), {"uniprot_id": 0.1, "length": 5})
+        elapsed = time.monotonic() - start
+    assert isinstance(results["uniprot_id"][1], SourceTimeout)
+    assert isinstance(results["length"][1], SourceTimeout)
+    assert elapsed < 0.5
+
+
+def test_plain_dict_counts_from_the_first_call():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        futures = {"publications": executor.submit(time.sleep, 1.0)}
+        results = _collect(futures, {"publications": 0.1})
+    assert isinstance(results["publications"][1], SourceTimeout)
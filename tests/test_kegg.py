@@ -0,0 +1,121 @@
+import time
+import st_kegg
+from st_kegg import KeggIndex, parse_conv, parse_gene_symbols, parse_links, parse_pathway_names
+
+LINK = "hsa:7157\tpath:hsa04115\nhsa:7157\tpath:hsa05200\nhsa:4193\tpath:hsa04115\nhsa:999\tpath:hsa05200\n"
+GENES = ("hsa:7157\tCDS\t17:complement(7661779..7687538)\tTP53, BCC7, LFS1, P53; tumor protein p53\n"
+         "hsa:4193\tCDS\t12:68808177..68850686\tMDM2, HDMX, hdm2; MDM2 proto-oncogene\n"
+         "hsa:999\tCDH1, CD324, UVO; cadherin 1\n")
+PATHWAYS = ("path:hsa04115\tp53 signaling pathway - Homo sapiens (human)\n"
+            "path:hsa05200\tPathways in cancer - Homo sapiens (human)\n")
+CONV = "ncbi-geneid:7157\thsa:7157\nhsa:4193\tncbi-geneid:4193\n"
+
+
+def _fixture_files(tmp_path):
+    paths = {}
+    for name, text in (("link", LINK), ("genes", GENES), ("pathways", PATHWAYS), ("conv", CONV)):
+        paths[name] = tmp_path / f"{name}.txt"
+        paths[name].write_text(text)
+    return paths
+
+
+def test_index_from_fixture_files(tmp_path):
+    paths = _fixture_files(tmp_path)
+    index = KeggIndex.build(parse_links(str(paths["link"])), parse_gene_symbols(str(paths["genes"])),
+                            parse_pathway_names(str(paths["pathways"])), parse_conv(str(paths["conv"])))
+
+    assert index.pathways("TP53") == ["hsa04115", "hsa05200"]
+    assert index.pathways(" p53 ") == ["hsa04115", "hsa05200"]  # alias, case-insensitive
+    assert index.pathways("hdm2") == ["hsa04115"]
+    assert index.pathways("UVO") == ["hsa05200"]  # older two-column list/hsa layout
+    assert index.pathways("4193") == ["hsa04115"]  # NCBI Gene ID
+    assert index.pathways("NOTAGENE") == []
+    assert index.pathway_names_for("MDM2") == ["p53 signaling pathway"]
+
+
+def test_primary_symbol_wins_over_alias(tmp_path):
+    links = parse_links(LINK + "hsa:5000\tpath:hsa01100\n")
+    symbols = parse_gene_symbols(GENES + "hsa:5000\tCDS\t1:1..2\tP53TARGET, TP53; unrelated gene\n")
+    index = KeggIndex.build(links, symbols)
+    assert index.pathways("TP53") == ["hsa04115", "hsa05200"]
+
+
+def test_cli_index_round_trip(tmp_path):
+    paths = _fixture_files(tmp_path)
+    out = tmp_path / "kegg_index.json.gz"
+    st_kegg.main(["--link", str(paths["link"]), "--genes", str(paths["genes"]), "--pathways", str(paths["pathways"]),
+                  "--conv", str(paths["conv"]), "--out", str(out)])
+    index = KeggIndex.load(str(out))
+    assert index.pathways("LFS1") == ["hsa04115", "hsa05200"]
+    assert index.pathways("BRCA1") == []
+
+
+def test_downloaded_index_is_saved(tmp_path, monkeypatch):
+    files = {"link": LINK, "genes": GENES, "pathways": PATHWAYS, "conv": CONV}
+    monkeypatch.setattr(st_kegg, "download_kegg_file", files.__getitem__)
+    monkeypatch.setattr(st_kegg, "KEGG_INDEX_PATH", str(tmp_path / "kegg_index.json.gz"))
+    monkeypatch.setattr(st_kegg, "_index", None)
+    st_kegg.prebuild_kegg_index()
+    assert st_kegg.get_kegg_index().pathways("P53") == ["hsa04115", "hsa05200"]
+    assert KeggIndex.load(st_kegg.KEGG_INDEX_PATH).pathways("MDM2") == ["hsa04115"]
+
+
+def _serve_files(monkeypatch, tmp_path, download):
+    monkeypatch.setattr(st_kegg, "download_kegg_file", download)
+    monkeypatch.setattr(st_kegg, "KEGG_INDEX_PATH", str(tmp_path / "cache" / "kegg_index.json.gz"))
+    monkeypatch.setattr(st_kegg, "_index", None)
+    monkeypatch.setattr(st_kegg, "_expires_at", 0.0)
+
+
+def test_expired_index_is_rebuilt_in_the_background(tmp_path, monkeypatch):
+    import os
+    import threading
+    files = {"link": LINK, "genes": GENES, "pathways": PATHWAYS, "conv": CONV}
+    _serve_files(monkeypatch, tmp_path, files.__getitem__)
+    st_kegg.get_kegg_index()
+    old = time.time() - st_kegg.KEGG_INDEX_TTL - 60
+    os.utime(st_kegg.KEGG_INDEX_PATH, (old, old))
+    monkeypatch.setattr(st_kegg, "_index", None)
+
+    # A stale file is rebuilt when first loaded
+    files["link"] = LINK + "hsa:4193\tpath:hsa05200\n"
+    assert st_kegg.get_kegg_index().pathways("MDM2") == ["hsa04115", "hsa05200"]
+    assert os.path.getmtime(st_kegg.KEGG_INDEX_PATH) > old
+
+    # Once loaded, an expired index keeps answering while the rebuild downloads
+    release = threading.Event()
+
+    def slow_download(name):
+        release.wait(5)
+        return files[name]
+
+    monkeypatch.setattr(st_kegg, "download_kegg_file", slow_download)
+    os.utime(st_kegg.KEGG_INDEX_PATH, (old, old))
+    monkeypatch.setattr(st_kegg, "_expires_at", 0.0)
+    files["link"] = LINK
+    start = time.monotonic()
+    assert st_kegg.get_kegg_index().pathways("MDM2") == ["hsa04115", "hsa05200"]
+    assert time.monotonic() - start < 1
+    release.set()
+    for _ in range(100):
+        if st_kegg.get_kegg_index().pathways("MDM2") == ["hsa04115"]:
+            break
+        time.sleep(0.05)
+    assert st_kegg.get_kegg_index().pathways("MDM2") == ["hsa04115"]
+
+
+def test_failed_rebuild_keeps_the_expired_index(tmp_path, monkeypatch):
+    import os
+    files = {"link": LINK, "genes": GENES, "pathways": PATHWAYS, "conv": CONV}
+    _serve_files(monkeypatch, tmp_path, files.__getitem__)
+    st_kegg.get_kegg_index()
+    old = time.time() - st_kegg.KEGG_INDEX_TTL - 60
+    os.utime(st_kegg.KEGG_INDEX_PATH, (old, old))
+    monkeypatch.setattr(st_kegg, "_index", None)
+
+    def offline(name):
+        raise ConnectionError("KEGG unreachable")
+
+    monkeypatch.setattr(st_kegg, "download_kegg_file", offline)
+    assert st_kegg.get_kegg_index().pathways("TP53") == ["hsa04115", "hsa05200"]
+    assert st_kegg._expires_at > time.time()  # retried after KEGG_RETRY_AFTER, not on every lookup
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+import st_bench
+from st_neighbourhood import CONTACT_CUTOFF, NEIGHBOUR_CUTOFF, PACKING_RADIUS, compute_neighbourhood
+from st_structure import ATOM_DTYPE, StructureModel, parse_pdb
+
+pytest.importorskip("scipy")
+
+
+def _hetero_atoms(rows):
+    # (name, resname, chain, resnum, element, xyz) -> HETATM records
+    atoms = np.zeros(len(rows), dtype=ATOM_DTYPE)
+    for atom, (name, resname, chain, resnum, element, xyz) in zip(atoms, rows):
+        atom["name"], atom["resname"], atom["chain"], atom["resnum"] = name, resname, chain, resnum
+        atom["element"], atom["hetero"], atom["xyz"] = element, True, xyz
+    return atoms
+
+
+@pytest.fixture(scope="module")
+def model():
+    # Two helices close enough to touch, a modified residue, a ligand and a water with its hydrogen
+    atoms = parse_pdb(st_bench.synthetic_pdb(16, n_chains=2))
+    atoms["xyz"][atoms["chain"] == b"B"] -= np.array([17.0, 0.0, 0.0], dtype=np.float32)
+    modified = (atoms["chain"] == b"A") & (atoms["resnum"] == 6)
+    atoms["resname"][modified] = b"MSE"
+    atoms["hetero"][modified] = True
+    extra = _hetero_atoms([
+        ("FE  ", b"HEM", b"A", 101, b"FE", (4.1, 1.3, 9.2)),
+        (" C1 ", b"HEM", b"A", 101, b"C", (5.0, 2.1, 10.4)),
+        (" O  ", b"HOH", b"A", 201, b"O", (2.5, 0.5, 3.0)),
+        (" H1 ", b"HOH", b"A", 201, b"H", (2.9, 0.5, 3.0)),
+    ])
+    return StructureModel(np.concatenate([atoms, extra]))
+
+
+def _brute_force(model):
+    atoms = model.atoms
+    residue = model.atom_residue
+    heavy = ~np.isin(atoms["element"], (b"H", b"D")) & ~np.isin(atoms["resname"], (b"HOH",))
+    names = atoms["name"]
+    protein = np.zeros(len(model), dtype=bool)
+    protein_chains = set(model.res_chain[~model.res_hetero].tolist())
+    for row in range(len(model)):
+        own = set(names[residue == row].tolist())
+        backbone = {b" N  ", b" CA ", b" C  "} <= own
+        protein[row] = not model.res_hetero[row] or (backbone and model.res_chain[row] in protein_chains)
+
+    xyz = atoms["xyz"].astype(np.float64)
+    distance = np.linalg.norm(xyz[:, None, :] - xyz[None, :, :], axis=-1)
+    contacts, packing = [], []
+    chain_distance, ligand_distance = [], []
+    for row in range(len(model)):
+        own = heavy & (residue == row)
+        if not protein[row]:
+            contacts.append(-1), packing.append(-1), chain_distance.append(np.nan), ligand_distance.append(np.nan)
+            continue
+        partners = set()
+        for other in range(len(model)):
+            bonded = (abs(other - row) == 1 and protein[other] and model.res_chain[other] == model.res_chain[row]
+                      and abs(int(model.res_num[other]) - int(model.res_num[row])) <= 1)
+            if other != row and not bonded and (distance[np.ix_(own, heavy & (residue == other))] <= CONTACT_CUTOFF).any():
+                partners.add(other)
+        contacts.append(len(partners))
+
+        centre = xyz[own].mean(axis=0)
+        for atom_name in (b" CA ", b" CB "):
+            chosen = own & (names == atom_name)
+            if chosen.any():
+                centre = xyz[chosen][0]
+        packing.append(int((np.linalg.norm(xyz[heavy] - centre, axis=1) <= PACKING_RADIUS).sum()))
+
+        protein_atom = protein[residue]
+        for targets, out in ((heavy & protein_atom & (model.res_chain[residue] != model.res_chain[row]), chain_distance),
+                             (heavy & ~protein_atom, ligand_distance)):
+            nearest = distance[np.ix_(own, targets)].min() if targets.any() else np.inf
+            out.append(nearest if nearest < NEIGHBOUR_CUTOFF else np.nan)
+    return contacts, packing, chain_distance, ligand_distance
+
+
+def test_neighbourhood_matches_pairwise_loops(model):
+    features = compute_neighbourhood(model)
+    contacts, packing, chain_distance, ligand_distance = _brute_force(model)
+    assert features.contacts.tolist() == contacts
+    assert features.packing.tolist() == packing
+    np.testing.assert_allclose(features.chain_distance, chain_distance, rtol=1e-6, equal_nan=True)
+    np.testing.assert_allclose(features.ligand_distance, ligand_distance, rtol=1e-6, equal_nan=True)
+    # The geometry exercises every feature
+    assert not np.isnan(features.chain_distance).all() and not np.isnan(features.ligand_distance).all()
+    assert max(contacts) > 0
+
+
+def test_modified_residue_counts_as_protein(model):
+    features = compute_neighbourhood(model)
+    names = model.res_name.tolist()
+    assert features.contacts[names.index("MSE")] >= 0
+    assert features.contacts[names.index("HEM")] == -1 and np.isnan(features.ligand_distance[names.index("HEM")])
+
+
+def test_at_fills_missing_rows(model):
+    features = compute_neighbourhood(model)
+    values = features.at([0, -1])
+    assert values["contacts"][1] == -1 and np.isnan(values["chain_distance"][1])
+    assert values["packing"][0] == features.packing[0]
+    empty = compute_neighbourhood(StructureModel(np.zeros(0, dtype=ATOM_DTYPE)))
+    assert empty.at([-1])["contacts"].tolist() == [-1]
@@ -0,0 +1,87 @@
+import random
+import st_pubmed
+from st_pubmed import DAY, PublicationStore, plan_window, split_years
+
+NOW = 1_000_000_000.0
+
+
+def _stored(ranges, fetched_at=NOW):
+    return [(first, last, last - first + 1, fetched_at) for first, last in ranges]
+
+
+def test_split_years_uses_aligned_blocks_for_closed_years():
+    assert split_years(2000, 2026, 2026) == [(2000, 2004), (2005, 2009), (2010, 2014), (2015, 2019),
+                                             (2020, 2024), (2025, 2025), (2026, 2026)]
+    # Unaligned edges are single years; a block never runs into the refreshed years
+    assert split_years(2012, 2021, 2023) == [(2012, 2012), (2013, 2013), (2014, 2014), (2015, 2019),
+                                             (2020, 2020), (2021, 2021)]
+    assert split_years(2024, 2024, 2024) == [(2024, 2024)]
+
+
+def test_later_window_reuses_stored_blocks():
+    buckets = _stored([(2000, 2004), (2005, 2009), (2010, 2014), (2015, 2019), (2020, 2024), (2025, 2025)])
+    used, missing = plan_window(buckets, 2010, 2020, 2026, now=NOW)
+    assert [bucket[:2] for bucket in used] == [(2010, 2014), (2015, 2019)]
+    assert missing == [(2020, 2020)]
+
+    used, missing = plan_window(buckets, 2012, 2019, 2026, now=NOW)
+    assert [bucket[:2] for bucket in used] == [(2015, 2019)]
+    assert missing == [(2012, 2012), (2013, 2013), (2014, 2014)]
+
+
+def test_single_years_fill_a_window_inside_a_block():
+    buckets = _stored([(2010, 2014), (2012, 2012), (2013, 2013), (2014, 2014)])
+    used, missing = plan_window(buckets, 2012, 2014, 2026, now=NOW)
+    assert [bucket[:2] for bucket in used] == [(2012, 2012), (2013, 2013), (2014, 2014)] and missing == []
+
+
+def test_stale_recent_years_are_searched_again():
+    buckets = _stored([(2020, 2024)]) + _stored([(2025, 2025)], NOW - 31 * DAY) + _stored([(2026, 2026)], NOW - 2 * DAY)
+    used, missing = plan_window(buckets, 2020, 2026, 2026, now=NOW)
+    assert [bucket[:2] for bucket in used] == [(2020, 2024)]
+    assert missing == [(2025, 2025), (2026, 2026)]
+    # Closed years never expire
+    used, missing = plan_window(_stored([(2000, 2004)], 0.0), 2000, 2004, 2026, now=NOW)
+    assert len(used) == 1 and missing == []
+
+
+def test_plan_covers_every_year_exactly_once():
+    rng = random.Random(4)
+    for _ in range(200):
+        stored = []
+        for _ in range(rng.randint(0, 12)):
+            first = rng.randint(1995, 2026)
+            stored.append((first, min(2026, first + rng.choice((0, 0, 4, 9)))))
+        buckets = [(first, last, 1, NOW - rng.choice((0, 40)) * DAY) for first, last in stored]
+        start = rng.randint(1995, 2026)
+        end = rng.randint(start, 2026)
+        used, missing = plan_window(buckets, start, end, 2026, now=NOW)
+        years = sorted(year for first, last in [bucket[:2] for bucket in used] + missing for year in range(first, last + 1))
+        assert years == list(range(start, end + 1))
+        # Stale recent years are searched, never summed
+        assert all(not (last >= 2025 and fetched_at < NOW - 30 * DAY) for _, last, _, fetched_at in used)
+
+
+def test_empty_store_plans_aligned_searches():
+    assert plan_window([], 2003, 2003, 2026, now=NOW) == ([], [(2003, 2003)])
+    assert plan_window([], 2005, 2014, 2026, now=NOW) == ([], [(2005, 2009), (2010, 2014)])
+
+
+def test_counts_sum_stored_and_searched_buckets(monkeypatch):
+    searches = []
+
+    def esearch_count(term):
+        searches.append(term)
+        return 10
+
+    monkeypatch.setattr(st_pubmed, "esearch_count", esearch_count)
+    st_pubmed.set_store(PublicationStore(":memory:"))
+    try:
+        this_year = st_pubmed.datetime.date.today().year
+        first = this_year - this_year % 5 - 10
+        assert st_pubmed.get_publication_count("TP53", first) == 10 * len(split_years(first, this_year, this_year))
+        cold = len(searches)
+        assert st_pubmed.get_publication_count("tp53", first, this_year - 2) == 20
+        assert len(searches) == cold
+    finally:
+        st_pubmed.set_store(None)
@@ -0,0 +1,162 @@
+import shutil
+import numpy as np
+import pytest
+import st_bench
+import st_sasa
+from st_sasa import AREA_COLUMNS, ResidueSasa, sasa_cache_key, sasa_in_process
+
+# FreeSASA RSA output: 'RES' line layout of the C library's printf
+RSA_HEADER = """REM  FreeSASA 2.0.3
+REM  Absolute and relative SASAs for input.pdb
+REM  Atomic radius and reference values for relative SASA: naccess
+REM RES _NUM      All-atoms   Total-Side   Main-Chain    Non-polar    All polar
+REM                ABS   REL    ABS   REL    ABS   REL    ABS   REL    ABS   REL
+"""
+RSA_FOOTER = """END  Absolute sums over single chains surface
+CHAIN  1 A     1234.5      987.6      246.9      700.0      534.5
+"""
+
+
+def _rsa_line(resname, chain, resnum, icode, values):
+    text = "".join("%9s" % "N/A" if np.isnan(value) else "%9.2f" % value for value in values)
+    return "RES %3s %s%4d%s%s" % (resname, chain, resnum, icode or " ", text)
+
+
+def _rsa_text(residues):
+    return RSA_HEADER + "".join(_rsa_line(*residue) + "\n" for residue in residues) + RSA_FOOTER
+
+
+def _random_residues(rng, count, chains="AB"):
+    names = ["ALA", "GLY", "TRP", "LYS", "SER", "MSE"]
+    residues = []
+    for chain in chains:
+        for resnum in range(1, count + 1):
+            values = rng.uniform(0, 250, len(AREA_COLUMNS))
+            if rng.random() < 0.1:
+                values[1::2] = np.nan  # no reference area, e.g. a modified residue
+            residues.append((names[resnum % len(names)], chain, resnum, "", values))
+    return residues
+
+
+def _baseline_rsa(freesasa_output, residue_number):
+    # get_rsa_for_residue of the original st_missense2, without the printing
+    for line in freesasa_output.splitlines():
+        if line.startswith("REM") or not line.strip() or not line.startswith('RES'):
+            continue
+        columns = line.split()
+        if len(columns) >= 11 and columns[0] == 'RES':
+            try:
+                res_number = int(columns[3])
+            except ValueError:
+                continue
+            if res_number == residue_number:
+                try:
+                    return float(columns[5])
+                except ValueError:
+                    return None
+    return None
+
+
+def _baseline_rows(freesasa_output):
+    # parse_freesasa_output of the original st_missense2, keeping every numeric column
+    # (it labelled the residue name column "Chain" and the chain column "Res")
+    rows = []
+    for line in freesasa_output.splitlines():
+        if line.startswith("RES"):
+            columns = line.split()
+            if len(columns) >= 11:
+                rows.append((columns[1], columns[2], int(columns[3]), [float(value) for value in columns[4:14]]))
+    return rows
+
+
+def test_rsa_parser_matches_the_line_loop():
+    rng = np.random.default_rng(1)
+    residues = _random_residues(rng, 150)
+    text = _rsa_text(residues)
+    sasa = ResidueSasa.from_rsa_text(text)
+    assert len(sasa) == len(residues)
+
+    numbers = list(range(0, 153))
+    expected = [_baseline_rsa(text, number) for number in numbers]
+    rsa = sasa.rsa_at(sasa.rows(numbers))
+    assert [None if np.isnan(value) else round(value, 2) for value in rsa] == expected
+
+    known = [residue for residue in residues if not np.isnan(residue[4]).any()]
+    baseline = _baseline_rows(_rsa_text(known))
+    parsed = ResidueSasa.from_rsa_text(_rsa_text(known))
+    assert parsed.resname.tolist() == [row[0] for row in baseline]
+    assert parsed.chain.tolist() == [row[1] for row in baseline]
+    assert parsed.resnum.tolist() == [row[2] for row in baseline]
+    np.testing.assert_allclose(parsed.areas, [row[3] for row in baseline])
+
+
+def test_rsa_parser_fixed_width_fields():
+    values = np.arange(len(AREA_COLUMNS), dtype=float)
+    text = _rsa_text([("ALA", "A", 52, "A", values), ("GLY", "B", 1234, "", values + 1),
+                      ("LYS", "A", -3, "", values + 2)])
+    sasa = ResidueSasa.from_rsa_text(text)
+    # Insertion codes and four-digit numbers, which a whitespace split runs together
+    assert sasa.resnum.tolist() == [52, 1234, -3]
+    assert sasa.icode.tolist() == ["A", "", ""]
+    assert sasa.chain.tolist() == ["A", "B", "A"]
+    assert sasa.rows([52, 52, 1234, 7], chains=["A", "A", "", ""], icodes=["A", "", "", ""]).tolist() == [0, -1, 1, -1]
+    assert sasa.rsa.tolist() == [1.0, 2.0, 3.0]
+
+
+def test_rsa_parser_skips_malformed_lines():
+    values = np.ones(len(AREA_COLUMNS))
+    good = _rsa_line("ALA", "A", 1, "", values)
+    text = "\n".join([good, good[:40], _rsa_line("SER", "A", 2, "", values) + "     9.99", _rsa_line("TRP", "A", 3, "", values)])
+    sasa = ResidueSasa.from_rsa_text(text)
+    assert sasa.resnum.tolist() == [1, 3]
+    assert len(ResidueSasa.from_rsa_text(RSA_HEADER + RSA_FOOTER)) == 0
+
+
+def test_rows_without_a_chain_take_the_first_in_file_order():
+    values = np.ones(len(AREA_COLUMNS))
+    sasa = ResidueSasa.from_rsa_text(_rsa_text([("ALA", "B", 5, "", values), ("GLY", "A", 5, "", values * 2)]))
+    assert sasa.rows([5], chains=[None]).tolist() == [0]
+    assert sasa.rows([5], chains=["A"]).tolist() == [1]
+    assert np.isnan(ResidueSasa.from_rsa_text("").rsa_at([-1])).all()
+
+
+def test_stored_form_round_trips():
+    sasa = ResidueSasa.from_rsa_text(_rsa_text(_random_residues(np.random.default_rng(2), 20)))
+    loaded = ResidueSasa.from_bytes(sasa.to_bytes())
+    for column in ("resname", "chain", "resnum", "icode"):
+        assert getattr(loaded, column).tolist() == getattr(sasa, column).tolist()
+    # Stored as float32
+    np.testing.assert_allclose(loaded.areas, sasa.areas, rtol=1e-6, equal_nan=True)
+
+
+@pytest.fixture
+def classifier(tmp_path, monkeypatch):
+    # A private copy of naccess.config that the test may edit
+    pytest.importorskip("freesasa")
+    path = str(tmp_path / "radii.config")
+    shutil.copy(st_sasa.NACCESS_CONFIG, path)
+    monkeypatch.setattr(st_sasa, "CLASSIFIER_CONFIG", path)
+    return path
+
+
+def test_cache_key_follows_classifier_contents(classifier):
+    pdb = st_bench.synthetic_pdb(10)
+    before = sasa_cache_key(pdb)
+    with open(classifier, "a") as file:
+        file.write("\n")
+    assert sasa_cache_key(pdb) != before
+
+
+def test_naccess_references_only_with_naccess_radii(classifier):
+    pdb = st_bench.synthetic_pdb(10)
+    # Same contents as naccess.config: relative areas from the NACCESS reference table
+    naccess = sasa_in_process(pdb)
+    assert not np.isnan(naccess.rsa).any()
+
+    with open(classifier) as file:
+        text = file.read()
+    with open(classifier, "w") as file:
+        file.write(text.replace("C_ALI  1.87", "C_ALI  1.950"))
+    other = sasa_in_process(pdb)
+    assert np.isnan(other.rsa).all()
+    assert not np.allclose(other.total, naccess.total)
@@ -0,0 +1,37 @@
+import time
+import threading
+import st_scoretable
+from st_scoretable import ScoreTable, refresh_table
+
+
+def test_refresh_keeps_at_most_gene_workers_in_flight(tmp_path, monkeypatch):
+    table = ScoreTable(str(tmp_path / "scores.sqlite"))
+    lock = threading.Lock()
+    state = {"in_flight": 0, "peak": 0, "saved_before_done": 0}
+
+    def refresh_gene(gene, stored, executor):
+        with lock:
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+        time.sleep(0.005)
+        with lock:
+            state["in_flight"] -= 1
+        return {"publications": 5, "uniprot_id": None}, {}
+
+    def progress(gene, values, errors):
+        # Saved as soon as the gene completes, not after the whole refresh
+        if table.lookup(gene) is not None:
+            state["saved_before_done"] += 1
+
+    monkeypatch.setattr(st_scoretable, "refresh_gene", refresh_gene)
+    genes = (f"GENE{idx}" for idx in range(60))
+    assert refresh_table(table, genes, gene_workers=3, progress=progress) == (60, 60)
+    assert state["peak"] == 3
+    assert state["saved_before_done"] == 60
+    assert table.lookup("GENE7")["pub_count"] == 5
+
+
+def test_new_gene_with_only_failures_is_not_added(tmp_path):
+    table = ScoreTable(str(tmp_path / "scores.sqlite"))
+    assert table.save("GENE1", {}, {"publications": TimeoutError()}) is False
+    assert table.lookup("GENE1") is None
@@ -0,0 +1,136 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import st_scoring
+from st_scoring import (DEFAULT_CUTS, SCORE_RULES, check_cuts, drardt_score, load_cuts, raw_arrays,
+                        scaled_configs, score_arrays, sub_score, sweep)
+
+
+# The original st_params rules
+def _baseline_pub(pub_count):
+    return 1 if pub_count <= 50 else 2 if pub_count <= 100 else 3 if pub_count <= 200 else 4
+
+
+def _baseline_interactors(interactors_count):
+    return 1 if interactors_count < 2 else 2 if interactors_count < 4 else 3 if interactors_count <= 6 else 4
+
+
+def _baseline_kegg(pathways_count):
+    return 1 if pathways_count < 1 else 2 if pathways_count < 2 else 3
+
+
+def _baseline_pdb(pdb_count):
+    return 1 if pdb_count < 1 else 2 if pdb_count <= 3 else 3 if pdb_count <= 4 else 4
+
+
+def _baseline_drardt(sum_scores):
+    return 0 if sum_scores < 8 else 1 if sum_scores < 11 else 2 if sum_scores < 14 else 3
+
+
+def test_default_cuts_reproduce_the_published_rules():
+    for count in range(0, 300):
+        assert sub_score("pub_count_score", count, DEFAULT_CUTS) == _baseline_pub(count)
+        assert sub_score("interactors_score", count, DEFAULT_CUTS) == _baseline_interactors(count)
+        assert sub_score("KEGG_score", count, DEFAULT_CUTS) == _baseline_kegg(count)
+        assert sub_score("PDB_score", count, DEFAULT_CUTS) == _baseline_pdb(count)
+    assert [sub_score("AF2_score", value, DEFAULT_CUTS) for value in (0, 1)] == [1, 2]
+    assert [drardt_score(total, DEFAULT_CUTS) for total in range(5, 18)] == [_baseline_drardt(total) for total in range(5, 18)]
+
+
+def _raw(rng, count):
+    raw = {"pub_count": rng.integers(0, 400, count), "interactors_count": rng.integers(0, 12, count),
+           "pathways_count": rng.integers(0, 5, count), "pdb_count": rng.integers(0, 9, count),
+           "alphafold": rng.integers(0, 2, count)}
+    raw = {column: values.astype(float) for column, values in raw.items()}
+    raw["pdb_count"][::17] = np.nan  # not retrieved
+    return raw
+
+
+def test_score_arrays_match_the_scalar_rules():
+    raw = _raw(np.random.default_rng(0), 200)
+    scores = score_arrays(raw, DEFAULT_CUTS)
+    for idx in range(200):
+        values = {column: raw[column][idx] for column in raw}
+        if np.isnan(values["pdb_count"]):
+            assert scores["PDB_score"][idx] == -1 and scores["DRARDT_score"][idx] == -1
+            continue
+        subs = {name: sub_score(name, values[column], DEFAULT_CUTS) for name, (column, _) in SCORE_RULES.items()}
+        assert {name: scores[name][idx] for name in SCORE_RULES} == subs
+        assert scores["DRARDT_score"][idx] == _baseline_drardt(sum(subs.values()))
+
+
+def test_sweep_matches_rescoring_each_configuration():
+    raw = _raw(np.random.default_rng(1), 300)
+    configs = scaled_configs((0.5, 1, 2), (-1, 0, 1), baseline=DEFAULT_CUTS)[::7]
+    configs.append({"AF2_score": (2,), "KEGG_score": (1, 2, 3)})  # a rule with more cut points than the baseline
+    summaries, changed_by_gene, complete = sweep(raw, configs, baseline=DEFAULT_CUTS, block=4)
+
+    complete_raw = {column: values[complete] for column, values in raw.items()}
+    base = score_arrays(complete_raw, DEFAULT_CUTS)
+    base_total = sum(base[name] for name in SCORE_RULES)
+    changed = np.zeros(int(complete.sum()), dtype=np.int64)
+    assert complete.tolist() == (~np.isnan(raw["pdb_count"])).tolist()
+    assert len(summaries) == len(configs)
+    for idx, (config, summary) in enumerate(zip(configs, summaries)):
+        scores = score_arrays(complete_raw, dict(DEFAULT_CUTS, **config))
+        total = sum(scores[name] for name in SCORE_RULES)
+        drardt = scores["DRARDT_score"]
+        assert summary["config"] == idx
+        assert summary["promoted"] == int((drardt > base["DRARDT_score"]).sum())
+        assert summary["demoted"] == int((drardt < base["DRARDT_score"]).sum())
+        assert summary["changed"] == summary["promoted"] + summary["demoted"]
+        assert [summary[f"DRARDT_{level}"] for level in range(4)] == [int((drardt == level).sum()) for level in range(4)]
+        spearman = pd.Series(total).rank().corr(pd.Series(base_total).rank())
+        if np.isnan(spearman):
+            assert np.isnan(summary["spearman"])
+        else:
+            assert summary["spearman"] == pytest.approx(round(spearman, 4), abs=1e-4)
+        changes = json.loads(summary["changes"])
+        assert all(tuple(DEFAULT_CUTS[name]) != tuple(cuts) for name, cuts in changes.items())
+        changed += drardt != base["DRARDT_score"]
+    assert changed_by_gene.tolist() == changed.tolist()
+
+
+def test_sweep_needs_a_complete_gene():
+    raw = _raw(np.random.default_rng(2), 3)
+    raw["alphafold"][:] = np.nan
+    with pytest.raises(ValueError):
+        sweep(raw, [{}], baseline=DEFAULT_CUTS)
+
+
+def test_raw_arrays_tell_missing_counts_apart():
+    rows = [{"gene": "A", "pub_count": 10, "interactors_count": "", "pathways_count": 1, "pdb_count": 0,
+             "alphafold": "", "AF2_score": 1},
+            {"gene": "B", "pub_count": "", "interactors_count": 3, "pathways_count": 2, "pdb_count": 5,
+             "alphafold": "https://alphafold.ebi.ac.uk/entry/Q1", "AF2_score": 2},
+            {"gene": "C", "pub_count": 1, "interactors_count": 1, "pathways_count": 0, "pdb_count": 1,
+             "alphafold": "", "AF2_score": ""}]
+    genes, raw = raw_arrays(rows)
+    assert genes.tolist() == ["A", "B", "C"]
+    assert raw["alphafold"][:2].tolist() == [0.0, 1.0] and np.isnan(raw["alphafold"][2])
+    assert np.isnan(raw["interactors_count"][0]) and np.isnan(raw["pub_count"][1])
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ([51, 101], "must be an object"),
+    ({"bogus_score": [1]}, "Unknown scores"),
+    ({"KEGG_score": []}, "list of numbers"),
+    ({"KEGG_score": [1, "2"]}, "list of numbers"),
+    ({"AF2_score": [True]}, "list of numbers"),
+    ({"KEGG_score": 2}, "list of numbers"),
+    ({"PDB_score": [5, 4, 1]}, "non-decreasing"),
+])
+def test_check_cuts_rejects(overrides, message):
+    with pytest.raises(ValueError, match=message):
+        check_cuts(overrides, "test.json")
+
+
+def test_check_cuts_and_load_cuts(tmp_path):
+    assert check_cuts({"KEGG_score": [1, 1, 2.5]}, "test.json") == {"KEGG_score": (1, 1, 2.5)}
+    path = tmp_path / "cuts.json"
+    path.write_text(json.dumps({"pub_count_score": [41, 81, 161]}))
+    cuts = load_cuts(str(path))
+    assert cuts["pub_count_score"] == (41, 81, 161) and cuts["KEGG_score"] == DEFAULT_CUTS["KEGG_score"]
+    assert load_cuts() == DEFAULT_CUTS
+    assert st_scoring.bin_score([40, 41, 161], cuts["pub_count_score"], 1).tolist() == [1, 2, 4]
@@ -0,0 +1,133 @@
+import os
+import asyncio
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+import st_http
+import st_bench
+import st_scoretable
+from st_service import ScoringService, make_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    # Every upstream replaced by the benchmark stand-in, with cold caches and no score table
+    monkeypatch.chdir(ROOT)  # simba.tsv
+    monkeypatch.setattr(st_scoretable, "SCORE_TABLE_PATH", str(tmp_path / "no_scores.sqlite"))
+    monkeypatch.setattr(st_scoretable, "_table", None)
+    st_bench.reset_state(str(tmp_path / "state"))
+    with st_bench.UpstreamStandIn(latency_ms=50) as server:
+        st_http.set_upstream_override(server.url)
+        try:
+            yield server
+        finally:
+            st_http.set_upstream_override(None)
+
+
+def run(scenario):
+    async def main():
+        async with TestClient(TestServer(make_app(ScoringService()))) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+def test_concurrent_scores_share_one_fetch(upstream):
+    async def scenario(client):
+        responses = await asyncio.gather(*(client.get("/score/GENE7") for _ in range(5)))
+        rows = [await response.json() for response in responses]
+        health = await (await client.get("/health")).json()
+        return [response.status for response in responses], rows, health
+
+    statuses, rows, health = run(scenario)
+    assert statuses == [200] * 5
+    assert all(row == rows[0] for row in rows)
+    assert rows[0]["uniprot_id"] == "Q00007" and rows[0]["errors"] == ""
+    assert health["coalesced_requests"] == 4
+
+
+def test_mutations(upstream):
+    structure = st_bench.synthetic_pdb(40).decode()
+
+    async def scenario(client):
+        response = await client.post("/mutations", json={"mutations": ["A1C", "L2W"], "structure": structure})
+        return response.status, await response.json()
+
+    status, body = run(scenario)
+    assert status == 200
+    first, second = body["mutations"]
+    assert first["wild_type"] == "A" and first["structure_problem"] is None and first["ddG"] is not None
+    assert second["position"] == 2 and second["rsa"] is not None
+
+
+@pytest.mark.parametrize("body, status", [
+    ("not json", 400),
+    ([{"mutations": ["A1C"]}], 400),
+    ({"mutations": ["A1C"]}, 400),
+    ({"mutations": ["A1C"], "structure": 42}, 400),
+    ({"mutations": ["A1C", 7], "structure": "ATOM"}, 400),
+    ({"mutations": ["A1"], "structure": "ATOM"}, 400),
+    ({"mutations": ["A1C"], "structure": "ATOM", "uniprot_id": ["P04637"]}, 400),
+    ({"mutations": ["A1C"], "structure": "no atoms here\n"}, 422),
+])
+def test_mutations_rejects_malformed_requests(upstream, body, status):
+    async def scenario(client):
+        if isinstance(body, str):
+            response = await client.post("/mutations", data=body)
+        else:
+            response = await client.post("/mutations", json=body)
+        return response.status, await response.json()
+
+    answer_status, answer = run(scenario)
+    assert answer_status == status
+    assert answer["error"]
+
+
+def test_unknown_accession_is_404(upstream, monkeypatch):
+    import st_service
+    monkeypatch.setattr(st_service, "get_uniprot_record", lambda uniprot_id: None)
+    structure = st_bench.synthetic_pdb(10).decode()
+
+    async def scenario(client):
+        response = await client.post("/mutations", json={"mutations": ["A1C"], "structure": structure,
+                                                         "uniprot_id": "Q99999"})
+        return response.status, await response.json()
+
+    status, body = run(scenario)
+    assert status == 404 and "Q99999" in body["error"]
+
+
+def test_upstream_failures_are_502(upstream, monkeypatch):
+    import requests
+    import st_service
+
+    def down(*args):
+        raise requests.ConnectionError("UniProt is down")
+
+    monkeypatch.setattr(st_service, "get_uniprot_record", down)
+    monkeypatch.setattr(st_service, "stored_score", down)
+    structure = st_bench.synthetic_pdb(10).decode()
+
+    async def scenario(client):
+        mutations = await client.post("/mutations", json={"mutations": ["A1C"], "structure": structure,
+                                                          "uniprot_id": "P04637"})
+        score = await client.get("/score/TP53")
+        return [(response.status, await response.json()) for response in (mutations, score)]
+
+    for status, body in run(scenario):
+        assert status == 502 and "UniProt is down" in body["error"]
+
+
+def test_unexpected_errors_are_json(upstream, monkeypatch):
+    import st_service
+
+    def broken(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(st_service, "stored_score", broken)
+
+    async def scenario(client):
+        response = await client.get("/score/TP53")
+        return response.status, await response.json()
+
+    assert run(scenario) == (500, {"error": "internal error: boom"})
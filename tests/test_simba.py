@@ -0,0 +1,90 @@
+import csv
+import itertools
+import numpy as np
+import pytest
+from st_simba import AMINO_ACIDS, SimbaModel, parse_mutations, parse_variant
+
+SIMBA_TSV = "simba.tsv"
+
+
+def _baseline_properties(tsv_file):
+    # load_aa_properties of the original st_missense2
+    volume_dict, polarity_dict = {}, {}
+    with open(tsv_file, 'r') as file:
+        for row in csv.DictReader(file, delimiter='\t'):
+            volume_dict[row['AA']] = float(row['V'])
+            polarity_dict[row['AA']] = float(row['H'])
+    return volume_dict, polarity_dict
+
+
+def _baseline_ddg(mutation, RSA, volume_dict, polarity_dict):
+    # calculate_ddG of the original st_missense2, one mutation at a time
+    aa_wt, aa_mut = mutation[0], mutation[-1]
+    Vdiff = volume_dict[aa_mut] - volume_dict[aa_wt]
+    Hdiff = polarity_dict[aa_mut] - polarity_dict[aa_wt]
+    return -1.64 + 1.9 * (RSA / 100) + 0.49 * (Vdiff / 100) - 0.12 * Hdiff
+
+
+@pytest.fixture(scope="module")
+def model(request):
+    return SimbaModel(str(request.config.rootpath / SIMBA_TSV))
+
+
+@pytest.fixture(scope="module")
+def properties(request):
+    return _baseline_properties(str(request.config.rootpath / SIMBA_TSV))
+
+
+def test_ddg_matches_the_per_mutation_loop(model, properties):
+    pairs = [(wt, mut) for wt, mut in itertools.product(AMINO_ACIDS, repeat=2) if wt != mut]
+    rsa = np.random.default_rng(0).uniform(0, 120, len(pairs))
+    expected = [_baseline_ddg(f"{wt}1{mut}", value, *properties) for (wt, mut), value in zip(pairs, rsa)]
+    ddg = model.ddg([wt for wt, _ in pairs], [mut for _, mut in pairs], rsa)
+    np.testing.assert_allclose(ddg, expected, rtol=0, atol=1e-12)
+
+
+def test_ddg_accepts_lowercase_and_flags_unknown_residues(model, properties):
+    ddg = model.ddg("aXA", "cAB", [10.0, 10.0, 10.0])
+    assert ddg[0] == pytest.approx(_baseline_ddg("A1C", 10.0, *properties))
+    assert np.isnan(ddg[1:]).all()
+
+
+def test_saturation_matches_the_loop(model, properties):
+    sequence = "MKTAYIAKQRXG"
+    rsa = np.linspace(0, 110, len(sequence))
+    matrix = model.saturation(sequence, rsa)
+    assert matrix.shape == (len(sequence), len(AMINO_ACIDS))
+    for row, (wt, value) in enumerate(zip(sequence, rsa)):
+        for column, mut in enumerate(AMINO_ACIDS):
+            if wt not in AMINO_ACIDS or wt == mut:
+                assert np.isnan(matrix[row, column])
+            else:
+                assert matrix[row, column] == pytest.approx(_baseline_ddg(wt + mut, value, *properties), abs=1e-12)
+
+
+def test_unfolding_threshold_is_inclusive(model):
+    assert model.unfolding([-1.6, -1.5, -1.4]).tolist() == [True, True, False]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("A123C", ("", "A", 123, "C")),
+    ("B:A123C", ("B", "A", 123, "C")),
+    ("p.Ala123Val", ("", "A", 123, "V")),
+    ("p.(A123V)", ("", "A", 123, "V")),
+    ("NP_000537.3:p.Arg175His", ("", "R", 175, "H")),
+    (" r175h ", ("", "R", 175, "H")),
+])
+def test_parse_variant(text, expected):
+    assert parse_variant(text) == expected
+
+
+@pytest.mark.parametrize("text", ["A123A", "A123*", "p.Ala123fs", "X12A", "123", "A12", ""])
+def test_parse_variant_rejects_non_missense(text):
+    with pytest.raises(ValueError):
+        parse_variant(text)
+
+
+def test_parse_mutations_columns():
+    chains, wt, positions, mut = parse_mutations(["A12C", "B:p.Gly7Ser"])
+    assert chains == ["", "B"] and wt == ["A", "G"] and mut == ["C", "S"]
+    assert positions.dtype == np.int64 and positions.tolist() == [12, 7]
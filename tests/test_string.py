@@ -0,0 +1,96 @@
+import pytest
+import st_cache
+import st_string
+from st_string import fetch_string_partners, filter_interactors
+
+HEADER = "stringId_A\tstringId_B\tpreferredName_A\tpreferredName_B\tncbiTaxonId\tscore\tnscore\tfscore\tpscore\tascore\tescore\tdscore\ttscore"
+# STRING answers the alias P53 under its preferred name TP53
+PARTNERS = {
+    "TP53": [("MDM2", 0.99, 0.999), ("TP53", 0.5, 0.9), ("EP300", 0.6, 0.95)],
+    "BRCA1": [("BARD1", 0.98, 0.999)],
+}
+ALIASES = {"P53": "TP53"}
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, decode_unicode=True):
+        return iter(self.text.split("\n"))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def string_api(tmp_path, monkeypatch):
+    calls = []
+
+    def post(url, data, **kwargs):
+        genes = data["identifiers"].split("\r")
+        calls.append((url.rsplit("/", 1)[-1], genes))
+        if url == st_string.STRING_IDS_URL:
+            lines = ["queryIndex\tqueryItem\tstringId\tncbiTaxonId\ttaxonName\tpreferredName\tannotation"]
+            for idx, gene in enumerate(genes):
+                name = ALIASES.get(gene.upper(), gene.upper())
+                if name in PARTNERS or gene.upper() == "LONELY":
+                    lines.append(f"{idx}\t{gene}\t9606.{name}\t9606\tHomo sapiens\t{name}\t-")
+            return FakeResponse("\n".join(lines) + "\n")
+        lines = [HEADER]
+        for gene in genes:
+            name = ALIASES.get(gene.upper(), gene.upper())
+            for partner, escore, score in PARTNERS.get(name, []):
+                lines.append(f"9606.{name}\t9606.{partner}\t{name}\t{partner}\t9606\t{score}\t0\t0\t0\t0\t{escore}\t0\t0")
+        return FakeResponse("\n".join(lines) + "\n")
+
+    monkeypatch.setattr(st_string.st_http, "post", post)
+    st_cache.set_cache(st_cache.ResponseCache(str(tmp_path / "responses.sqlite")))
+    try:
+        yield calls
+    finally:
+        st_cache.set_cache(None)
+
+
+def test_aliases_resolved_with_one_batched_call(string_api):
+    genes = ["BRCA1", "p53", "LONELY", "NOTAGENE", "ALSO_LONELY"]
+    partners = fetch_string_partners(genes)
+    assert [call[0] for call in string_api] == ["interaction_partners", "get_string_ids"]
+    assert string_api[1][1] == ["p53", "LONELY", "NOTAGENE", "ALSO_LONELY"]  # only the genes left empty
+    assert partners["p53"] == {"MDM2": (0.99, 0.999), "EP300": (0.6, 0.95)}
+    assert partners["BRCA1"] == {"BARD1": (0.98, 0.999)}
+    assert partners["LONELY"] == {} and partners["NOTAGENE"] == {}
+
+
+def test_genes_without_partners_are_cached(string_api):
+    fetch_string_partners(["BRCA1", "LONELY"])
+    calls = len(string_api)
+    assert fetch_string_partners(["LONELY", "BRCA1"]) == {"LONELY": {}, "BRCA1": {"BARD1": (0.98, 0.999)}}
+    assert len(string_api) == calls
+
+
+def test_no_name_lookup_when_every_query_matches(string_api):
+    fetch_string_partners(["TP53", "BRCA1", "LONELY"])
+    assert [call[0] for call in string_api] == ["interaction_partners"]
+
+
+def test_single_identifier_takes_every_row(string_api):
+    assert fetch_string_partners(["p53"])["p53"] == {"MDM2": (0.99, 0.999), "EP300": (0.6, 0.95)}
+    assert len(string_api) == 1
+
+
+def test_chunks_and_empty_answer(string_api, monkeypatch):
+    partners = fetch_string_partners(["TP53", "BRCA1", "LONELY"], chunk_size=2)
+    assert [call[1] for call in string_api] == [["TP53", "BRCA1"], ["LONELY"]]
+    assert partners["LONELY"] == {}
+    monkeypatch.setattr(st_string.st_http, "post", lambda url, data, **kwargs: FakeResponse(""))
+    assert fetch_string_partners(["EMPTYBODY"]) == {"EMPTYBODY": {}}
+
+
+def test_filter_interactors_orders_by_experimental_score():
+    partners = {"A": (0.8, 0.9), "B": (0.95, 0.99), "C": (0.7, 0.99), "D": (0.8, 0.5)}
+    assert filter_interactors(partners) == ["B", "A", "D"]
+    assert filter_interactors(partners, min_combined=0.6) == ["B", "A"]
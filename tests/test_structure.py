@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+import st_bench
+import st_structure
+from st_structure import StructureError, StructureModel, is_mmcif, load_structure, parse_mmcif, parse_pdb
+
+# (record, name, altloc, resname, chain, resnum, icode, x, y, z, element)
+ATOMS = [
+    ("ATOM", "N", "", "MET", "A", 1, "", 11.104, 6.134, -6.504, "N"),
+    ("ATOM", "CA", "", "MET", "A", 1, "", 11.639, 6.071, -5.147, "C"),
+    ("ATOM", "CB", "A", "MET", "A", 1, "", 12.000, 7.000, -4.000, "C"),
+    ("ATOM", "CB", "B", "MET", "A", 1, "", 12.500, 7.500, -4.500, "C"),
+    ("ATOM", "N", "", "GLY", "A", 2, "", 13.000, 5.000, -5.000, "N"),
+    ("ATOM", "CA", "", "GLY", "A", 2, "", 14.000, 5.000, -5.000, "C"),
+    ("ATOM", "N", "", "SER", "A", 2, "A", 15.000, 5.000, -5.000, "N"),
+    ("ATOM", "CA", "", "SER", "A", 2, "A", 16.000, 5.000, -5.000, "C"),
+    ("ATOM", "N", "", "LYS", "A", 5, "", 17.000, 5.000, -5.000, "N"),
+    ("ATOM", "H", "", "LYS", "A", 5, "", 17.500, 5.000, -5.000, "H"),
+    ("ATOM", "N", "", "TRP", "B", 1001, "", -1.000, -2.000, -3.000, "N"),
+    ("ATOM", "CA", "", "TRP", "B", 1001, "", -2.000, -2.000, -3.000, "C"),
+    ("HETATM", "FE", "", "HEM", "B", 1101, "", 0.000, 0.000, 0.000, "FE"),
+    ("HETATM", "O", "", "HOH", "B", 1201, "", 3.000, 3.000, 3.000, "O"),
+]
+
+
+def _pdb_name(name, element):
+    return name.ljust(4) if len(name) >= 4 or len(element) == 2 else (" " + name).ljust(4)
+
+
+def _pdb_text(atoms, element_column=True):
+    lines = ["HEADER    TEST", "MODEL        1"]
+    for serial, (record, name, altloc, resname, chain, resnum, icode, x, y, z, element) in enumerate(atoms, 1):
+        line = "%-6s%5d %4s%1s%3s %1s%4d%1s   %8.3f%8.3f%8.3f%6.2f%6.2f          %2s" % (
+            record, serial, _pdb_name(name, element), altloc, resname, chain, resnum, icode, x, y, z, 1.0, 0.0,
+            element if element_column else "")
+        lines.append(line)
+    lines += ["ENDMDL", "MODEL        2", lines[2], "ENDMDL", "END"]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _cif_text(atoms):
+    lines = ["data_TEST", "#", "loop_"]
+    header = ["group_PDB", "id", "type_symbol", "label_atom_id", "label_alt_id", "label_comp_id", "label_asym_id",
+              "label_seq_id", "pdbx_PDB_ins_code", "Cartn_x", "Cartn_y", "Cartn_z", "auth_seq_id", "auth_comp_id",
+              "auth_asym_id", "auth_atom_id", "pdbx_PDB_model_num"]
+    lines += [f"_atom_site.{name}" for name in header]
+    for model in (1, 2):
+        for serial, (record, name, altloc, resname, chain, resnum, icode, x, y, z, element) in enumerate(atoms, 1):
+            # label_ numbering differs from the author numbering the parser must use
+            lines.append(" ".join([record, str(serial), element, f'"{name}"' if name == "O" else name, altloc or ".",
+                                   resname, chain + "X", str(serial), icode or "?", f"{x:.3f}", f"{y:.3f}", f"{z:.3f}",
+                                   str(resnum), resname, chain, name, str(model)]))
+    lines.append("#")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def test_pdb_and_mmcif_give_the_same_atoms():
+    pdb, cif = parse_pdb(_pdb_text(ATOMS)), parse_mmcif(_cif_text(ATOMS))
+    # First model only, first alternate location only
+    assert len(pdb) == len(ATOMS) - 1
+    assert pdb.dtype == cif.dtype
+    for field in ("name", "resname", "chain", "resnum", "icode", "element", "hetero"):
+        assert pdb[field].tolist() == cif[field].tolist(), field
+    np.testing.assert_array_equal(pdb["xyz"], cif["xyz"])
+    assert pdb["name"][:3].tolist() == [b" N  ", b" CA ", b" CB "]
+    assert pdb["xyz"][2].tolist() == pytest.approx([12.0, 7.0, -4.0])
+    assert pdb["name"][-2] == b"FE  " and pdb["element"][-2] == b"FE"
+
+
+def test_pdb_element_falls_back_to_the_atom_name():
+    atoms = parse_pdb(_pdb_text(ATOMS, element_column=False))
+    assert atoms["element"].tolist()[:4] == [b"N", b"C", b"C", b"N"]
+
+
+def test_malformed_records_raise():
+    text = _pdb_text(ATOMS[:2]).replace(b"11.104", b"11.1x4")
+    with pytest.raises(StructureError):
+        parse_pdb(text)
+    assert len(parse_pdb(b"HEADER ONLY\nEND\n")) == 0
+    assert len(parse_mmcif(b"data_EMPTY\n#\n")) == 0
+
+
+def test_residue_table_and_lookups():
+    model = StructureModel.parse(_pdb_text(ATOMS))
+    assert model.format == "pdb" and StructureModel.parse(_cif_text(ATOMS)).format == "mmcif"
+    assert model.res_name.tolist() == ["MET", "GLY", "SER", "LYS", "TRP", "HEM", "HOH"]
+    assert model.res_icode.tolist() == ["", "", "A", "", "", "", ""]
+    assert np.diff(model.residue_starts).tolist() == [3, 2, 2, 2, 2, 1, 1]
+    assert model.sequence() == "MGSKW" and model.sequence("B") == "W"
+    assert model.residue_rows([2, 2, 1001, 1101, 3], chains=["A", "A", "", "", ""],
+                              icodes=["", "A", "", "", ""]).tolist() == [1, 2, 4, -1, -1]
+    assert model.heavy_atom_mask().sum() == 10
+    assert model.gaps() == {"A": [(3, 4)]}
+    assert model.validate_mutations(["A", "", "B"], ["M", "G", "A"], [1, 7, 1001]) == [
+        None, "residue 7 is missing from any chain of the structure",
+        "wild-type mismatch at 1001: the structure has TRP (W) in chain B, not A"]
+
+
+def test_pdb_export_round_trips():
+    model = StructureModel.parse(_cif_text(ATOMS))
+    again = parse_pdb(model.to_pdb_bytes())
+    for field in ("name", "resname", "chain", "resnum", "icode", "element", "hetero"):
+        assert again[field].tolist() == model.atoms[field].tolist(), field
+    np.testing.assert_allclose(again["xyz"], model.atoms["xyz"], atol=5e-4)
+
+
+def test_long_chain_ids_are_relabelled_on_export():
+    atoms = [atom[:4] + ("BB" if atom[4] == "B" else atom[4],) + atom[5:] for atom in ATOMS]
+    model = StructureModel.parse(_cif_text(atoms))
+    assert "BB" in model.res_chain.tolist()
+    again = parse_pdb(model.to_pdb_bytes(chain_labels={"BB": "Z"}))
+    assert sorted(set(again["chain"].tolist())) == [b"A", b"Z"]
+
+
+def test_is_mmcif():
+    assert is_mmcif(b"  data_1ABC\n") and is_mmcif(b"# comment\n_atom_site.id\n")
+    assert not is_mmcif(st_bench.synthetic_pdb(2))
+
+
+def test_load_structure_parses_each_content_once(monkeypatch):
+    monkeypatch.setattr(st_structure, "_models", st_structure.OrderedDict())
+    monkeypatch.setattr(st_structure, "MODEL_CACHE_SIZE", 2)
+    texts = [st_bench.synthetic_pdb(count) for count in (3, 4, 5)]
+    first = load_structure(texts[0])
+    assert load_structure(bytes(texts[0])) is first
+    load_structure(texts[1])
+    load_structure(texts[2])
+    assert load_structure(texts[0]) is not first  # evicted
@@ -0,0 +1,59 @@
+import json
+import pytest
+import st_cache
+import st_uniprot
+from st_cache import ResponseCache, normalize_key
+from st_uniprot import RECORD_FIELDS, RECORD_TTL, get_uniprot_record
+
+NOW = 2_000_000_000.0
+URL = f"https://rest.uniprot.org/uniprotkb/search?query=accession:P00001&fields={RECORD_FIELDS}"
+
+
+def _entry(length):
+    return {"results": [{"primaryAccession": "P00001", "sequence": {"length": length}}]}
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.status_code = 200
+        self.text = json.dumps(payload)
+        self.content = self.text.encode()
+        self.headers = {}
+
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    now = [NOW]
+    monkeypatch.setattr(st_cache.time, "time", lambda: now[0])
+    st_cache.set_cache(ResponseCache(str(tmp_path / "c.sqlite")))
+    st_uniprot.set_uniprot_backend("rest")
+    try:
+        yield now
+    finally:
+        st_cache.set_cache(None)
+        st_uniprot.set_uniprot_backend("rest")
+
+
+def test_memo_expires_with_the_cached_response(clock, monkeypatch):
+    # A response cached shortly before its TTL runs out
+    cache = st_cache.get_cache()
+    cache.store(normalize_key(URL), "uniprot", 200, json.dumps(_entry(100)))
+    cache._db.execute("UPDATE responses SET fetched_at = ?", (NOW - RECORD_TTL + 10,))
+    calls = []
+    monkeypatch.setattr(st_cache.st_http, "get", lambda url, **kwargs: calls.append(url) or FakeResponse(_entry(200)))
+
+    assert get_uniprot_record("P00001").length == 100
+    assert calls == []
+    clock[0] = NOW + 20  # the memo must not outlive the response it came from
+    assert get_uniprot_record("P00001").length == 200
+    assert len(calls) == 1
+    clock[0] = NOW + 40
+    assert get_uniprot_record("P00001").length == 200
+    assert len(calls) == 1
+
+
+def test_memo_is_bounded(clock, monkeypatch):
+    monkeypatch.setattr(st_uniprot, "RECORD_CACHE_SIZE", 3)
+    for idx in range(5):
+        st_uniprot._remember(st_uniprot.UniProtRecord(f"P{idx}", idx, (), ()))
+    assert list(st_uniprot._records) == ["P2", "P3", "P4"]
@@ -0,0 +1,77 @@
+import json
+from st_uniprot import PdbCrossRef
+from st_uniprot_store import UniProtStore
+
+REVIEWED = "UniProtKB reviewed (Swiss-Prot)"
+UNREVIEWED = "UniProtKB unreviewed (TrEMBL)"
+
+
+def _json_entry(accession, entry_type, primary, synonyms=(), taxon=9606):
+    return {
+        "primaryAccession": accession,
+        "entryType": entry_type,
+        "organism": {"taxonId": taxon},
+        "genes": [{"geneName": {"value": primary}, "synonyms": [{"value": name} for name in synonyms]}],
+        "sequence": {"length": 393},
+        "comments": [{"commentType": "DISEASE",
+                      "disease": {"diseaseId": "Li-Fraumeni syndrome", "description": "Cancer predisposition."}}],
+        "uniProtKBCrossReferences": [{"database": "PDB", "id": "1TUP", "properties": [
+            {"key": "Method", "value": "X-ray"}, {"key": "Resolution", "value": "2.20 A"},
+            {"key": "Chains", "value": "A/B/C=94-312"}]}],
+    }
+
+
+def _store(tmp_path):
+    return UniProtStore(str(tmp_path / "uniprot.sqlite"))
+
+
+def test_json_dump(tmp_path):
+    dump = tmp_path / "uniprot.json"
+    dump.write_text(json.dumps({"results": [
+        _json_entry("P04637", REVIEWED, "TP53", ["P53"]),
+        _json_entry("A0A024R1R8", UNREVIEWED, "TP53"),
+        _json_entry("Q00001", UNREVIEWED, "P53"),
+        _json_entry("P02340", REVIEWED, "Trp53", taxon=10090),
+    ]}))
+    store = _store(tmp_path)
+    assert store.import_dump(str(dump)) == 3
+
+    record = store.get("P04637")
+    assert record.length == 393
+    assert record.diseases == (("Li-Fraumeni syndrome", "Cancer predisposition."),)
+    assert record.pdb_xrefs == (PdbCrossRef("1TUP", "X-ray", "2.20 A", "A/B/C=94-312"),)
+    assert store.get("P02340") is None
+
+    # Reviewed before unreviewed, primary names before synonyms, case-insensitive
+    assert store.find_gene("TP53") == "P04637"
+    assert store.find_gene("tp53") == "P04637"
+    assert store.find_gene("P53") == "Q00001"
+    assert store.find_gene("MDM2") is None
+    assert store.primary_genes() == ["TP53"]
+    store.close()
+
+
+def test_tsv_dump_and_reimport(tmp_path):
+    dump = tmp_path / "uniprot.tsv"
+    dump.write_text(
+        "Entry\tReviewed\tGene Names\tLength\tInvolvement in disease\tPDB\n"
+        "P38398\treviewed\tBRCA1 RNF53\t1863\tDISEASE: Breast-ovarian cancer, familial, 1 (BROVCA1) [MIM:604370]: "
+        "A condition associated with familial predisposition to cancer. Note=Disease susceptibility.\t1JM7;1JNX;\n"
+        "A0A0A0MRR7\tunreviewed\tRNF53\t500\t\t\n"
+    )
+    store = _store(tmp_path)
+    assert store.import_dump(str(dump)) == 2
+
+    record = store.get("P38398")
+    assert record.length == 1863
+    assert record.diseases == (("Breast-ovarian cancer, familial, 1",
+                                "A condition associated with familial predisposition to cancer."),)
+    assert [xref.pdb_id for xref in record.pdb_xrefs] == ["1JM7", "1JNX"]
+    assert store.find_gene("BRCA1") == "P38398"
+    # The unreviewed primary name outranks the reviewed synonym
+    assert store.find_gene("RNF53") == "A0A0A0MRR7"
+
+    # Re-importing replaces the gene rows instead of duplicating them
+    assert store.import_dump(str(dump)) == 2
+    assert store._db.execute("SELECT COUNT(*) FROM genes").fetchone()[0] == 3
+    store.close()